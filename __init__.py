@@ -1,7 +1,27 @@
 from .create.auxiliary import *
+from .create.binary import *
+from .create.json_stream import *
 from .create import *
+from .bad_data import *
+from .contingency import *
+from .dc_load_flow import *
 from .drawing import *
+from .jacobian import *
+from .linear_solver import *
 from .load_flow import *
+from .measurement_model import *
 from .network import Net
+from .network_arrays import *
 from .network_matrices import *
+from .observability import *
+from .parallel import *
+from .radial_load_flow import *
+from .reconfiguration import *
+from .scenarios import *
+from .sensitivity import *
+from .session import *
 from .state_estimation import *
+from .switching import *
+from .time_series import *
+from .topology import *
+from .tracking_estimation import *
@@ -0,0 +1,204 @@
+from dataclasses import dataclass, field
+from numpy import ndarray, asarray, ones, zeros, exp, sqrt, arange, isfinite, inf
+from numpy.linalg import solve as dense_solve, LinAlgError
+from scipy.sparse import diags
+from scipy.stats import chi2
+from .linear_solver import SparseLUSolver
+from .state_estimation import estimate
+
+
+@dataclass(kw_only=True)
+class BadDataTest:
+    chi_square: float
+    chi_square_threshold: float
+    degrees_of_freedom: int
+    largest_normalized_residual: float
+    largest_normalized_residual_key: tuple  # ('bus' or 'branch', measurement dict key)
+    normalized_residuals: ndarray = field(default=None, repr=False)  # In measurement model order, 0 where untested
+
+    @property
+    def chi_square_passed(self):
+        return self.chi_square <= self.chi_square_threshold
+
+
+@dataclass(kw_only=True)
+class BadDataResult:
+    removed: list  # Keys of the removed measurements in order of removal
+    tests: list  # BadDataTest before every removal and after the last one
+    iterations: list  # Re-estimation iterations after every removal
+    refactorizations: int = 0
+    vm: ndarray = field(default=None, repr=False)
+    va: ndarray = field(default=None, repr=False)
+
+
+class BadDataDetector:
+    """
+    Residual analysis and incremental removal of measurements around a WLS estimate.
+
+    The measurement variances are R = diag(std_dev^2), the estimator weights with R^-1. The gain matrix
+    G = H.T R^-1 H is factorized once at the estimate. Only the diagonal of the residual covariance,
+    Omega_ii = R_ii - h_i G^-1 h_i.T, is computed, with chunked multiple right-hand side solves through that
+    factorization.
+
+    Removing measurements downdates the gain to G - H_d.T R_d^-1 H_d, which is applied through the same factorization
+    with the Sherman-Morrison-Woodbury identity, the capacitance matrix being the residual covariance block of the
+    removed measurements. The covariance diagonal follows with a rank k correction per row. Re-estimation starts from
+    the previous state and iterates with the downdated gain. When it does not converge the gain is factorized again at
+    the current state.
+    """
+    def __init__(self, net, vm=None, va=None, measurement_model=None, chunk_size: int = 256):
+        self.net = net
+        self.model = net.measurement_model if measurement_model is None else measurement_model
+        self.variances = self.model.std_dev ** 2
+        self.vm = asarray(net.vm_estimated if vm is None else vm, dtype=float).copy()
+        self.va = asarray(net.va_estimated if va is None else va, dtype=float).copy()
+        self.angle_indices = [i for i in range(len(net.buses)) if i not in net.slack_buses]
+        self.chunk_size = chunk_size
+        self.active = ones(self.model.n_measurements, dtype=bool)
+        self.solver = SparseLUSolver()
+        self.refactorizations = 0
+        self.factorize()
+
+    @property
+    def n_states(self):
+        return len(self.angle_indices) + len(self.vm)
+
+    def jacobian(self):
+        return self.model.jacobian(self.vm * exp(1j * self.va), self.angle_indices)
+
+    def residuals(self):
+        return self.model.z - self.model.hx(self.vm * exp(1j * self.va))
+
+    def factorize(self):
+        # Gain of the active measurements at the current state, measurements removed afterwards are downdates
+        self.H = self.jacobian()
+        weights = self.model.weights * self.active
+        self.solver.factorize(self.H.T * (diags(weights, format='csr') * self.H))
+        self.removed_rows = []
+        self.update_downdate()
+        self.refactorizations += 1
+
+        # h_i G^-1 h_i.T of every measurement, chunk_size measurements per solve
+        self.projection_diagonal = zeros(self.model.n_measurements)
+        for start in range(0, self.model.n_measurements, self.chunk_size):
+            chunk = arange(start, min(start + self.chunk_size, self.model.n_measurements))
+            h = self.H[chunk].T.toarray()
+            x = self.solver.solve_factorized(h).reshape(h.shape)
+            self.projection_diagonal[chunk] = (h * x).sum(axis=0)
+
+    def update_downdate(self):
+        # (G - H_d.T R_d^-1 H_d)^-1 b = y + W C^-1 H_d y with y = G^-1 b, W = G^-1 H_d.T and C = R_d - H_d W
+        self.H_removed = self.H[self.removed_rows]
+        if not self.removed_rows:
+            return
+        self.W = self.solver.solve_factorized(self.H_removed.T.toarray()).reshape(self.n_states, -1)
+        self.capacitance = diags(self.variances[self.removed_rows]).toarray() - self.H_removed * self.W
+
+    def solve_gain(self, b):
+        y = self.solver.solve_factorized(b)
+        if not self.removed_rows:
+            return y
+        correction = self.W @ dense_solve(self.capacitance, self.H_removed * y)
+        return y + correction.reshape(y.shape)
+
+    def residual_covariance_diagonal(self, rows):
+        # Omega_ii = R_ii - h_i G^-1 h_i.T - (h_i W) C^-1 (h_i W).T, the downdate adds a rank k term to every row
+        rows = asarray(rows)
+        omega = self.variances[rows] - self.projection_diagonal[rows]
+        if self.removed_rows:
+            hw = self.H[rows] * self.W
+            omega -= (hw * dense_solve(self.capacitance, hw.T).T).sum(axis=1)
+        return omega
+
+    def test(self, alpha: float = 0.01) -> BadDataTest:
+        r = self.residuals()
+        rows = self.active.nonzero()[0]
+        chi_square = float((r[rows] ** 2 / self.variances[rows]).sum())
+        degrees_of_freedom = len(rows) - self.n_states
+        threshold = float(chi2.ppf(1 - alpha, degrees_of_freedom)) if degrees_of_freedom > 0 else inf
+
+        # Critical measurements have no residual covariance and cannot be tested
+        omega = self.residual_covariance_diagonal(rows)
+        testable = omega > 1e-10 * self.variances[rows]
+        normalized_residuals = zeros(self.model.n_measurements)
+        normalized_residuals[rows[testable]] = abs(r[rows[testable]]) / sqrt(omega[testable])
+        largest = int(normalized_residuals.argmax())
+        return BadDataTest(chi_square=chi_square,
+                           chi_square_threshold=threshold,
+                           degrees_of_freedom=degrees_of_freedom,
+                           largest_normalized_residual=float(normalized_residuals[largest]),
+                           largest_normalized_residual_key=self.model.measurement_keys[largest],
+                           normalized_residuals=normalized_residuals)
+
+    def remove(self, row, max_iteration: int = 50, tolerance: float = 1e-8):
+        # Removes one measurement row and re-estimates from the current state, returns the iteration count
+        self.active[row] = False
+        self.removed_rows.append(int(row))
+        try:
+            self.update_downdate()
+            iteration, converged = self.reestimate(max_iteration, tolerance)
+        except LinAlgError:
+            iteration, converged = 0, False
+        if not converged:
+            # The downdated gain is too far from the gain at the new estimate
+            self.factorize()
+            iteration, converged = self.reestimate(max_iteration, tolerance)
+            if not converged:
+                raise RuntimeError(f'Re-estimation did not converge after removing measurement '
+                                   f'{self.model.measurement_keys[row]}.')
+            self.factorize()
+        return iteration
+
+    def reestimate(self, max_iteration: int = 50, tolerance: float = 1e-8):
+        # Gauss-Newton iterations with the downdated gain, the state is only kept when they converge
+        vm, va = self.vm.copy(), self.va.copy()
+        weights = self.model.weights * self.active
+        n_angles = len(self.angle_indices)
+        step = inf
+        for iteration in range(1, max_iteration + 1):
+            v = vm * exp(1j * va)
+            H = self.model.jacobian(v, self.angle_indices)
+            r = self.model.z - self.model.hx(v)
+            dx = self.solve_gain(H.T * (weights * r))
+            if not isfinite(dx).all() or abs(dx).max() > step:
+                return iteration, False
+            step = abs(dx).max()
+            va[self.angle_indices] += dx[:n_angles]
+            vm += dx[n_angles:]
+            if step < tolerance:
+                self.vm, self.va = vm, va
+                return iteration, True
+        return max_iteration, False
+
+
+def detect_bad_data(net,
+                    alpha: float = 0.01,
+                    normalized_residual_threshold: float = 3.0,
+                    max_removals: int = 10,
+                    max_iteration: int = 50,
+                    tolerance: float = 1e-8,
+                    chunk_size: int = 256) -> BadDataResult:
+    """
+    Chi-square and largest normalized residual tests on the WLS estimate in net.vm_estimated and net.va_estimated,
+    estimated first if there is none. While the largest normalized residual exceeds the threshold its measurement is
+    removed and the state re-estimated incrementally. The measurements on the net are left unchanged, the estimate
+    without the removed ones is written to net.vm_estimated and net.va_estimated.
+    """
+    if net.vm_estimated is None:
+        estimate(net, max_iteration=max_iteration, tolerance=tolerance)
+    detector = BadDataDetector(net, chunk_size=chunk_size)
+    keys = detector.model.measurement_keys
+
+    result = BadDataResult(removed=[], tests=[detector.test(alpha)], iterations=[])
+    while (result.tests[-1].largest_normalized_residual > normalized_residual_threshold and
+           len(result.removed) < max_removals):
+        row = int(result.tests[-1].normalized_residuals.argmax())
+        result.iterations.append(detector.remove(row, max_iteration, tolerance))
+        result.removed.append(keys[row])
+        result.tests.append(detector.test(alpha))
+
+    result.refactorizations = detector.refactorizations
+    result.vm, result.va = detector.vm, detector.va
+    net.vm_estimated = detector.vm
+    net.va_estimated = detector.va
+    return result
@@ -0,0 +1,66 @@
+"""
+Cold start to the first load flow solution from the JSON files in test_data against their binary conversions: reading
+the topology, building y_bus, reading the load flow case and solving it. Every run starts from an empty Net, the
+binary files are written to a temporary directory first.
+
+Run from the directory containing the package: python -m power_system.benchmarks.binary_format
+"""
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+from time import perf_counter
+from numpy import array_equal
+from .common import TOPOLOGIES, topology_path, load_flow_path
+from ..network import Net
+from ..network_matrices import create_y_bus
+from ..load_flow import run_load_flow_from_case_file
+from ..create.auxiliary import create_network_from_json
+from ..create.binary import create_network_from_binary, convert_network_json_to_binary, \
+    convert_load_flow_case_to_binary
+
+REPEAT = 5
+
+
+def cold_start(create_network, topology, case):
+    # Best of REPEAT for loading the topology and for the whole path to the first solution
+    best_load, best_total = float('inf'), float('inf')
+    for _ in range(REPEAT):
+        start = perf_counter()
+        net = Net()
+        create_network(net, topology)
+        loaded = perf_counter()
+        create_y_bus(net)
+        with redirect_stdout(io.StringIO()):
+            run_load_flow_from_case_file(net, case)
+        best_load = min(best_load, loaded - start)
+        best_total = min(best_total, perf_counter() - start)
+    return net, best_load, best_total
+
+
+def run(name, directory):
+    topology, case = os.path.join(directory, f'{name}.bin'), os.path.join(directory, f'{name}_load_flow.bin')
+    convert_network_json_to_binary(topology_path(name), topology)
+    convert_load_flow_case_to_binary(load_flow_path(name), case)
+
+    json_net, json_load, json_total = cold_start(create_network_from_json, topology_path(name), load_flow_path(name))
+    binary_net, binary_load, binary_total = cold_start(create_network_from_binary, topology, case)
+    same = array_equal(json_net.vm, binary_net.vm) and array_equal(json_net.va, binary_net.va)
+    json_size = os.path.getsize(topology_path(name)) + os.path.getsize(load_flow_path(name))
+    binary_size = os.path.getsize(topology) + os.path.getsize(case)
+    print(f'{name:<16}{len(binary_net.buses):>7}{json_size / 1e3:>10.0f}{binary_size / 1e3:>10.0f}'
+          f'{json_load * 1e3:>12.2f}{binary_load * 1e3:>12.2f}{json_total * 1e3:>12.2f}{binary_total * 1e3:>12.2f}'
+          f'{json_total / binary_total:>9.1f}x{str(same):>7}')
+
+
+def main():
+    print(f'{"Network":<16}{"Buses":>7}{"JSON kB":>10}{"Bin kB":>10}{"JSON load":>12}{"Bin load":>12}'
+          f'{"JSON solve":>12}{"Bin solve":>12}{"Speedup":>10}{"Same":>7}')
+    print(f'{"":<43}{"ms":>12}{"ms":>12}{"ms":>12}{"ms":>12}')
+    with tempfile.TemporaryDirectory() as directory:
+        for name in TOPOLOGIES:
+            run(name, directory)
+
+
+if __name__ == '__main__':
+    main()
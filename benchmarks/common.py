@@ -0,0 +1,64 @@
+import os
+from time import perf_counter
+from numpy import random, ones, zeros
+from ..network import Net
+from ..network_matrices import create_y_bus
+from ..create.auxiliary import create_network_from_json
+from ..create.create_element import create_bus, create_line
+
+TEST_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test_data')
+TOPOLOGIES = sorted(name[:-len('.json')] for name in os.listdir(os.path.join(TEST_DATA, 'topology')))
+
+
+def topology_path(name):
+    return os.path.join(TEST_DATA, 'topology', f'{name}.json')
+
+
+def load_flow_path(name):
+    return os.path.join(TEST_DATA, 'load_flow', f'{name}_load_flow.json')
+
+
+def results_path(name):
+    return os.path.join(TEST_DATA, 'results', f'{name}_load_flow_results.json')
+
+
+def load_network(name):
+    net = Net()
+    create_network_from_json(net, topology_path(name))
+    return net
+
+
+def best_of(function, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def create_synthetic_feeder(n_buses, seed=0, voltage_level_kv=20.0, p_mw=0.002, q_mvar=0.001):
+    """
+    Random radial feeder with a slack at bus 0, every other bus hangs from a random earlier bus and carries a PQ load.
+    Returns the net prepared for load flow with its scheduled powers and flat start.
+    """
+    rng = random.default_rng(seed)
+    net = Net()
+    for bus in range(n_buses):
+        create_bus(net, bus_idx=bus, voltage_level_kv=voltage_level_kv)
+        net.bus_map[bus] = bus
+    parents = [int(rng.integers(0, bus)) for bus in range(1, n_buses)]
+    for line, (parent, bus) in enumerate(zip(parents, range(1, n_buses))):
+        create_line(net, line_idx=line, from_bus_idx=parent, to_bus_idx=bus, r_ohm=0.05, x_ohm=0.04, b_total_mho=0)
+        net.line_map[line] = line
+    create_y_bus(net)
+    net.y_bus = net.full_y_bus.copy()
+    net.slack_buses = {0}
+    net.pv_buses = set()
+    net.pq_buses = set(range(1, n_buses))
+
+    scale = rng.uniform(0.5, 1.5, n_buses)
+    scale[0] = 0
+    p_scheduled_pu = -net.mw_to_pu(p_mw * scale)
+    q_scheduled_pu = -net.mw_to_pu(q_mvar * scale)
+    return net, p_scheduled_pu, q_scheduled_pu, ones(n_buses), zeros(n_buses)
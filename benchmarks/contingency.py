@@ -0,0 +1,58 @@
+"""
+N-1 screening with Woodbury updates of the base Jacobian factorization against a full Newton-Raphson per outage.
+
+Run from the directory containing the package: python -m power_system.benchmarks.contingency
+"""
+import io
+from contextlib import redirect_stdout
+from time import perf_counter
+from .common import load_network, load_flow_path
+from ..network_matrices import create_y_bus
+from ..load_flow import prepare_load_flow_from_case_file, load_flow
+from ..parallel import create_network_snapshot, SnapshotSolver
+from ..contingency import run_contingency_analysis
+
+
+def run(name):
+    net = load_network(name)
+    create_y_bus(net)
+    p_scheduled_pu, q_scheduled_pu, vm, va = prepare_load_flow_from_case_file(net, load_flow_path(name))
+    with redirect_stdout(io.StringIO()):
+        load_flow(net, p_scheduled_pu, q_scheduled_pu, vm, va)
+
+    start = perf_counter()
+    results = run_contingency_analysis(net, p_scheduled_pu, q_scheduled_pu)
+    screening_time = perf_counter() - start
+
+    # Reference: full Newton-Raphson with a fresh Jacobian every iteration for every outage
+    solver = SnapshotSolver(create_network_snapshot(net, p_scheduled_pu, q_scheduled_pu, net.vm, net.va))
+    solved = [result for result in results if not result.islanding]
+    start = perf_counter()
+    reference = [solver.solve_contingency(result.branches) for result in solved]
+    reference_time = perf_counter() - start
+    difference = max((abs(result.vm - vm_reference).max()
+                      for result, (vm_reference, _, _, converged) in zip(solved, reference)
+                      if result.converged and converged), default=0.0)
+
+    n_islanding = sum(result.islanding for result in results)
+    n_converged = sum(result.converged for result in results)
+    n_reference = sum(converged for _, _, _, converged in reference)
+    print(f'{name}: {len(results)} outages, {n_islanding} islanding skipped, {n_converged} converged '
+          f'({n_reference} with full Newton-Raphson)')
+    print(f'  Woodbury screening  {screening_time * 1e3:9.1f} ms  ({len(results) / screening_time:8.1f} outages/s)')
+    print(f'  Full Newton-Raphson {reference_time * 1e3:9.1f} ms  ({len(solved) / reference_time:8.1f} outages/s)')
+    print(f'  Max |dvm| against full Newton-Raphson: {difference:.2e}')
+    print('  Worst outages:')
+    for result in results[:5]:
+        print(f'    {result.elements}: severity {result.severity:.4f} pu, {result.n_violations} violations, '
+              f'min vm {result.min_vm:.4f}, max vm {result.max_vm:.4f}')
+    print()
+
+
+def main():
+    for name in ['ieee57', 'ieee118', 'ieee300']:
+        run(name)
+
+
+if __name__ == '__main__':
+    main()
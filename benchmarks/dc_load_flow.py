@@ -0,0 +1,87 @@
+"""
+DC load flow against Newton-Raphson on the IEEE cases: one operating point, and a batch of injection patterns with
+the loads scaled at random, solved as one right-hand side, one pattern at a time and with run_load_flow_scenarios.
+The DC branch flows are compared with the AC flows at the from ends, also with phase shifts set on the first three
+transformers.
+
+Run from the directory containing the package: python -m power_system.benchmarks.dc_load_flow
+"""
+import io
+from contextlib import redirect_stdout
+from time import perf_counter
+from numpy import random, exp, conj, median
+from .common import load_network, load_flow_path
+from ..network_matrices import create_y_bus, get_branch_stamps
+from ..load_flow import prepare_load_flow_from_case_file, load_flow
+from ..scenarios import run_load_flow_scenarios
+from ..dc_load_flow import DCLoadFlow
+
+PATTERNS = 1000
+AC_PATTERNS = 50
+PHASE_SHIFT = 5.0
+
+
+def ac_branch_flows(net, vm, va):
+    # Active power entering every branch at its from bus with the tapped pi model of y_bus
+    v = vm * exp(1j * va)
+    y_ff, y_ft, _, _ = get_branch_stamps(net)
+    f, t = net.arrays.branch_from, net.arrays.branch_to
+    return (v[f] * conj(y_ff * v[f] + y_ft * v[t])).real
+
+
+def run(name, phase_shift=0.0):
+    net = load_network(name)
+    for transformer in list(net.transformers.values())[:3]:
+        transformer.phase_shift = phase_shift
+    create_y_bus(net)
+    p_scheduled_pu, q_scheduled_pu, vm, va = prepare_load_flow_from_case_file(net, load_flow_path(name))
+    start = perf_counter()
+    with redirect_stdout(io.StringIO()):
+        load_flow(net, p_scheduled_pu, q_scheduled_pu, vm.copy(), va.copy())
+    ac_time = perf_counter() - start
+    p_ac = ac_branch_flows(net, net.vm, net.va)
+
+    start = perf_counter()
+    dc_load_flow = DCLoadFlow(net)
+    result = dc_load_flow.solve(p_scheduled_pu, va)
+    dc_time = perf_counter() - start
+    loaded = abs(p_ac) > 0.1
+    error = abs(result.p_from_pu - p_ac)
+
+    # Loads scaled by 0.8 to 1.2 per bus and pattern
+    rng = random.default_rng(0)
+    scale = rng.uniform(0.8, 1.2, (PATTERNS, len(p_scheduled_pu)))
+    p_patterns = p_scheduled_pu.ravel() * scale
+    q_patterns = q_scheduled_pu.ravel() * scale
+    start = perf_counter()
+    batch = dc_load_flow.solve(p_patterns, va)
+    batch_time = perf_counter() - start
+    start = perf_counter()
+    for pattern in p_patterns:
+        dc_load_flow.solve(pattern, va)
+    single_time = perf_counter() - start
+    start = perf_counter()
+    run_load_flow_scenarios(net, p_patterns[:AC_PATTERNS], q_patterns[:AC_PATTERNS], vm, va)
+    scenarios_time = (perf_counter() - start) / AC_PATTERNS * PATTERNS
+
+    shift = f', {phase_shift:g} degree phase shifts' if phase_shift else ''
+    print(f'{name}{shift}: {net.arrays.n_buses} buses, {net.arrays.n_branches} branches')
+    print(f'  Newton-Raphson               {ac_time * 1e3:9.2f} ms')
+    print(f'  DC with factorization        {dc_time * 1e3:9.2f} ms')
+    print(f'  {PATTERNS} patterns, one solve     {batch_time * 1e3:9.2f} ms  ({PATTERNS / batch_time:9.0f}/s)')
+    print(f'  {PATTERNS} patterns, one at a time {single_time * 1e3:9.2f} ms  ({PATTERNS / single_time:9.0f}/s)')
+    print(f'  {PATTERNS} patterns, AC scenarios  {scenarios_time * 1e3:9.2f} ms  ({PATTERNS / scenarios_time:9.0f}/s, '
+          f'extrapolated from {AC_PATTERNS})')
+    print(f'  Branch flows against AC: max {error.max():.3f} pu, median {median(error[loaded] / abs(p_ac[loaded])):.1%}'
+          f' on branches above 0.1 pu')
+    print()
+
+
+def main():
+    for name in ['ieee118', 'ieee300']:
+        run(name)
+    run('ieee118', PHASE_SHIFT)
+
+
+if __name__ == '__main__':
+    main()
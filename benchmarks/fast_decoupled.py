@@ -0,0 +1,53 @@
+"""
+Fast decoupled (XB and BX) load flow against Newton-Raphson on every load flow case in test_data.
+
+Run from the directory containing the package: python -m power_system.benchmarks.fast_decoupled
+"""
+import io
+import os
+from contextlib import redirect_stdout
+from numpy import errstate
+from .common import TEST_DATA, load_network, load_flow_path, best_of
+from ..network_matrices import create_y_bus
+from ..load_flow import prepare_load_flow_from_case_file, load_flow
+
+METHODS = ['NR', 'FDXB', 'FDBX']
+
+
+def run(name):
+    net = load_network(name)
+    create_y_bus(net)
+    p_scheduled_pu, q_scheduled_pu, vm, va = prepare_load_flow_from_case_file(net, load_flow_path(name))
+
+    print(f'{name}: {len(net.buses)} buses')
+    print(f'{"Method":<8}{"Time (ms)":>12}{"Iterations":>12}{"Max |dvm| to NR":>18}')
+    vm_reference = None
+    for method in METHODS:
+        output = io.StringIO()
+
+        def solve():
+            net.vm = None
+            with redirect_stdout(output), errstate(all='ignore'):
+                load_flow(net, p_scheduled_pu, q_scheduled_pu, vm.copy(), va.copy(), method=method)
+
+        elapsed = best_of(solve)
+        message = output.getvalue().splitlines()[-1]
+        if net.vm is None:
+            print(f'{method:<8}{elapsed * 1e3:>12.2f}{"diverged":>12}')
+            continue
+        if method == 'NR':
+            vm_reference = net.vm
+        iterations = message.rsplit(' ', 1)[-1]
+        difference = abs(net.vm - vm_reference).max() if vm_reference is not None else float('nan')
+        print(f'{method:<8}{elapsed * 1e3:>12.2f}{iterations:>12}{difference:>18.2e}')
+    print()
+
+
+def main():
+    cases = sorted(name[:-len('_load_flow.json')] for name in os.listdir(os.path.join(TEST_DATA, 'load_flow')))
+    for name in cases:
+        run(name)
+
+
+if __name__ == '__main__':
+    main()
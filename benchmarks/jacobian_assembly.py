@@ -0,0 +1,87 @@
+"""
+Per-iteration Newton-Raphson Jacobian assembly times: CSR fancy-index slicing versus the cached JacobianPattern.
+
+Run from the directory containing the package: python -m power_system.benchmarks.jacobian_assembly
+"""
+from time import perf_counter
+from numpy import exp, concatenate
+from scipy.sparse import vstack, hstack, csr_matrix as sparse
+from scipy.sparse.linalg import spsolve
+from .common import load_network, load_flow_path
+from ..ds_dx import calculate_dsbus_dx
+from ..network_matrices import create_y_bus
+from ..load_flow import (read_load_flow_data, set_scheduled_powers, flat_start, get_bus_load_flow_types, update_y_bus,
+                         calculate_injection_powers)
+from ..jacobian import JacobianPattern
+
+
+def calculate_jacobian_matrix_slicing(y_bus, v, pvpq_list, pq_list):
+    # Reference implementation: full dS/dV followed by chained fancy indexing and stacking
+    ds_dvm, ds_dva = calculate_dsbus_dx(sparse(y_bus), v)
+
+    j11 = ds_dva[pvpq_list, :][:, pvpq_list].real
+    j12 = ds_dvm[pvpq_list, :][:, pq_list].real
+    J21 = ds_dva[pq_list, :][:, pvpq_list].imag
+    J22 = ds_dvm[pq_list, :][:, pq_list].imag
+
+    return vstack([hstack([j11, j12]), hstack([J21, J22])])
+
+
+def run(name, max_iteration=20, tolerance=1e-8):
+    net = load_network(name)
+    create_y_bus(net)
+    load_flow_data = read_load_flow_data(load_flow_path(name))
+    p_scheduled_pu, q_scheduled_pu = set_scheduled_powers(net, load_flow_data)
+    vm, va = flat_start(net, load_flow_data)
+    get_bus_load_flow_types(net, load_flow_data)
+    net.y_bus = net.full_y_bus.copy()
+    update_y_bus(net, load_flow_data)
+    y_bus = sparse(net.y_bus)
+    pvpq_list = sorted(list(net.pq_buses) + list(net.pv_buses))
+    pq_list = sorted(list(net.pq_buses))
+
+    start = perf_counter()
+    pattern = JacobianPattern(y_bus, pvpq_list, pq_list)
+    setup_time = perf_counter() - start
+
+    print(f'{name}: {len(net.buses)} buses, Jacobian {pattern.jacobian.shape[0]}x{pattern.jacobian.shape[1]} '
+          f'with {pattern.jacobian.nnz} nonzeros, pattern setup {setup_time * 1e3:.2f} ms')
+    print(f'{"Iteration":>10}{"Slicing [ms]":>15}{"Pattern [ms]":>15}{"Speedup":>10}{"Max diff":>12}')
+    total_slicing = total_pattern = 0
+    for iteration in range(1, max_iteration + 1):
+        v = vm * exp(1j * va)
+
+        start = perf_counter()
+        J_slicing = calculate_jacobian_matrix_slicing(y_bus, v, pvpq_list, pq_list)
+        slicing_time = perf_counter() - start
+
+        start = perf_counter()
+        J = pattern.fill(y_bus, v)
+        pattern_time = perf_counter() - start
+
+        total_slicing += slicing_time
+        total_pattern += pattern_time
+        difference = abs(J_slicing - J).max()
+        print(f'{iteration:>10}{slicing_time * 1e3:>15.3f}{pattern_time * 1e3:>15.3f}'
+              f'{slicing_time / pattern_time:>9.1f}x{difference:>12.2e}')
+
+        S = calculate_injection_powers(net, v)
+        F = concatenate([S.real[pvpq_list] - p_scheduled_pu[pvpq_list],
+                         S.imag[pq_list] - q_scheduled_pu[pq_list]]).astype(float)
+        if max(abs(F)) < tolerance:
+            break
+        delta_x = -spsolve(J, F)
+        va[pvpq_list] += delta_x[:len(pvpq_list)]
+        vm[pq_list] += delta_x[len(pvpq_list):]
+
+    print(f'{"Total":>10}{total_slicing * 1e3:>15.3f}{total_pattern * 1e3:>15.3f}'
+          f'{total_slicing / total_pattern:>9.1f}x\n')
+
+
+def main():
+    for name in ['ieee300', 'lv_schutterwald']:
+        run(name)
+
+
+if __name__ == '__main__':
+    main()
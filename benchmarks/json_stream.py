@@ -0,0 +1,90 @@
+"""
+Peak memory and throughput of create_network_from_json_stream against create_network_from_json on lv_schutterwald
+and on region sized files made of copies of it with shifted element indices. Every load runs in a fresh process. Peak
+RSS includes the interpreter and the imports, which the Base column shows on its own. The peak of traced Python
+allocations during the load is measured in a second run, it includes the network that was built.
+
+Run from the directory containing the package: python -m power_system.benchmarks.json_stream
+"""
+import json
+import os
+import tempfile
+import tracemalloc
+from multiprocessing import get_context
+from time import perf_counter
+from .common import topology_path
+from ..network import Net
+from ..create.auxiliary import create_network_from_json
+from ..create.json_stream import create_network_from_json_stream, get_peak_rss_mb
+
+COPIES = [1, 10, 40]
+INDEX_KEYS = {'bus_data': ['bus_idx'], 'load_data': ['load_idx', 'bus_idx'],
+              'generator_data': ['generator_idx', 'bus_idx'], 'shunt_data': ['shunt_idx', 'bus_idx'],
+              'battery_data': ['battery_idx', 'bus_idx'], 'line_data': ['line_idx', 'from_bus_idx', 'to_bus_idx'],
+              'transformer_data': ['transformer_idx', 'from_bus_idx', 'to_bus_idx'],
+              'sop_data': ['sop_idx', 'from_bus_idx', 'to_bus_idx']}
+
+
+def create_region_file(filename, copies):
+    # Copies of lv_schutterwald side by side, every index of copy k shifted by k times the largest index plus one
+    with open(topology_path('lv_schutterwald'), 'r') as f:
+        data = json.load(f)
+    shift = 1 + max(record[key] for section, keys in INDEX_KEYS.items()
+                    for record in data[section].values() for key in keys)
+    region = {'system_data': data['system_data']}
+    for section, keys in INDEX_KEYS.items():
+        records = {}
+        for copy in range(copies):
+            for record in data[section].values():
+                record = dict(record, **{key: record[key] + copy * shift for key in keys})
+                records[str(len(records))] = record
+        region[section] = records
+    with open(filename, 'w') as f:
+        json.dump(region, f, indent=4)
+
+
+def load(loader, filename, trace):
+    # Runs in a fresh process, returns elements, seconds, peak RSS before and after loading and the traced peak in MB
+    rss_before = get_peak_rss_mb()
+    if trace:
+        tracemalloc.start()
+    net = Net()
+    start = perf_counter()
+    if loader == 'stream':
+        create_network_from_json_stream(net, filename)
+    else:
+        create_network_from_json(net, filename)
+    seconds = perf_counter() - start
+    traced_peak = tracemalloc.get_traced_memory()[1] / 2 ** 20 if trace else float('nan')
+    elements = sum(len(elements) for elements in (net.buses, net.loads, net.generators, net.shunts, net.batteries,
+                                                  net.lines, net.transformers, net.soft_open_points))
+    return elements, seconds, rss_before, get_peak_rss_mb(), traced_peak
+
+
+def measure(loader, filename):
+    context = get_context('forkserver')
+    with context.Pool(1) as pool:
+        elements, seconds, base, rss, _ = pool.apply(load, (loader, filename, False))
+    with context.Pool(1) as pool:
+        traced = pool.apply(load, (loader, filename, True))[-1]
+    return elements, seconds, base, rss, traced
+
+
+def main():
+    print(f'{"File":<12}{"MB":>7}{"Elements":>10}{"Loader":>8}{"Seconds":>9}{"Elem/s":>10}{"Base MB":>9}'
+          f'{"Peak RSS MB":>13}{"Traced MB":>11}')
+    with tempfile.TemporaryDirectory() as directory:
+        for copies in COPIES:
+            if copies == 1:
+                filename = topology_path('lv_schutterwald')
+            else:
+                filename = os.path.join(directory, f'region_{copies}.json')
+                create_region_file(filename, copies)
+            for loader in ['json', 'stream']:
+                elements, seconds, base, rss, traced = measure(loader, filename)
+                print(f'{f"x{copies}":<12}{os.path.getsize(filename) / 2 ** 20:>7.1f}{elements:>10}{loader:>8}'
+                      f'{seconds:>9.2f}{elements / seconds:>10.0f}{base:>9.1f}{rss:>13.1f}{traced:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
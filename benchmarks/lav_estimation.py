@@ -0,0 +1,101 @@
+"""
+LAV state estimation with a new linear program per iteration (former implementation) against the fixed LP structure
+with basis reuse and against IRLS, on the IEEE cases and synthetic feeders up to 5000 buses. Measurements carry
+Gaussian noise and a few gross errors.
+
+Run from the directory containing the package: python -m power_system.benchmarks.lav_estimation
+"""
+import io
+from contextlib import redirect_stdout
+from time import perf_counter
+from numpy import random, ones, zeros, exp, concatenate
+from scipy.sparse import hstack, eye as sparse_eye
+from scipy.optimize import linprog
+from .common import load_network, load_flow_path, create_synthetic_feeder
+from ..network_matrices import create_y_bus
+from ..load_flow import load_flow, run_load_flow_from_case_file
+from ..create.auxiliary import create_measurements_from_load_flow_solution
+from ..state_estimation import estimate
+
+NOISE = 1e-3
+N_GROSS_ERRORS = 5
+GROSS_ERROR = 0.5
+FORMER_LIMIT = 1000  # The former implementation cycles up to max_iteration on the feeders
+FORMER_MAX_ITERATION = 20
+
+
+def former_estimate(net, max_iteration=FORMER_MAX_ITERATION, tolerance=1e-8):
+    # Former LAV loop, dense cost vector, new [H, -H, I, -I] and a cold dual simplex solve every iteration
+    vm, va = ones(len(net.buses)), zeros(len(net.buses))
+    angle_indices = [i for i in range(len(net.buses)) if i not in net.slack_buses]
+    model = net.measurement_model
+    for iteration in range(1, max_iteration + 1):
+        v = vm * exp(1j * va)
+        H = model.jacobian(v, angle_indices)
+        r = model.z - model.hx(v)
+        m, n = H.shape
+        C = concatenate((zeros((1, n)), zeros((1, n)), ones((1, m)), ones((1, m))), axis=1)
+        A = hstack((H, -H, sparse_eye(m, format='csc'), -sparse_eye(m, format='csc')))
+        sol = linprog(c=C, A_eq=A, b_eq=r, method='highs-ds').x
+        dx = sol[0:n] - sol[n:2 * n]
+        va[angle_indices] += dx[:len(angle_indices)]
+        vm += dx[len(angle_indices):]
+        if abs(dx).max() < tolerance:
+            return vm, iteration
+    return vm, None
+
+
+def prepare(name):
+    if isinstance(name, int):
+        net, p_scheduled_pu, q_scheduled_pu, vm, va = create_synthetic_feeder(name)
+        with redirect_stdout(io.StringIO()):
+            load_flow(net, p_scheduled_pu, q_scheduled_pu, vm, va)
+    else:
+        net = load_network(name)
+        create_y_bus(net)
+        with redirect_stdout(io.StringIO()):
+            run_load_flow_from_case_file(net, load_flow_path(name))
+    create_measurements_from_load_flow_solution(net)
+
+    rng = random.default_rng(0)
+    measurements = list(net.bus_measurements.values()) + list(net.branch_measurements.values())
+    for measurement in measurements:
+        measurement.value_pu += rng.normal(0, NOISE)
+    for measurement in rng.choice(measurements, N_GROSS_ERRORS, replace=False):
+        measurement.value_pu += GROSS_ERROR
+    net.invalidate_measurement_model()
+    return net
+
+
+def report(name, net, label, elapsed, vm, iterations):
+    iterations = 'no conv.' if iterations is None else str(iterations)
+    print(f'{str(name):<10}{len(net.buses):>8}{label:<20}{elapsed:>10.2f}{iterations:>12}'
+          f'{abs(vm - net.vm).max():>14.2e}')
+
+
+def run(name):
+    net = prepare(name)
+    if len(net.buses) <= FORMER_LIMIT:
+        start = perf_counter()
+        vm, iterations = former_estimate(net)
+        report(name, net, '  former LP', perf_counter() - start, vm, iterations)
+
+    for algorithm, tolerance in [('LAV', 1e-8), ('LAV_IRLS', 1e-8), ('LAV_IRLS', 1e-5)]:
+        output = io.StringIO()
+        start = perf_counter()
+        with redirect_stdout(output):
+            estimate(net, algorithm=algorithm, tolerance=tolerance, max_iteration=500)
+        elapsed = perf_counter() - start
+        message = output.getvalue().strip()
+        iterations = message.rsplit(' ', 1)[-1] if 'Converged' in message else None
+        report(name, net, f'  {algorithm} {tolerance:.0e}', elapsed, net.vm_estimated, iterations)
+
+
+def main():
+    print(f'{"Network":<10}{"Buses":>8}{"Algorithm":<20}{"Time (s)":>10}{"Iterations":>12}{"Max |dvm|":>14}')
+    for name in ['ieee14', 'ieee57', 'ieee118', 'ieee300', 1000, 2000, 5000]:
+        run(name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Repeated Newton-Raphson solves with spsolve, with the cached-ordering SparseLUSolver and with dishonest Newton.
+
+Run from the directory containing the package: python -m power_system.benchmarks.linear_solver
+"""
+import io
+from contextlib import redirect_stdout
+from time import perf_counter
+from scipy.sparse.linalg import spsolve
+from .common import load_network, load_flow_path
+from ..network_matrices import create_y_bus
+from ..linear_solver import SparseLUSolver
+from ..load_flow import (read_load_flow_data, set_scheduled_powers, flat_start, get_bus_load_flow_types, update_y_bus,
+                         load_flow)
+
+
+class SpsolveSolver:
+    # Reference: ordering, symbolic and numeric factorization on every call
+    def __init__(self):
+        self.reuse_factorization = 1
+        self.factorizations = 0
+
+    def reset(self):
+        pass
+
+    def solve(self, matrix, b):
+        self.factorizations += 1
+        return spsolve(matrix, b)
+
+
+def run(name, repeat=20):
+    net = load_network(name)
+    create_y_bus(net)
+    load_flow_data = read_load_flow_data(load_flow_path(name))
+    p_scheduled_pu, q_scheduled_pu = set_scheduled_powers(net, load_flow_data)
+    get_bus_load_flow_types(net, load_flow_data)
+    net.y_bus = net.full_y_bus.copy()
+    update_y_bus(net, load_flow_data)
+
+    print(f'{name}: {len(net.buses)} buses, {repeat} repeated load flows')
+    print(f'{"Solver":<28}{"Total [ms]":>12}{"Per solve [ms]":>16}{"Factorizations":>16}{"Max |dvm|":>12}')
+    reference = None
+    for label, solver, reuse in [('spsolve', SpsolveSolver(), 1),
+                                 ('SparseLUSolver', SparseLUSolver(), 1),
+                                 ('SparseLUSolver, reuse 2', SparseLUSolver(), 2),
+                                 ('SparseLUSolver, reuse 3', SparseLUSolver(), 3)]:
+        net.load_flow_solver = solver
+        start = perf_counter()
+        for _ in range(repeat):
+            vm, va = flat_start(net, load_flow_data)
+            with redirect_stdout(io.StringIO()):
+                load_flow(net, p_scheduled_pu, q_scheduled_pu, vm, va, reuse_factorization=reuse)
+        elapsed = perf_counter() - start
+        if reference is None:
+            reference = net.vm.copy()
+        print(f'{label:<28}{elapsed * 1e3:>12.1f}{elapsed / repeat * 1e3:>16.2f}'
+              f'{solver.factorizations:>16}{abs(net.vm - reference).max():>12.2e}')
+    print()
+
+
+def main():
+    for name in ['ieee300', 'lv_schutterwald']:
+        run(name)
+
+
+if __name__ == '__main__':
+    main()
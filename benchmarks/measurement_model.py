@@ -0,0 +1,89 @@
+"""
+Evaluation of h(x) and the measurement Jacobian with the compiled measurement model against evaluating every bus and
+branch quantity and selecting the measured rows, for a sparse SCADA-like measurement set.
+
+Run from the directory containing the package: python -m power_system.benchmarks.measurement_model
+"""
+import io
+from contextlib import redirect_stdout
+from time import perf_counter
+from numpy import random, exp, conj, concatenate
+from scipy.sparse import csr_matrix, vstack, hstack
+from .common import load_network, load_flow_path, create_synthetic_feeder, best_of
+from ..ds_dx import calculate_dsbus_dx, calculate_dsbranch_dx
+from ..network_matrices import create_y_bus
+from ..load_flow import prepare_load_flow_from_case_file, load_flow
+from ..create.create_element import create_bus_measurement, create_branch_measurement
+
+
+def create_sparse_measurements(net, share=0.2, seed=0):
+    # Voltage, injection and flow measurements on a random share of the buses and branches
+    rng = random.default_rng(seed)
+    arrays = net.arrays
+    v = net.vm * exp(1j * net.va)
+    s_bus = v * conj(net.y_bus * v)
+    s_flow = v[arrays.branch_from] * conj(net.y_bus_from_to * v)
+    idx = 0
+    for bus in rng.choice(arrays.n_buses, int(share * arrays.n_buses), replace=False).tolist():
+        for measurement_type, value in [('v_magnitude', abs(v[bus])), ('p_injection', s_bus[bus].real),
+                                        ('q_injection', s_bus[bus].imag)]:
+            create_bus_measurement(net, idx, int(arrays.bus_idx[bus]), 0.01, value, measurement_type)
+            idx += 1
+    idx = 0
+    for branch in rng.choice(arrays.n_branches, int(share * arrays.n_branches), replace=False).tolist():
+        i, j = int(arrays.bus_idx[arrays.branch_from[branch]]), int(arrays.bus_idx[arrays.branch_to[branch]])
+        for measurement_type, value in [('p_flow', s_flow[branch].real), ('q_flow', s_flow[branch].imag)]:
+            create_branch_measurement(net, idx, i, j, 0.01, value, measurement_type)
+            idx += 1
+
+
+def full_evaluation(net, v, angle_indices, model):
+    # Every bus and branch quantity and derivative, then the rows of the measured locations
+    locations = model.locations
+    arrays = net.arrays
+    s_bus = v * conj(net.y_bus * v)
+    s_flow = v[arrays.branch_from] * conj(net.y_bus_from_to * v)
+    hx = concatenate([abs(v[locations.v_magnitude_bus]), s_bus.real[locations.p_injection_bus],
+                      s_bus.imag[locations.q_injection_bus], s_flow.real[locations.p_flow_branch],
+                      s_flow.imag[locations.q_flow_branch]])
+    dsbus_dvm, dsbus_dva = calculate_dsbus_dx(csr_matrix(net.y_bus), v)
+    dsbranch_dvm, dsbranch_dva = calculate_dsbranch_dx(net.y_bus_from_to, arrays.branch_from, v)
+    rows = (locations.p_injection_bus, locations.q_injection_bus, locations.p_flow_branch, locations.q_flow_branch)
+    jac_va = vstack((dsbus_dva[rows[0]].real, dsbus_dva[rows[1]].imag,
+                     dsbranch_dva[rows[2]].real, dsbranch_dva[rows[3]].imag), format='csc')
+    jac_vm = vstack((dsbus_dvm[rows[0]].real, dsbus_dvm[rows[1]].imag,
+                     dsbranch_dvm[rows[2]].real, dsbranch_dvm[rows[3]].imag), format='csr')
+    return hx, hstack((jac_va[:, angle_indices], jac_vm), format='csr')
+
+
+def run(name, net):
+    create_sparse_measurements(net)
+    v = net.vm * exp(1j * net.va)
+    angle_indices = [i for i in range(len(net.buses)) if i not in net.slack_buses]
+
+    start = perf_counter()
+    model = net.measurement_model
+    compile_time = perf_counter() - start
+    full_time = best_of(lambda: full_evaluation(net, v, angle_indices, model))
+    model_time = best_of(lambda: (model.hx(v), model.jacobian(v, angle_indices)))
+    print(f'{name:<18}{len(net.buses):>8}{model.n_measurements:>14}{compile_time * 1e3:>14.1f}'
+          f'{full_time * 1e3:>12.2f}{model_time * 1e3:>12.2f}')
+
+
+def main():
+    print(f'{"Network":<18}{"Buses":>8}{"Measurements":>14}{"Compile ms":>14}{"Full ms":>12}{"Model ms":>12}')
+    for name in ['ieee300', 'lv_schutterwald']:
+        net = load_network(name)
+        create_y_bus(net)
+        p_scheduled_pu, q_scheduled_pu, vm, va = prepare_load_flow_from_case_file(net, load_flow_path(name))
+        with redirect_stdout(io.StringIO()):
+            load_flow(net, p_scheduled_pu, q_scheduled_pu, vm, va)
+        run(name, net)
+    net, p_scheduled_pu, q_scheduled_pu, vm, va = create_synthetic_feeder(10000)
+    with redirect_stdout(io.StringIO()):
+        load_flow(net, p_scheduled_pu, q_scheduled_pu, vm, va)
+    run('synthetic', net)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Topological observability analysis and meter placement on the IEEE cases and lv_schutterwald with a random fraction of
+the measurements of a full load flow measurement set kept. The analysis is compared with the numerical rank of the
+dense measurement Jacobian at flat start, which is only computed on the smaller networks.
+
+Run from the directory containing the package: python -m power_system.benchmarks.observability
+"""
+import io
+from contextlib import redirect_stdout
+from time import perf_counter
+from numpy import random, ones
+from numpy.linalg import matrix_rank
+from .common import load_network, load_flow_path
+from ..network_matrices import create_y_bus
+from ..load_flow import run_load_flow_from_case_file
+from ..create.auxiliary import create_measurements_from_load_flow_solution
+from ..observability import analyze_observability, place_meters
+
+FRACTIONS = [1.0, 0.5, 0.2]
+MAX_RANK_BUSES = 300
+
+
+def prepare(name, fraction, rng):
+    net = load_network(name)
+    create_y_bus(net)
+    with redirect_stdout(io.StringIO()):
+        run_load_flow_from_case_file(net, load_flow_path(name))
+    create_measurements_from_load_flow_solution(net)
+    for measurements in (net.bus_measurements, net.branch_measurements):
+        for key in [key for key in measurements if rng.random() >= fraction]:
+            del measurements[key]
+    net.invalidate_measurement_model()
+    return net
+
+
+def numerical_rank(net):
+    # Rank of the full Jacobian against the number of states, with the slack angles as references
+    model = net.measurement_model
+    angle_indices = [i for i in range(len(net.buses)) if i not in net.slack_buses]
+    H = model.jacobian(ones(len(net.buses), dtype=complex), angle_indices)
+    return matrix_rank(H.toarray()), H.shape[1]
+
+
+def run(name, fraction):
+    net = prepare(name, fraction, random.default_rng(0))
+    start = perf_counter()
+    result = analyze_observability(net)
+    analysis_time = perf_counter() - start
+
+    start = perf_counter()
+    meters = place_meters(net)
+    placement_time = perf_counter() - start
+
+    rank = '-'
+    if len(net.buses) <= MAX_RANK_BUSES:
+        rank, n_states = numerical_rank(net)
+        rank = f'{rank}/{n_states}'
+    print(f'{name:<16}{fraction:>6.1f}{net.measurement_model.n_measurements:>8}{str(result.observable):>12}'
+          f'{len(result.angle_islands):>8}{len(result.magnitude_islands):>8}{len(result.pseudo_measurements):>8}'
+          f'{rank:>12}{analysis_time:>12.3f}{len(meters):>8}{placement_time:>13.3f}')
+
+
+def main():
+    print(f'{"Network":<16}{"Kept":>6}{"Meas.":>8}{"Observable":>12}{"P isl.":>8}{"Q isl.":>8}{"Pseudo":>8}'
+          f'{"Rank":>12}{"Analysis s":>12}{"Meters":>8}{"Placement s":>13}')
+    for name in ['ieee14', 'ieee118', 'ieee300', 'lv_schutterwald']:
+        for fraction in FRACTIONS:
+            run(name, fraction)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Process-pool scenario and contingency runs against the single-process equivalents.
+
+Run from the directory containing the package: python -m power_system.benchmarks.parallel
+"""
+import os
+from time import perf_counter
+from numpy import asarray
+from .common import load_network, load_flow_path
+from .scenarios import scaled_injections
+from ..network_matrices import create_y_bus
+from ..load_flow import prepare_load_flow_from_case_file
+from ..scenarios import run_load_flow_scenarios
+from ..parallel import create_network_snapshot, SnapshotSolver, run_parallel_scenarios, run_parallel_contingencies
+
+
+def run_scenarios(name, n_scenarios=400, chunk_size=25):
+    net = load_network(name)
+    create_y_bus(net)
+    p_scheduled_pu, q_scheduled_pu, vm, va = prepare_load_flow_from_case_file(net, load_flow_path(name))
+    p_scenarios, q_scenarios = scaled_injections(p_scheduled_pu, q_scheduled_pu, n_scenarios)
+
+    start = perf_counter()
+    vm_serial = run_load_flow_scenarios(net, p_scenarios, q_scenarios, vm, va)[0]
+    serial_time = perf_counter() - start
+
+    print(f'{name}: {n_scenarios} scenarios, chunk size {chunk_size}')
+    print(f'{"Processes":>10}{"Scenarios/s":>14}{"Max |dvm|":>12}')
+    print(f'{"serial":>10}{n_scenarios / serial_time:>14.1f}')
+    for processes in sorted({1, 2, os.cpu_count()}):
+        start = perf_counter()
+        vm_parallel = run_parallel_scenarios(net, p_scenarios, q_scenarios, vm, va, processes=processes,
+                                             chunk_size=chunk_size)[0]
+        elapsed = perf_counter() - start
+        print(f'{processes:>10}{n_scenarios / elapsed:>14.1f}{abs(vm_parallel - vm_serial).max():>12.2e}')
+    print()
+
+
+def run_contingencies(name, chunk_size=8):
+    net = load_network(name)
+    create_y_bus(net)
+    p_scheduled_pu, q_scheduled_pu, vm, va = prepare_load_flow_from_case_file(net, load_flow_path(name))
+    vm, va = run_load_flow_scenarios(net, p_scheduled_pu.T, q_scheduled_pu.T, vm, va)[:2]
+    contingencies = [(branch,) for branch in range(net.arrays.n_branches)]
+
+    start = perf_counter()
+    snapshot_solver = SnapshotSolver(create_network_snapshot(net, p_scheduled_pu, q_scheduled_pu, vm[0], va[0]))
+    vm_serial = asarray([snapshot_solver.solve_contingency(branches)[0] for branches in contingencies])
+    serial_time = perf_counter() - start
+
+    print(f'{name}: {len(contingencies)} single branch outages, chunk size {chunk_size}')
+    print(f'{"Processes":>10}{"Outages/s":>14}{"Max |dvm|":>12}')
+    print(f'{"serial":>10}{len(contingencies) / serial_time:>14.1f}')
+    for processes in sorted({1, 2, os.cpu_count()}):
+        start = perf_counter()
+        vm_parallel = run_parallel_contingencies(net, contingencies, p_scheduled_pu, q_scheduled_pu, vm[0], va[0],
+                                                 processes=processes, chunk_size=chunk_size)[0]
+        elapsed = perf_counter() - start
+        print(f'{processes:>10}{len(contingencies) / elapsed:>14.1f}{abs(vm_parallel - vm_serial).max():>12.2e}')
+    print()
+
+
+def main():
+    run_scenarios('lv_schutterwald')
+    run_contingencies('ieee118')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Backward/forward sweep against Newton-Raphson on the distribution feeders. test_data/results has no reference for
+these cases, Newton-Raphson is the reference.
+
+Run from the directory containing the package: python -m power_system.benchmarks.radial_load_flow
+"""
+import io
+from contextlib import redirect_stdout
+from .common import load_network, load_flow_path, best_of
+from ..network_matrices import create_y_bus
+from ..load_flow import prepare_load_flow_from_case_file, load_flow
+
+
+def run(name):
+    net = load_network(name)
+    create_y_bus(net)
+    p_scheduled_pu, q_scheduled_pu, vm, va = prepare_load_flow_from_case_file(net, load_flow_path(name))
+
+    print(f'{name}: {len(net.buses)} buses, {int(net.arrays.branch_closed.sum())} closed branches')
+    print(f'{"Method":<8}{"Time (ms)":>12}{"Iterations":>12}{"Max |dvm|":>12}{"Max |dva|":>12}')
+    reference = None
+    for method in ['NR', 'BFS']:
+        output = io.StringIO()
+
+        def solve():
+            with redirect_stdout(output):
+                load_flow(net, p_scheduled_pu, q_scheduled_pu, vm.copy(), va.copy(), method=method)
+
+        elapsed = best_of(solve)
+        iterations = output.getvalue().splitlines()[-1].rsplit(' ', 1)[-1]
+        if reference is None:
+            reference = net.vm, net.va
+        print(f'{method:<8}{elapsed * 1e3:>12.2f}{iterations:>12}{abs(net.vm - reference[0]).max():>12.2e}'
+              f'{abs(net.va - reference[1]).max():>12.2e}')
+    print()
+
+
+def main():
+    for name in ['ieee33', 'Aedas', 'lv_schutterwald']:
+        run(name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Loss minimizing reconfiguration by branch exchange. The search solves every candidate configuration with switching
+in place and Woodbury updates of the factorized Jacobian of the current configuration. The reference solves one
+configuration the way it was done before, with a case file listing its open lines and run_load_flow_from_case_file
+on a freshly loaded network. The losses of the final configuration are compared between both.
+
+Run from the directory containing the package: python -m power_system.benchmarks.reconfiguration
+"""
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+from .common import load_network, load_flow_path, best_of
+from ..network_matrices import create_y_bus
+from ..load_flow import read_load_flow_data, run_load_flow_from_case_file
+from ..reconfiguration import run_reconfiguration_from_case_file, calculate_losses_mw
+
+CASES = [('ieee33', None), ('lv_schutterwald', 3)]
+
+
+def reference_losses(name, case):
+    net = load_network(name)
+    create_y_bus(net)
+    with redirect_stdout(io.StringIO()):
+        run_load_flow_from_case_file(net, case)
+    return calculate_losses_mw(net, net.y_bus, net.vm, net.va)
+
+
+def run(name, max_exchanges):
+    net = load_network(name)
+    create_y_bus(net)
+    result = run_reconfiguration_from_case_file(net, load_flow_path(name), max_exchanges=max_exchanges)
+
+    with tempfile.TemporaryDirectory() as directory:
+        data = read_load_flow_data(load_flow_path(name))
+        data['open_line'] = {str(key): idx for key, (_, idx) in enumerate(result.elements)}
+        case = os.path.join(directory, f'{name}_load_flow.json')
+        with open(case, 'w') as f:
+            json.dump(data, f)
+        losses = reference_losses(name, case)
+        reference_time = best_of(lambda: reference_losses(name, case), repeat=3)
+
+    limit = 'until no exchange reduces the losses' if max_exchanges is None else f'limited to {max_exchanges} exchanges'
+    print(f'{name}: {net.arrays.n_lines} lines, {len(result.open_branches)} open, {limit}')
+    print(f'  Losses {result.initial_losses_mw * 1e3:.3f} kW -> {result.losses_mw * 1e3:.3f} kW after '
+          f'{len(result.exchanges)} exchanges')
+    if len(result.elements) <= 10:
+        print(f'  Open lines {[idx for _, idx in result.elements]}')
+    print(f'  Branch exchange      {result.seconds:8.2f} s  {result.configurations:6} configurations '
+          f'({result.configurations_per_second:8.1f}/s), {result.cache_hits} cached, {result.fallbacks} full '
+          f'Newton-Raphson')
+    print(f'  Case file load flow  {reference_time:8.2f} s  per configuration ({1 / reference_time:8.1f}/s)')
+    print(f'  Losses of the final configuration against the case file: {abs(result.losses_mw - losses) * 1e3:.1e} kW')
+    print()
+
+
+def main():
+    for name, max_exchanges in CASES:
+        run(name, max_exchanges)
+
+
+if __name__ == '__main__':
+    main()
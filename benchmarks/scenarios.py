@@ -0,0 +1,60 @@
+"""
+Throughput of the batched multi-scenario load flow against one load_flow call per scenario from a flat start.
+
+Run from the directory containing the package: python -m power_system.benchmarks.scenarios
+"""
+import io
+from contextlib import redirect_stdout
+from time import perf_counter
+from numpy import random, asarray
+from .common import load_network, load_flow_path
+from ..network_matrices import create_y_bus
+from ..load_flow import prepare_load_flow_from_case_file, load_flow
+from ..scenarios import run_load_flow_scenarios
+
+
+def scaled_injections(p_scheduled_pu, q_scheduled_pu, n_scenarios, seed=0):
+    # Random walk of per-bus scaling factors, similar to consecutive time steps of a profile
+    rng = random.default_rng(seed)
+    steps = rng.normal(0, 0.002, (n_scenarios, len(p_scheduled_pu)))
+    factors = (1 + steps.cumsum(axis=0)).clip(0.9, 1.1)
+    return factors * asarray(p_scheduled_pu, dtype=float).ravel(), factors * asarray(q_scheduled_pu, dtype=float).ravel()
+
+
+def run(name, n_scenarios=200):
+    net = load_network(name)
+    create_y_bus(net)
+    p_scheduled_pu, q_scheduled_pu, vm, va = prepare_load_flow_from_case_file(net, load_flow_path(name))
+    p_scenarios, q_scenarios = scaled_injections(p_scheduled_pu, q_scheduled_pu, n_scenarios)
+
+    start = perf_counter()
+    vm_sequential = []
+    for scenario in range(n_scenarios):
+        with redirect_stdout(io.StringIO()):
+            load_flow(net, p_scenarios[scenario], q_scenarios[scenario], vm.copy(), va.copy())
+        vm_sequential.append(net.vm)
+    sequential_time = perf_counter() - start
+
+    results = {}
+    for warm_start in [False, True]:
+        start = perf_counter()
+        results[warm_start] = run_load_flow_scenarios(net, p_scenarios, q_scenarios, vm, va, warm_start=warm_start)
+        results[warm_start] += (perf_counter() - start,)
+
+    print(f'{name}: {len(net.buses)} buses, {n_scenarios} scenarios')
+    print(f'{"Method":<30}{"Scenarios/s":>14}{"Iterations":>12}{"Converged":>11}{"Max |dvm|":>12}')
+    print(f'{"load_flow per scenario":<30}{n_scenarios / sequential_time:>14.1f}{"":>12}{"":>11}{"":>12}')
+    for warm_start, label in [(False, 'batched, flat start'), (True, 'batched, warm start')]:
+        vm_batched, va_batched, iterations, converged, elapsed = results[warm_start]
+        print(f'{label:<30}{n_scenarios / elapsed:>14.1f}{iterations.sum():>12}{converged.sum():>11}'
+              f'{abs(vm_batched - asarray(vm_sequential)).max():>12.2e}')
+    print()
+
+
+def main():
+    for name in ['ieee118', 'ieee300', 'lv_schutterwald']:
+        run(name)
+
+
+if __name__ == '__main__':
+    main()
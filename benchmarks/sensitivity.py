@@ -0,0 +1,89 @@
+"""
+PTDF, LODF and voltage sensitivities computed by column through one factorization, against the dense inverse of
+the reduced DC B matrix and against re-running the load flow with a perturbed injection for every question.
+Planning questions only ask for a few columns ("what happens if the load at these ten buses moves"), the full
+matrices are timed too.
+
+Run from the directory containing the package: python -m power_system.benchmarks.sensitivity
+"""
+import io
+from contextlib import redirect_stdout
+from time import perf_counter
+from numpy import random, zeros, ix_, isnan
+from numpy.linalg import inv
+from .common import load_network, load_flow_path
+from ..network_matrices import create_y_bus, create_dc_b_matrices
+from ..load_flow import prepare_load_flow_from_case_file, load_flow
+from ..sensitivity import DistributionFactors, VoltageSensitivities
+
+QUESTIONS = 10
+EPSILON = 1e-6
+
+
+def timed(function):
+    start = perf_counter()
+    result = function()
+    return result, perf_counter() - start
+
+
+def dense_ptdf(net):
+    b_bus, b_branch = create_dc_b_matrices(net)
+    buses = DistributionFactors(net).dc_load_flow.buses
+    inverse = zeros(b_bus.shape)
+    inverse[ix_(buses, buses)] = inv(b_bus[buses][:, buses].toarray())
+    return b_branch @ inverse
+
+
+def run(name, rng):
+    net = load_network(name)
+    create_y_bus(net)
+    p_scheduled_pu, q_scheduled_pu, vm, va = prepare_load_flow_from_case_file(net, load_flow_path(name))
+    with redirect_stdout(io.StringIO()):
+        load_flow(net, p_scheduled_pu, q_scheduled_pu, vm, va)
+    arrays = net.arrays
+    buses = rng.choice(sorted(net.pq_buses), QUESTIONS, replace=False)
+    branches = rng.choice(arrays.branch_closed.nonzero()[0], QUESTIONS, replace=False)
+
+    factors, setup_time = timed(lambda: DistributionFactors(net))
+    ptdf, columns_time = timed(lambda: factors.ptdf(buses))
+    lodf, lodf_time = timed(lambda: factors.lodf(branches))
+    full_ptdf, full_time = timed(lambda: DistributionFactors(net).ptdf())
+    dense, dense_time = timed(lambda: dense_ptdf(net))
+    print(f'{name}: {arrays.n_buses} buses, {arrays.n_branches} branches')
+    print(f'  Factorization of B              {setup_time * 1e3:9.1f} ms')
+    print(f'  {QUESTIONS} PTDF columns                 {columns_time * 1e3:9.1f} ms')
+    print(f'  {QUESTIONS} LODF columns                 {lodf_time * 1e3:9.1f} ms  '
+          f'({int(isnan(lodf[0]).sum())} islanding outages)')
+    print(f'  Full PTDF by column             {full_time * 1e3:9.1f} ms')
+    print(f'  Full PTDF with a dense inverse  {dense_time * 1e3:9.1f} ms, max difference '
+          f'{abs(full_ptdf - dense).max():.1e}, columns asked {abs(ptdf - dense[:, buses]).max():.1e}')
+
+    sensitivities, setup_time = timed(lambda: VoltageSensitivities(net))
+    (dvm, _), columns_time = timed(lambda: sensitivities.sensitivities('p', buses))
+    vm_base, va_base = net.vm.copy(), net.va.copy()
+    start = perf_counter()
+    difference = 0.0
+    for k, bus in enumerate(buses.tolist()):
+        p_perturbed = p_scheduled_pu.copy()
+        p_perturbed[bus] += EPSILON
+        vm_perturbed, va_perturbed = vm_base.copy(), va_base.copy()
+        with redirect_stdout(io.StringIO()):
+            load_flow(net, p_perturbed, q_scheduled_pu, vm_perturbed, va_perturbed, tolerance=1e-12)
+        difference = max(difference, abs((vm_perturbed - vm_base) / EPSILON - dvm[:, k]).max())
+    load_flow_time = perf_counter() - start
+    net.vm, net.va = vm_base, va_base
+    print(f'  Factorization of the Jacobian   {setup_time * 1e3:9.1f} ms')
+    print(f'  {QUESTIONS} dvm/dp columns               {columns_time * 1e3:9.1f} ms')
+    print(f'  {QUESTIONS} perturbed load flows         {load_flow_time * 1e3:9.1f} ms, max difference to the '
+          f'finite differences {difference:.1e}')
+    print()
+
+
+def main():
+    rng = random.default_rng(0)
+    for name in ['ieee118', 'ieee300', 'lv_schutterwald']:
+        run(name, rng)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Repeated load flows with a LoadFlowSession against run_load_flow_from_case_file, which rebuilds the matrices,
+switching state and bus types of the case and prints on every call. The case is read once for the session, which
+then solves it from its flat start, warm-started after a 1% load change and after switching a branch. What every
+solve rebuilt, its timings and mismatch history are shown, and the voltages are checked against load_flow.
+
+Run from the directory containing the package: python -m power_system.benchmarks.session
+"""
+import io
+from contextlib import redirect_stdout
+from time import perf_counter
+from .common import load_network, load_flow_path
+from ..network_matrices import create_y_bus
+from ..load_flow import read_load_flow_case, run_load_flow_from_case_file
+from ..session import LoadFlowSession
+
+REPEATS = 20
+
+
+def describe(label, result):
+    rebuilt = ', '.join(result.rebuilt) or 'nothing'
+    print(f'  {label:<22} {result.iterations:2d} iterations  setup {result.setup_seconds * 1e3:7.2f} ms  solve '
+          f'{result.solve_seconds * 1e3:7.2f} ms  rebuilt {rebuilt}')
+
+
+def run(name):
+    path = load_flow_path(name)
+    net = load_network(name)
+    create_y_bus(net)
+    start = perf_counter()
+    with redirect_stdout(io.StringIO()):
+        for _ in range(REPEATS):
+            run_load_flow_from_case_file(net, path)
+    case_file_time = (perf_counter() - start) / REPEATS
+    vm, va = net.vm, net.va
+
+    net = load_network(name)
+    session = LoadFlowSession(net)
+    case = read_load_flow_case(net, path)
+    first = session.solve_case(case)
+    start = perf_counter()
+    for _ in range(REPEATS):
+        repeated = session.solve_case(case)
+    session_time = (perf_counter() - start) / REPEATS
+    scaled = session.solve(case.p_scheduled_pu * 1.01, case.q_scheduled_pu * 1.01)
+    closed = session.closed.copy()
+    closed[closed.nonzero()[0][-1]] = False
+    session.set_switching_state(closed)
+    switched = session.solve(case.p_scheduled_pu, case.q_scheduled_pu)
+
+    print(f'{name}: {net.arrays.n_buses} buses, {net.arrays.n_branches} branches')
+    print(f'  run_load_flow_from_case_file {case_file_time * 1e3:8.2f} ms per call')
+    print(f'  LoadFlowSession.solve_case   {session_time * 1e3:8.2f} ms per call, max difference '
+          f'{max(abs(repeated.vm - vm).max(), abs(repeated.va - va).max()):.1e}')
+    describe('first solve', first)
+    describe('repeated solve', repeated)
+    describe('1% more load, warm', scaled)
+    describe('one branch opened', switched)
+    print(f'  Mismatch history         {" ".join(f"{mismatch:.1e}" for mismatch in first.mismatch_history)}')
+    print()
+
+
+def main():
+    for name in ['ieee118', 'ieee300', 'lv_schutterwald']:
+        run(name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Memory and time of one WLS iteration (measurement vector, Jacobian and gain matrix) with the former dense Jacobian
+against the sparse one, on synthetic radial feeders up to 10k buses with full measurement sets.
+
+Run from the directory containing the package: python -m power_system.benchmarks.state_estimation
+"""
+import io
+import tracemalloc
+from contextlib import redirect_stdout
+from time import perf_counter
+from numpy import exp, zeros, eye, c_, r_, diagflat
+from scipy.sparse import csr_matrix, vstack, hstack
+from .common import create_synthetic_feeder, best_of
+from ..ds_dx import calculate_dsbus_dx, calculate_dsbranch_dx
+from ..load_flow import load_flow
+from ..create.auxiliary import create_measurements_from_load_flow_solution
+from ..state_estimation import create_measurement_vector, create_jacobian_matrix, estimate
+
+DENSE_LIMIT = 1000  # The dense weight matrix alone is (measurements x measurements)
+
+
+def dense_measurement_vector(net):
+    z, r_inv = create_measurement_vector(net)
+    return z, csr_matrix(diagflat(r_inv.diagonal()))
+
+
+def dense_jacobian_matrix(net, v, angle_indices, magnitude_indices):
+    # Former implementation, dense blocks for the voltage rows and a dense copy of the stacked Jacobian
+    dsbus_dvm, dsbus_dva = calculate_dsbus_dx(net.y_bus, v)
+    dsbranch_dvm, dsbranch_dva = calculate_dsbranch_dx(net.y_bus_from_to, net.arrays.branch_from, v)
+    v_jac_va, v_jac_vm = zeros((v.shape[0], v.shape[0])), eye(v.shape[0], v.shape[0])
+    s_jac_va = vstack((dsbus_dva.real, dsbus_dva.imag, dsbranch_dva.real, dsbranch_dva.imag))
+    s_jac_vm = vstack((dsbus_dvm.real, dsbus_dvm.imag, dsbranch_dvm.real, dsbranch_dvm.imag))
+    s_jac = hstack((s_jac_va, s_jac_vm)).toarray()
+    H = r_[c_[v_jac_va, v_jac_vm], s_jac]
+    return csr_matrix(H[:, angle_indices + magnitude_indices])
+
+
+def measure(function):
+    # Time without tracing, then the traced peak allocation of a second call
+    elapsed = best_of(function, repeat=3)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def run(n_buses):
+    net, p_scheduled_pu, q_scheduled_pu, vm, va = create_synthetic_feeder(n_buses)
+    with redirect_stdout(io.StringIO()):
+        load_flow(net, p_scheduled_pu, q_scheduled_pu, vm, va)
+    create_measurements_from_load_flow_solution(net)
+    v = net.vm * exp(1j * net.va)
+    angle_indices = [i for i in range(n_buses) if i not in net.slack_buses]
+    magnitude_indices = list(range(n_buses, 2 * n_buses))
+
+    def sparse_iteration():
+        z, r_inv = create_measurement_vector(net)
+        H = create_jacobian_matrix(net, v, angle_indices, magnitude_indices)
+        return H.T * (r_inv * H)
+
+    def dense_iteration():
+        z, r_inv = dense_measurement_vector(net)
+        H = dense_jacobian_matrix(net, v, angle_indices, magnitude_indices)
+        return H.T * (r_inv * H)
+
+    sparse_time, sparse_peak = measure(sparse_iteration)
+    if n_buses <= DENSE_LIMIT:
+        dense_time, dense_peak = measure(dense_iteration)
+        dense = f'{dense_time * 1e3:>12.1f}{dense_peak / 2 ** 20:>12.1f}'
+    else:
+        dense = f'{"-":>12}{"-":>12}'
+
+    start = perf_counter()
+    with redirect_stdout(io.StringIO()):
+        estimate(net)
+    estimate_time = perf_counter() - start
+    error = abs(net.vm_estimated - net.vm).max()
+    print(f'{n_buses:>8}{len(net.bus_measurements) + len(net.branch_measurements):>14}{dense}'
+          f'{sparse_time * 1e3:>12.1f}{sparse_peak / 2 ** 20:>12.1f}{estimate_time * 1e3:>14.1f}{error:>12.1e}')
+
+
+def main():
+    print(f'{"":>22}{"Dense iteration":>24}{"Sparse iteration":>24}')
+    print(f'{"Buses":>8}{"Measurements":>14}{"ms":>12}{"MiB":>12}{"ms":>12}{"MiB":>12}{"Estimate ms":>14}'
+          f'{"Max |dvm|":>12}')
+    for n_buses in [100, 500, 1000, 2000, 5000, 10000]:
+        run(n_buses)
+
+
+if __name__ == '__main__':
+    main()
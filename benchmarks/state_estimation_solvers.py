@@ -0,0 +1,63 @@
+"""
+Normal equations against Hachtel's augmented matrix for WLS state estimation on ieee14 to ieee300, with equal
+measurement accuracies and with PMU-grade voltage magnitudes mixed with pseudo-measurement injections.
+
+Run from the directory containing the package: python -m power_system.benchmarks.state_estimation_solvers
+"""
+import io
+from contextlib import redirect_stdout
+from time import perf_counter
+from numpy import errstate
+from .common import load_network, load_flow_path
+from ..network_matrices import create_y_bus
+from ..load_flow import run_load_flow_from_case_file
+from ..create.auxiliary import create_measurements_from_load_flow_solution
+from ..state_estimation import estimate
+
+MEASUREMENT_SETS = {
+    'equal': {},
+    'mixed': {'v_magnitude': 1e-4, 'p_injection': 0.3, 'q_injection': 0.3},
+}
+
+
+def set_accuracies(net, std_devs):
+    for measurements in (net.bus_measurements, net.branch_measurements):
+        for measurement in measurements.values():
+            measurement.std_dev = std_devs.get(measurement.measurement_type, measurement.std_dev)
+    net.invalidate_measurement_model()
+
+
+def run(name):
+    net = load_network(name)
+    create_y_bus(net)
+    with redirect_stdout(io.StringIO()):
+        run_load_flow_from_case_file(net, load_flow_path(name))
+    create_measurements_from_load_flow_solution(net)
+    vm_true = net.vm
+
+    for measurement_set, std_devs in MEASUREMENT_SETS.items():
+        set_accuracies(net, std_devs)
+        for algorithm in ['WLS', 'WLS_AUGMENTED']:
+            net.vm_estimated = None
+            output = io.StringIO()
+            start = perf_counter()
+            with redirect_stdout(output), errstate(all='ignore'):
+                try:
+                    estimate(net, max_iteration=30, algorithm=algorithm)
+                except RuntimeError:
+                    pass  # Singular gain matrix
+            elapsed = perf_counter() - start
+            lines = output.getvalue().splitlines()
+            status = lines[-1].rsplit(' ', 1)[-1] if lines and 'Converged' in lines[-1] else 'failed'
+            error = abs(net.vm_estimated - vm_true).max() if net.vm_estimated is not None else float('nan')
+            print(f'{name:<10}{measurement_set:<8}{algorithm:<16}{elapsed * 1e3:>10.1f}{status:>12}{error:>14.2e}')
+
+
+def main():
+    print(f'{"Network":<10}{"Set":<8}{"Algorithm":<16}{"ms":>10}{"Iterations":>12}{"Max |dvm|":>14}')
+    for name in ['ieee14', 'ieee30', 'ieee57', 'ieee118', 'ieee300']:
+        run(name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Branch switching with SwitchingManager against rebuilding y_bus, y_bus_from_to and y_bus_to_from after every action,
+with create_y_bus and the removal of every open branch. Random open and close actions with an undo back to the case
+state every ten actions, as a reconfiguration search does. The manager's matrices are checked against the case state
+after the undo and against a fresh manager built in the final state.
+
+Run from the directory containing the package: python -m power_system.benchmarks.switching
+"""
+from time import perf_counter
+from numpy import random, array_equal
+from .common import load_network, load_flow_path
+from ..network_matrices import create_y_bus, remove_line_from_y_bus, remove_transformer_from_y_bus
+from ..load_flow import prepare_load_flow_from_case_file
+from ..switching import SwitchingManager
+
+ACTIONS = 5000
+REBUILDS = 50
+
+
+def matrices(manager):
+    return manager.y_bus.data.copy(), manager.y_bus_from_to.data.copy(), manager.y_bus_to_from.data.copy()
+
+
+def rebuild(net, closed):
+    create_y_bus(net)
+    net.y_bus = net.full_y_bus.copy()
+    arrays = net.arrays
+    for branch in (~closed).nonzero()[0].tolist():
+        if branch < arrays.n_lines:
+            remove_line_from_y_bus(net, net.lines[int(arrays.line_idx[branch])])
+        else:
+            remove_transformer_from_y_bus(net, net.transformers[int(arrays.transformer_idx[branch - arrays.n_lines])])
+
+
+def run(name, rng):
+    net = load_network(name)
+    create_y_bus(net)
+    prepare_load_flow_from_case_file(net, load_flow_path(name))
+    manager = net.switching_manager
+    case = matrices(manager)
+    branches = rng.integers(0, net.arrays.n_branches, ACTIONS)
+
+    start = perf_counter()
+    checkpoint = manager.checkpoint()
+    for action, branch in enumerate(branches.tolist()):
+        manager.set_branch(branch, not manager.closed[branch])
+        if action % 10 == 9:
+            manager.undo(checkpoint)
+    switching_time = perf_counter() - start
+    restored = all(array_equal(a, b) for a, b in zip(case, matrices(manager)))
+
+    for branch in branches[:ACTIONS // 10].tolist():
+        manager.set_branch(branch, not manager.closed[branch])
+    final = matrices(manager)
+    fresh = matrices(SwitchingManager(net, manager.closed))
+    exact = all(array_equal(a, b) for a, b in zip(final, fresh))
+
+    closed = manager.closed.copy()
+    start = perf_counter()
+    for branch in branches[:REBUILDS].tolist():
+        closed[branch] = not closed[branch]
+        rebuild(net, closed)
+    rebuild_time = (perf_counter() - start) / REBUILDS * ACTIONS
+
+    print(f'{name}: {net.arrays.n_branches} branches, {ACTIONS} actions with an undo every ten')
+    print(f'  SwitchingManager {switching_time * 1e3:10.1f} ms  ({ACTIONS / switching_time:10.0f} actions/s)')
+    print(f'  Rebuild          {rebuild_time * 1e3:10.1f} ms  ({ACTIONS / rebuild_time:10.0f} actions/s, '
+          f'extrapolated from {REBUILDS})')
+    print(f'  Case state restored exactly: {restored}, same matrices as a fresh manager: {exact}')
+
+
+def main():
+    rng = random.default_rng(0)
+    for name in ['ieee118', 'ieee300', 'lv_schutterwald']:
+        run(name, rng)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Time-series load flow of lv_schutterwald at 15 minute resolution with synthetic load profiles (a daily shape, a
+seasonal swing and per load noise) memory mapped from .npy files, results streamed to .npy files in a temporary
+directory. One week is also solved with run_load_flow_scenarios, which factorizes the Jacobian at every iteration,
+and read from a CSV profile to check that both file paths give the same result.
+
+Run from the directory containing the package: python -m power_system.benchmarks.time_series [weeks]
+52 weeks is a full year (35040 timesteps, about 1.7 GB of profiles and 3.3 GB of results).
+"""
+import os
+import sys
+import tempfile
+from time import perf_counter
+from numpy import random, arange, sin, cos, pi, array, savetxt, concatenate, float64
+from .common import load_network, load_flow_path
+from ..network_matrices import create_y_bus
+from ..load_flow import read_load_flow_data, prepare_load_flow_from_case_file
+from ..scenarios import run_load_flow_scenarios
+from ..time_series import Profile, TimeSeriesLoadFlow, read_profile_npy, read_profile_csv, run_time_series, \
+    create_npy_file
+from ..create.json_stream import get_peak_rss_mb
+
+NAME = 'lv_schutterwald'
+STEPS_PER_DAY = 96
+STEPS_PER_WEEK = 7 * STEPS_PER_DAY
+
+
+def write_profiles(directory, n_timesteps, case, chunk_size=STEPS_PER_WEEK):
+    # Load profiles as .npy files written a week at a time, read back as memory maps
+    loads = list(read_load_flow_data(case)['load'].values())
+    element_idx = array([load['load_idx'] for load in loads])
+    p_mw, q_mvar = array([load['p_mw'] for load in loads]), array([load['q_mvar'] for load in loads])
+    rng = random.default_rng(0)
+    phase = rng.uniform(-0.5, 0.5, len(loads))
+    files = {}
+    for quantity, values in [('p_mw', p_mw), ('q_mvar', q_mvar)]:
+        files[quantity] = os.path.join(directory, f'load_{quantity}.npy')
+        with create_npy_file(files[quantity], (n_timesteps, len(loads)), float64) as f:
+            for start in range(0, n_timesteps, chunk_size):
+                t = arange(start, min(start + chunk_size, n_timesteps))[:, None]
+                day = 2 * pi * (t / STEPS_PER_DAY + phase / 24)
+                season = 1 + 0.3 * cos(2 * pi * t / (365 * STEPS_PER_DAY))
+                shape = season * (1 + 0.4 * sin(day - pi / 2) + 0.2 * sin(2 * day))
+                f.write((values * shape * rng.uniform(0.8, 1.2, (len(t), len(loads)))).tobytes())
+    return [read_profile_npy(files[quantity], 'load', quantity, element_idx) for quantity in ('p_mw', 'q_mvar')]
+
+
+def compare_week(profiles, case, directory):
+    # One week with run_load_flow_scenarios, and with the p_mw profile read from a CSV file
+    week = [Profile(element='load', quantity=profile.quantity, element_idx=profile.element_idx,
+                    values=profile.values[:STEPS_PER_WEEK]) for profile in profiles]
+    net = load_network(NAME)
+    create_y_bus(net)
+    engine = TimeSeriesLoadFlow(net, case, week)
+    p_scheduled_pu, q_scheduled_pu = engine.injections(0, STEPS_PER_WEEK)
+    _, _, vm, va = prepare_load_flow_from_case_file(net, case)
+    start = perf_counter()
+    vm_scenarios, _, iterations, _ = run_load_flow_scenarios(net, p_scheduled_pu, q_scheduled_pu, vm, va)
+    scenario_time = perf_counter() - start
+
+    result = engine.run()
+    csv = os.path.join(directory, 'load_p_mw.csv')
+    savetxt(csv, concatenate([week[0].element_idx[None], week[0].values]), delimiter=',', fmt='%.17g')
+    net = load_network(NAME)
+    create_y_bus(net)
+    csv_result = run_time_series(net, case, [read_profile_csv(csv, 'load', 'p_mw'), week[1]])
+    print(f'One week, {STEPS_PER_WEEK} timesteps')
+    print(f'  run_load_flow_scenarios {scenario_time:8.2f} s, {iterations.mean():.2f} iterations and factorizations'
+          f' per timestep')
+    print(f'  time series engine      {result.seconds:8.2f} s, {result.iterations.mean():.2f} iterations and '
+          f'{result.factorizations / STEPS_PER_WEEK:.3f} factorizations per timestep')
+    print(f'  max |dvm| to scenarios {abs(result.vm - vm_scenarios).max():.1e}, CSV against npy '
+          f'{abs(result.vm - csv_result.vm).max():.1e}')
+
+
+def main():
+    weeks = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    n_timesteps = weeks * STEPS_PER_WEEK
+    case = load_flow_path(NAME)
+    with tempfile.TemporaryDirectory() as directory:
+        profiles = write_profiles(directory, n_timesteps, case)
+        compare_week(profiles, case, directory)
+
+        net = load_network(NAME)
+        create_y_bus(net)
+        rss_before = get_peak_rss_mb()
+        output = os.path.join(directory, 'results')
+        result = run_time_series(net, case, profiles, output_directory=output)
+        size = sum(os.path.getsize(os.path.join(output, name)) for name in os.listdir(output))
+        print(f'{weeks} weeks, {n_timesteps} timesteps streamed to disk')
+        print(f'  {result.seconds:.1f} s, {result.timesteps_per_second:.0f} timesteps/s, '
+              f'{result.iterations.mean():.2f} iterations and {result.factorizations} factorizations, '
+              f'{int(result.converged.sum())} converged')
+        print(f'  {size / 2 ** 20:.0f} MB of results, peak RSS {get_peak_rss_mb():.0f} MB ({rss_before:.0f} MB before),'
+              f' a year takes {35040 / result.timesteps_per_second / 60:.1f} minutes at this rate')
+
+
+if __name__ == '__main__':
+    main()
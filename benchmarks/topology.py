@@ -0,0 +1,43 @@
+"""
+Island detection with connected components on the branch arrays against the former networkx graph walk with a
+has_path check for every pair of slack buses.
+
+Run from the directory containing the package: python -m power_system.benchmarks.topology
+"""
+from itertools import combinations
+import networkx as nx
+from .common import TOPOLOGIES, load_network, load_flow_path, best_of
+from ..network_matrices import create_y_bus
+from ..load_flow import prepare_load_flow_from_case_file, create_network_graph
+from ..topology import find_islands, check_multiple_slacks
+
+
+def pairwise_has_path(net):
+    G = create_network_graph(net)
+    for u, v in combinations(net.slack_buses, 2):
+        if nx.has_path(G, u, v):
+            raise ValueError(f"Slack buses {u} and {v} are electrically connected.")
+
+
+def run(name):
+    net = load_network(name)
+    create_y_bus(net)
+    prepare_load_flow_from_case_file(net, load_flow_path(name))
+    topology = find_islands(net.arrays)
+
+    pairwise_time = best_of(lambda: pairwise_has_path(net))
+    components_time = best_of(lambda: find_islands(net.arrays))
+    cached_time = best_of(lambda: check_multiple_slacks(net))
+    print(f'{name:<18}{len(net.buses):>8}{len(net.slack_buses):>8}{topology.n_islands:>9}'
+          f'{pairwise_time * 1e3:>16.3f}{components_time * 1e3:>14.3f}{cached_time * 1e3:>12.3f}')
+
+
+def main():
+    print(f'{"Network":<18}{"Buses":>8}{"Slacks":>8}{"Islands":>9}'
+          f'{"has_path (ms)":>16}{"scipy (ms)":>14}{"cached (ms)":>12}')
+    for name in TOPOLOGIES:
+        run(name)
+
+
+if __name__ == '__main__':
+    main()
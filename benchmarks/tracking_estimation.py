@@ -0,0 +1,97 @@
+"""
+Per snapshot latency of the tracking estimator against a flat start estimate for every snapshot, on lv_schutterwald
+and ieee300. Snapshots are the measurements of load flows with every load moved by a few percent from the previous
+snapshot, from meters with a standard deviation of 0.01 pu and Gaussian noise of that deviation.
+
+Run from the directory containing the package: python -m power_system.benchmarks.tracking_estimation
+"""
+import io
+import asyncio
+from contextlib import redirect_stdout
+from time import perf_counter
+from numpy import random, exp, percentile
+from .common import load_network, load_flow_path
+from ..network_matrices import create_y_bus
+from ..load_flow import prepare_load_flow_from_case_file, load_flow
+from ..create.auxiliary import create_measurements_from_load_flow_solution
+from ..state_estimation import estimate
+from ..tracking_estimation import TrackingEstimator
+
+STD_DEV = 0.01
+N_SNAPSHOTS = 50
+LOAD_STEP = 0.02
+
+
+def create_snapshots(net, p_scheduled_pu, q_scheduled_pu, vm, va, rng):
+    # Measurement values of load flows along a random walk of the scheduled powers
+    model = net.measurement_model
+    scale = 1.0
+    snapshots = []
+    for _ in range(N_SNAPSHOTS):
+        scale *= 1 + rng.normal(0, LOAD_STEP, p_scheduled_pu.shape)
+        with redirect_stdout(io.StringIO()):
+            load_flow(net, p_scheduled_pu * scale, q_scheduled_pu * scale, vm.copy(), va.copy())
+        values = model.hx(net.vm * exp(1j * net.va))
+        snapshots.append(values + rng.normal(0, model.std_dev))
+    return snapshots
+
+
+async def stream(snapshots):
+    for values in snapshots:
+        await asyncio.sleep(0)
+        yield values
+
+
+def run(name):
+    net = load_network(name)
+    create_y_bus(net)
+    p_scheduled_pu, q_scheduled_pu, vm, va = prepare_load_flow_from_case_file(net, load_flow_path(name))
+    with redirect_stdout(io.StringIO()):
+        load_flow(net, p_scheduled_pu, q_scheduled_pu, vm.copy(), va.copy())
+    create_measurements_from_load_flow_solution(net)
+    for measurements in (net.bus_measurements, net.branch_measurements):
+        for measurement in measurements.values():
+            measurement.std_dev = STD_DEV
+    net.invalidate_measurement_model()
+    snapshots = create_snapshots(net, p_scheduled_pu, q_scheduled_pu, vm, va, random.default_rng(0))
+
+    # Flat start for every snapshot through estimate, with the measurement values written into the compiled model
+    model = net.measurement_model
+    flat_latencies, flat_estimates = [], []
+    for values in snapshots:
+        model.z = values
+        start = perf_counter()
+        with redirect_stdout(io.StringIO()):
+            estimate(net)
+        flat_latencies.append(perf_counter() - start)
+        flat_estimates.append(net.vm_estimated)
+
+    net.vm_estimated = None
+    tracker = TrackingEstimator(net)
+
+    async def track():
+        return [result.vm async for result in tracker.track_async(stream(snapshots))]
+
+    tracked_estimates = asyncio.run(track())
+    statistics = tracker.statistics()
+    difference = max(abs(flat - tracked).max() for flat, tracked in zip(flat_estimates, tracked_estimates))
+
+    print(f'{name}: {len(net.buses)} buses, {model.n_measurements} measurements, {N_SNAPSHOTS} snapshots')
+    print(f'{"":<16}{"mean ms":>10}{"median ms":>11}{"p95 ms":>10}{"max ms":>10}')
+    print(f'{"flat start":<16}{sum(flat_latencies) / N_SNAPSHOTS * 1e3:>10.1f}'
+          f'{percentile(flat_latencies, 50) * 1e3:>11.1f}{percentile(flat_latencies, 95) * 1e3:>10.1f}'
+          f'{max(flat_latencies) * 1e3:>10.1f}')
+    print(f'{"tracking":<16}{statistics.mean * 1e3:>10.1f}{statistics.median * 1e3:>11.1f}'
+          f'{statistics.p95 * 1e3:>10.1f}{statistics.max * 1e3:>10.1f}')
+    print(f'tracking: {statistics.mean_iterations:.1f} iterations and {statistics.factorizations / N_SNAPSHOTS:.2f} '
+          f'factorizations per snapshot, max |dvm| to flat start {difference:.1e}')
+    print()
+
+
+def main():
+    for name in ['lv_schutterwald', 'ieee300']:
+        run(name)
+
+
+if __name__ == '__main__':
+    main()
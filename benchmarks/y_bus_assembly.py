@@ -0,0 +1,95 @@
+"""
+Compares the vectorized COO Y-bus assembly with the element-by-element lil_matrix builder.
+
+Run from the directory containing the package: python -m power_system.benchmarks.y_bus_assembly
+"""
+from scipy.sparse import lil_matrix
+from numpy import cdouble, deg2rad, conjugate, exp
+from .common import TOPOLOGIES, load_network, best_of
+from ..network_matrices import create_y_bus
+
+
+def create_y_bus_lil(net):
+    # Reference implementation: one lil_matrix update per element
+    full_y_bus = lil_matrix((len(net.buses), len(net.buses)), dtype=cdouble)
+    y_bus_from_to = lil_matrix((len(net.lines) + len(net.transformers), len(net.buses)), dtype=cdouble)
+    y_bus_to_from = lil_matrix((len(net.lines) + len(net.transformers), len(net.buses)), dtype=cdouble)
+
+    for shunt in net.shunts.values():
+        i = net.bus_map[shunt.bus.bus_idx]
+        full_y_bus[i, i] += (shunt.p_mw - 1j*shunt.q_mvar)/net.s_base_mva
+
+    for line in net.lines.values():
+        i = net.bus_map[line.from_bus.bus_idx]
+        j = net.bus_map[line.to_bus.bus_idx]
+        r_pu = net.ohm_to_pu(line.r_ohm, line.from_bus.voltage_level_kv)
+        x_pu = net.ohm_to_pu(line.x_ohm, line.from_bus.voltage_level_kv)
+        b_total_pu = net.mho_to_pu(line.b_total_mho, line.from_bus.voltage_level_kv)
+        y_series = 1 / complex(r_pu, x_pu)
+        full_y_bus[i, i] += y_series + 1j * b_total_pu / 2
+        full_y_bus[i, j] -= y_series
+        full_y_bus[j, i] -= y_series
+        full_y_bus[j, j] += y_series + 1j * b_total_pu/2
+        line_idx = net.line_map[line.idx]
+        y_bus_from_to[line_idx, i] -= -y_series - 1j * b_total_pu/2
+        y_bus_from_to[line_idx, j] += -y_series
+
+        y_bus_to_from[line_idx, i] += -y_series
+        y_bus_to_from[line_idx, j] -= -y_series - 1j * b_total_pu / 2
+
+    for transformer in net.transformers.values():
+        i = net.bus_map[transformer.from_bus.bus_idx]
+        j = net.bus_map[transformer.to_bus.bus_idx]
+        z_base_transformer = transformer.v_rated_low_kv**2/transformer.rated_s_mva
+        r_pu = net.ohm_to_pu(transformer.r_pu*z_base_transformer, transformer.v_rated_low_kv)
+        x_pu = net.ohm_to_pu(transformer.x_pu*z_base_transformer, transformer.v_rated_low_kv)
+
+        gm_pu = net.mho_to_pu(transformer.gm_pu/z_base_transformer, transformer.to_bus.voltage_level_kv)
+        bm_pu = net.mho_to_pu(transformer.bm_pu/z_base_transformer, transformer.to_bus.voltage_level_kv)
+        y_shunt = complex(gm_pu, bm_pu)
+        y_series = 1/complex(r_pu, x_pu)
+        tap = transformer.tap
+        phase_shift = transformer.phase_shift
+
+        if tap == 0 or tap == None:
+            tap = 1
+        a = tap*exp(1j*deg2rad(phase_shift))
+
+        full_y_bus[i, i] += y_series/(tap**2) + y_shunt/2
+        full_y_bus[i, j] -= y_series/conjugate(a)
+        full_y_bus[j, i] -= y_series/a
+        full_y_bus[j, j] += y_series + y_shunt/2
+        transformer_idx = len(net.lines) + net.transformer_map[transformer.idx]
+        y_bus_from_to[transformer_idx, i] -= -y_series - y_shunt/2
+        y_bus_from_to[transformer_idx, j] += -y_series
+
+        y_bus_to_from[transformer_idx, i] += -y_series
+        y_bus_to_from[transformer_idx, j] -= -y_series - y_shunt/2
+
+    return full_y_bus, y_bus_from_to, y_bus_to_from
+
+
+def relative_difference(reference, matrix):
+    difference = abs(reference.tocsr() - matrix.tocsr())
+    scale = abs(reference.tocsr()).max()
+    return difference.max() / scale if difference.nnz else 0.0
+
+
+def main(repeat=5):
+    print(f'{"Topology":<18}{"Buses":>8}{"Branches":>10}{"lil [ms]":>12}{"COO [ms]":>12}{"Speedup":>10}{"Rel diff":>12}')
+    for name in TOPOLOGIES:
+        net = load_network(name)
+        reference = create_y_bus_lil(net)
+        create_y_bus(net)
+        difference = max(relative_difference(reference[0], net.full_y_bus),
+                         relative_difference(reference[1], net.y_bus_from_to),
+                         relative_difference(reference[2], net.y_bus_to_from))
+
+        lil_time = best_of(lambda: create_y_bus_lil(net), repeat)
+        coo_time = best_of(lambda: create_y_bus(net), repeat)
+        print(f'{name:<18}{len(net.buses):>8}{len(net.lines) + len(net.transformers):>10}'
+              f'{lil_time * 1e3:>12.2f}{coo_time * 1e3:>12.2f}{lil_time / coo_time:>9.1f}x{difference:>12.2e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+from dataclasses import dataclass, field
+from itertools import combinations
+from collections import Counter
+from numpy import ndarray, array, asarray, arange, zeros, exp, conj, concatenate, unique, searchsorted, repeat, diff, \
+    eye, isfinite, inf, maximum
+from numpy.linalg import solve as dense_solve, LinAlgError
+from scipy.sparse import csr_matrix
+import networkx as nx
+from .jacobian import JacobianPattern
+from .linear_solver import SparseLUSolver
+from .load_flow import newton_raphson
+from .network_matrices import get_branch_stamps, get_entry_positions
+
+
+@dataclass(kw_only=True)
+class ContingencyResult:
+    branches: tuple  # Branch rows (lines first, then transformers)
+    elements: tuple  # ('line', idx) or ('transformer', idx) for every opened branch
+    islanding: bool = False
+    converged: bool = False
+    iterations: int = 0
+    severity: float = 0.0  # Sum of voltage magnitude violations in pu
+    n_violations: int = 0
+    min_vm: float = float('nan')
+    max_vm: float = float('nan')
+    vm: ndarray = field(default=None, repr=False)
+    va: ndarray = field(default=None, repr=False)
+
+
+def get_branch_elements(net):
+    arrays = net.arrays
+    return ([('line', int(idx)) for idx in arrays.line_idx] +
+            [('transformer', int(idx)) for idx in arrays.transformer_idx])
+
+
+def find_islanding_branches(net, outaged=()):
+    # Closed branches whose outage splits their island once the outaged branches are open, parallel branches between
+    # the same buses are not bridges
+    arrays = net.arrays
+    outaged = set(outaged)
+    branches = [branch for branch in arrays.branch_closed.nonzero()[0].tolist() if branch not in outaged]
+    edges = [frozenset((arrays.branch_from[branch], arrays.branch_to[branch])) for branch in branches]
+    G = nx.Graph()
+    G.add_nodes_from(range(arrays.n_buses))
+    G.add_edges_from(tuple(edge) for edge in edges if len(edge) == 2)
+    parallel = Counter(edges)
+    bridges = {frozenset(edge) for edge in nx.bridges(G) if parallel[frozenset(edge)] == 1}
+    return {branch for branch, edge in zip(branches, edges) if edge in bridges}
+
+
+def is_islanding(net, branches, islanding_branches):
+    """
+    islanding_branches maps outaged branch tuples to the islanding branches of the network without them, starting with
+    {(): find_islanding_branches(net)}. The outages are taken in increasing order and the set splits an island if one
+    of them is a bridge once the earlier ones are open. The bridges after an outage are found once and kept for the
+    contingencies sharing it, the latest set of every length only, as pairs come grouped by their first branch.
+    """
+    branches = sorted(set(branches))
+    for k, branch in enumerate(branches):
+        outaged = tuple(branches[:k])
+        if outaged not in islanding_branches:
+            for key in [key for key in islanding_branches if len(key) == k]:
+                del islanding_branches[key]
+            islanding_branches[outaged] = find_islanding_branches(net, outaged)
+        if branch in islanding_branches[outaged]:
+            return True
+    return False
+
+
+class ContingencyScreening:
+    """
+    Screens branch outages against a factorized base case.
+
+    Each outage changes the Y-bus in the stamps of its two buses, so the post-outage Jacobian evaluated at the base
+    operating point differs from the base Jacobian in a few rows only: J = J0 + E D. The outage is solved with
+    constant-Jacobian Newton iterations where every solve goes through the base LU and the Sherman-Morrison-Woodbury
+    identity, warm-started from the base solution. Outages where this iteration diverges are solved again with full
+    Newton-Raphson.
+    """
+    def __init__(self, net, p_scheduled_pu, q_scheduled_pu, vm=None, va=None):
+        self.net = net
+        self.vm = asarray(net.vm if vm is None else vm, dtype=float)
+        self.va = asarray(net.va if va is None else va, dtype=float)
+        self.p_scheduled_pu = asarray(p_scheduled_pu, dtype=float).ravel()
+        self.q_scheduled_pu = asarray(q_scheduled_pu, dtype=float).ravel()
+
+        self.y_bus = csr_matrix(net.y_bus, copy=True)
+        self.y_bus.sort_indices()
+        pvpq_list = sorted(list(net.pq_buses) + list(net.pv_buses))
+        pq_list = sorted(list(net.pq_buses))
+        self.jacobian_pattern = JacobianPattern(self.y_bus, pvpq_list, pq_list)
+        self.pvpq = self.jacobian_pattern.pvpq
+        self.pq = self.jacobian_pattern.pq
+
+        # Base Jacobian at the base operating point, factorized once
+        v = self.vm * exp(1j * self.va)
+        self.base_jacobian = self.jacobian_pattern.fill(self.y_bus, v).copy()
+        self.jacobian_rows = repeat(arange(self.base_jacobian.shape[0]), diff(self.base_jacobian.indptr))
+        self.solver = SparseLUSolver()
+        self.solver.factorize(self.base_jacobian)
+        self.fallback_solver = SparseLUSolver()
+        self.fallbacks = 0
+
+        arrays = net.arrays
+        f, t = arrays.branch_from, arrays.branch_to
+        self.branch_closed = arrays.branch_closed
+        self.branch_stamps = get_branch_stamps(net)
+        self.stamp_positions = array([get_entry_positions(self.y_bus, f, f),
+                                      get_entry_positions(self.y_bus, f, t),
+                                      get_entry_positions(self.y_bus, t, f),
+                                      get_entry_positions(self.y_bus, t, t)])
+        self.elements = get_branch_elements(net)
+
+    def outage_y_bus(self, branches):
+        y_bus = self.y_bus.copy()
+        for branch in branches:
+            if self.branch_closed[branch]:
+                y_bus.data[self.stamp_positions[:, branch]] -= self.branch_stamps[:, branch]
+        return y_bus
+
+    def jacobian_update(self, y_bus):
+        # Rows of the Jacobian that change with the outage and the (rows x columns) change itself
+        v = self.vm * exp(1j * self.va)
+        change = self.jacobian_pattern.fill(y_bus, v).data - self.base_jacobian.data
+        changed = change.nonzero()[0]
+        rows = unique(self.jacobian_rows[changed])
+        update = csr_matrix((change[changed], (searchsorted(rows, self.jacobian_rows[changed]),
+                                               self.base_jacobian.indices[changed])),
+                            shape=(len(rows), self.base_jacobian.shape[1]))
+        return rows, update
+
+    def solve(self, branches, max_iteration=50, tolerance=1e-8):
+        return self.solve_switched(self.outage_y_bus(branches), max_iteration, tolerance)
+
+    def solve_switched(self, y_bus, max_iteration=50, tolerance=1e-8):
+        # Any y_bus with the structure of the base one, such as a switching state of the net's switching manager
+        rows, update = self.jacobian_update(y_bus)
+
+        # Woodbury: (J0 + E D)^-1 b = y - W (I + D W)^-1 D y with y = J0^-1 b and W = J0^-1 E
+        selector = zeros((self.base_jacobian.shape[0], len(rows)))
+        selector[rows, arange(len(rows))] = 1
+        W = self.solver.solve_factorized(selector).reshape(-1, len(rows))
+        capacitance = eye(len(rows)) + update @ W
+
+        vm, va = self.vm.copy(), self.va.copy()
+        n_pvpq = len(self.pvpq)
+        mismatch = inf
+        for iteration in range(1, max_iteration + 1):
+            v = vm * exp(1j * va)
+            S = v * conj(y_bus * v)
+            F = concatenate([S.real[self.pvpq] - self.p_scheduled_pu[self.pvpq],
+                             S.imag[self.pq] - self.q_scheduled_pu[self.pq]])
+            if not isfinite(F).all() or abs(F).max() > mismatch:
+                # The constant Jacobian iteration diverges, the outage is solved with full Newton-Raphson instead
+                break
+            mismatch = abs(F).max()
+            if mismatch < tolerance:
+                return vm, va, iteration, True
+            y = self.solver.solve_factorized(F)
+            delta_x = -(y - W @ dense_solve(capacitance, update @ y)) if len(rows) else -y
+            va[self.pvpq] += delta_x[:n_pvpq]
+            vm[self.pq] += delta_x[n_pvpq:]
+        return self.solve_newton_raphson(y_bus, max_iteration, tolerance)
+
+    def solve_newton_raphson(self, y_bus, max_iteration=50, tolerance=1e-8):
+        vm, va = self.vm.copy(), self.va.copy()
+        self.fallbacks += 1
+        try:
+            iteration, converged = newton_raphson(y_bus, vm, va, self.p_scheduled_pu, self.q_scheduled_pu,
+                                                  self.jacobian_pattern, self.fallback_solver, max_iteration,
+                                                  tolerance)
+        except RuntimeError:
+            iteration, converged = 0, False
+        return vm, va, iteration, converged
+
+
+def rank_contingencies(results):
+    # Non converged outages first, then by decreasing voltage violation, islanding outages last
+    return sorted(results, key=lambda result: (result.islanding, -result.severity))
+
+
+def run_contingency_analysis(net,
+                             p_scheduled_pu,
+                             q_scheduled_pu,
+                             contingencies=None,
+                             n_minus_2: bool = False,
+                             vm_min: float = 0.95,
+                             vm_max: float = 1.05,
+                             max_iteration: int = 50,
+                             tolerance: float = 1e-8):
+    """
+    N-1 (and optionally N-2) branch outage screening around the solved base case in net.vm and net.va.
+    Contingencies are sequences of branch rows, by default every closed branch (and every pair with n_minus_2).
+    Outages that island part of the network are detected on the network graph and skipped.
+    Returns ContingencyResult objects ranked by post-outage voltage violations.
+    """
+    arrays = net.arrays
+    closed_branches = [branch for branch in range(arrays.n_branches) if arrays.branch_closed[branch]]
+    if contingencies is None:
+        contingencies = [(branch,) for branch in closed_branches]
+        if n_minus_2:
+            contingencies += list(combinations(closed_branches, 2))
+
+    screening = ContingencyScreening(net, p_scheduled_pu, q_scheduled_pu)
+    islanding_branches = {(): find_islanding_branches(net)}
+
+    results = []
+    for branches in contingencies:
+        branches = tuple(int(branch) for branch in branches)
+        result = ContingencyResult(branches=branches, elements=tuple(screening.elements[b] for b in branches))
+        if is_islanding(net, branches, islanding_branches):
+            result.islanding = True
+            results.append(result)
+            continue
+        try:
+            vm, va, result.iterations, result.converged = screening.solve(branches, max_iteration, tolerance)
+        except LinAlgError:
+            result.converged = False
+        if result.converged:
+            violation = maximum(vm_min - vm, 0) + maximum(vm - vm_max, 0)
+            result.severity = float(violation.sum())
+            result.n_violations = int((violation > 0).sum())
+            result.min_vm, result.max_vm = float(vm.min()), float(vm.max())
+            result.vm, result.va = vm, va
+        else:
+            result.severity = inf
+        results.append(result)
+    return rank_contingencies(results)
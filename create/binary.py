@@ -0,0 +1,282 @@
+import json
+from dataclasses import dataclass, field
+from numpy import ndarray, array, asarray, memmap, zeros, ones, cumsum, int64, float64, uint8, fromiter, frombuffer
+from .elements import *
+from ..network_arrays import NetworkArrays
+
+# File layout: MAGIC, the header length as 8 little-endian bytes, a JSON header and the blocks. Every block starts at
+# a multiple of ALIGNMENT from the start of the file, the header lists its dtype, shape and offset. Blocks are C
+# ordered arrays in little-endian byte order, read back as views of a copy-on-write memory map.
+MAGIC = b'\x93PSBIN\x01\x00'
+ALIGNMENT = 64
+HEADER_LENGTH_BYTES = 8
+
+# Columns of each element table of the topology JSON schema: (JSON key, block name, dtype). Block names of bus
+# positions (from, to, bus) are not in the JSON, the converter resolves them through the bus table so the loader can
+# use them as the compiled arrays directly.
+TOPOLOGY_TABLES = {
+    'bus': ('bus_data', [('bus_idx', 'idx', int64), ('voltage_level_kv', 'voltage_level_kv', float64)]),
+    'load': ('load_data', [('load_idx', 'idx', int64), ('bus_idx', 'bus_idx', int64),
+                           ('s_rated_mva', 's_rated_mva', float64)]),
+    'generator': ('generator_data', [('generator_idx', 'idx', int64), ('bus_idx', 'bus_idx', int64),
+                                     ('min_p_mw', 'min_p_mw', float64), ('max_p_mw', 'max_p_mw', float64),
+                                     ('min_q_mvar', 'min_q_mvar', float64), ('max_q_mvar', 'max_q_mvar', float64)]),
+    'shunt': ('shunt_data', [('shunt_idx', 'idx', int64), ('bus_idx', 'bus_idx', int64), ('p_mw', 'p_mw', float64),
+                             ('q_mvar', 'q_mvar', float64)]),
+    'battery': ('battery_data', [('battery_idx', 'idx', int64), ('bus_idx', 'bus_idx', int64),
+                                 ('p_charge_mw', 'p_charge_mw', float64),
+                                 ('p_discharge_mw', 'p_discharge_mw', float64), ('soc', 'soc', float64),
+                                 ('capacity_mwh', 'capacity_mwh', float64)]),
+    'line': ('line_data', [('line_idx', 'idx', int64), ('from_bus_idx', 'from_bus_idx', int64),
+                           ('to_bus_idx', 'to_bus_idx', int64), ('closed', 'closed', bool),
+                           ('r_ohm', 'r_ohm', float64), ('x_ohm', 'x_ohm', float64),
+                           ('b_total_mho', 'b_total_mho', float64)]),
+    'transformer': ('transformer_data', [('transformer_idx', 'idx', int64), ('from_bus_idx', 'from_bus_idx', int64),
+                                         ('to_bus_idx', 'to_bus_idx', int64),
+                                         ('v_rated_high_kv', 'v_rated_high_kv', float64),
+                                         ('v_rated_low_kv', 'v_rated_low_kv', float64),
+                                         ('rated_s_mva', 'rated_s_mva', float64), ('r_pu', 'r_pu', float64),
+                                         ('x_pu', 'x_pu', float64), ('gm_pu', 'gm_pu', float64),
+                                         ('bm_pu', 'bm_pu', float64), ('tap', 'tap', float64),
+                                         ('phase_shift', 'phase_shift', float64)]),
+    'sop': ('sop_data', [('sop_idx', 'idx', int64), ('from_bus_idx', 'from_bus_idx', int64),
+                         ('to_bus_idx', 'to_bus_idx', int64), ('rated_s', 'rated_s', float64),
+                         ('closed', 'closed', bool)]),
+}
+
+# Columns of each table of the load flow case JSON schema. Slack buses and bus types are keyed by bus_idx and open
+# branches are plain lists of element indices.
+LOAD_FLOW_CASE_TABLES = {
+    'load': [('bus_idx', int64), ('p_mw', float64), ('q_mvar', float64)],
+    'generation': [('bus_idx', int64), ('vm_pu', float64), ('p_mw', float64)],
+    'static_generation': [('bus_idx', int64), ('p_mw', float64), ('q_mvar', float64)],
+    'slack_bus': [('vm_pu', float64), ('va_degree', float64)],
+}
+BUS_TYPES = ('PQ', 'PV', 'SLACK')
+# Index field of the injection tables of a case, records without it are identified by their key
+CASE_ELEMENT_INDEX_KEYS = {'load': 'load_idx', 'generation': 'generator_idx',
+                           'static_generation': 'static_generation_idx'}
+
+
+@dataclass(kw_only=True)
+class BinaryFile:
+    kind: str  # 'topology' or 'load_flow_case'
+    attributes: dict  # Scalars of the file, e.g. network_name and s_base_mva
+    blocks: dict = field(repr=False)  # Block name to array view
+
+    def table(self, name, columns):
+        return [self.blocks[f'{name}.{column}'] for column in columns]
+
+
+def write_binary_file(filename, kind, attributes, blocks) -> None:
+    blocks = {name: asarray(block) for name, block in blocks.items()}
+    # Block offsets depend on the header length, which depends on the offsets, so the header is laid out until its
+    # length settles
+    header_length = 0
+    while True:
+        offset = align(len(MAGIC) + HEADER_LENGTH_BYTES + header_length)
+        table = {}
+        for name, block in blocks.items():
+            table[name] = {'dtype': block.dtype.newbyteorder('<').str, 'shape': list(block.shape), 'offset': offset}
+            offset = align(offset + block.nbytes)
+        header = json.dumps({'kind': kind, 'attributes': attributes, 'blocks': table}).encode()
+        if len(header) <= header_length:
+            break
+        header_length = len(header) + ALIGNMENT
+
+    with open(filename, 'wb') as f:
+        f.write(MAGIC)
+        f.write(header_length.to_bytes(HEADER_LENGTH_BYTES, 'little'))
+        f.write(header.ljust(header_length))
+        for name, block in blocks.items():
+            f.write(bytes(table[name]['offset'] - f.tell()))
+            f.write(block.astype(table[name]['dtype'], copy=False).tobytes())
+
+
+def read_binary_file(filename) -> BinaryFile:
+    # Blocks are views of one copy-on-write map of the file, writing to them never changes the file
+    buffer = memmap(filename, dtype=uint8, mode='c')
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f'{filename} is not a binary network or load flow case file.')
+    start = len(MAGIC) + HEADER_LENGTH_BYTES
+    header_length = int.from_bytes(bytes(buffer[len(MAGIC):start]), 'little')
+    header = json.loads(bytes(buffer[start:start + header_length]))
+    blocks = {name: ndarray(tuple(block['shape']), dtype=block['dtype'], buffer=buffer, offset=block['offset'])
+              for name, block in header['blocks'].items()}
+    return BinaryFile(kind=header['kind'], attributes=header['attributes'], blocks=blocks)
+
+
+def is_binary_file(filename) -> bool:
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def encode_strings(strings):
+    # Concatenated UTF-8 bytes and the offsets of each string, with a final offset at the end
+    encoded = [string.encode() for string in strings]
+    offsets = zeros(len(encoded) + 1, dtype=int64)
+    cumsum([len(string) for string in encoded], out=offsets[1:])
+    return frombuffer(b''.join(encoded), dtype=uint8), offsets
+
+
+def decode_strings(data, offsets):
+    data = data.tobytes()
+    offsets = offsets.tolist()
+    return [data[start:end].decode() for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def table_column(records, key, dtype):
+    values = [record[key] for record in records]
+    if dtype is float64:
+        # A missing value, e.g. a transformer without a tap, is stored as nan
+        values = [float('nan') if value is None else value for value in values]
+    return fromiter(values, dtype=dtype, count=len(values))
+
+
+def get_case_element_indices(records: dict, key):
+    return [record.get(key, int(record_key)) for record_key, record in records.items()]
+
+
+def convert_network_json_to_binary(json_filename, binary_filename) -> None:
+    with open(json_filename, 'r') as f:
+        data = json.load(f)
+    blocks = {}
+    for name, (key, columns) in TOPOLOGY_TABLES.items():
+        records = list(data[key].values())
+        for json_key, column, dtype in columns:
+            blocks[f'{name}.{column}'] = table_column(records, json_key, dtype)
+    buses = list(data['bus_data'].values())
+    blocks['bus.coordinates'], blocks['bus.coordinates_offsets'] = encode_strings([bus['coordinates'] for bus in buses])
+
+    # Later duplicates of a bus_idx replace earlier ones like in create_network_from_json
+    bus_map = {bus['bus_idx']: position for position, bus in enumerate(buses)}
+    for name, column in [('load', 'bus_idx'), ('generator', 'bus_idx'), ('shunt', 'bus_idx'), ('battery', 'bus_idx'),
+                         ('line', 'from_bus_idx'), ('line', 'to_bus_idx'), ('transformer', 'from_bus_idx'),
+                         ('transformer', 'to_bus_idx'), ('sop', 'from_bus_idx'), ('sop', 'to_bus_idx')]:
+        positions = [bus_map[bus_idx] for bus_idx in blocks[f'{name}.{column}'].tolist()]
+        blocks[f'{name}.{column[:-len("_idx")]}'] = array(positions, dtype=int64).reshape(-1)
+
+    write_binary_file(binary_filename, 'topology', data['system_data'], blocks)
+
+
+def convert_load_flow_case_to_binary(json_filename, binary_filename) -> None:
+    with open(json_filename, 'r') as f:
+        data = json.load(f)
+    blocks = {}
+    for name, columns in LOAD_FLOW_CASE_TABLES.items():
+        records = list(data[name].values())
+        for key, dtype in columns:
+            blocks[f'{name}.{key}'] = table_column(records, key, dtype)
+    for name, key in CASE_ELEMENT_INDEX_KEYS.items():
+        blocks[f'{name}.idx'] = array(get_case_element_indices(data[name], key), dtype=int64).reshape(-1)
+    blocks['slack_bus.bus_idx'] = array([int(bus_idx) for bus_idx in data['slack_bus']], dtype=int64).reshape(-1)
+    bus_types = data['load_flow_type']
+    blocks['load_flow_type.bus_idx'] = array([int(bus_idx) for bus_idx in bus_types], dtype=int64).reshape(-1)
+    # Anything that is neither PQ nor PV is a slack bus, as in get_bus_load_flow_types
+    blocks['load_flow_type.type'] = array([BUS_TYPES.index(bus_type) if bus_type in BUS_TYPES[:2] else 2
+                                           for bus_type in bus_types.values()], dtype=uint8).reshape(-1)
+    blocks['open_line.line_idx'] = array(list(data['open_line'].values()), dtype=int64).reshape(-1)
+    blocks['open_transformer.transformer_idx'] = array(list(data['open_transformer'].values()),
+                                                       dtype=int64).reshape(-1)
+    write_binary_file(binary_filename, 'load_flow_case', {}, blocks)
+
+
+def read_binary_load_flow_case(filename) -> BinaryFile:
+    case = read_binary_file(filename)
+    if case.kind != 'load_flow_case':
+        raise ValueError(f'{filename} holds a {case.kind}, not a load flow case.')
+    return case
+
+
+def create_network_from_binary(net, filename) -> None:
+    """
+    Fills net from a file written by convert_network_json_to_binary. Elements are created in bulk without the per
+    element invalidation of create_bus and friends, and the compiled arrays of the net are views of the file.
+    """
+    data = read_binary_file(filename)
+    if data.kind != 'topology':
+        raise ValueError(f'{filename} holds a {data.kind}, not a network topology.')
+    net.network_name = data.attributes['network_name']
+    net.s_base_mva = data.attributes['s_base_mva']
+    net.frequency_hz = data.attributes['frequency_hz']
+
+    def columns(name):
+        return [column.tolist() for column in data.table(name, [column for _, column, _ in TOPOLOGY_TABLES[name][1]])]
+
+    bus_idx, voltage_level_kv = columns('bus')
+    coordinates = decode_strings(data.blocks['bus.coordinates'], data.blocks['bus.coordinates_offsets'])
+    buses = {idx: Bus(bus_idx=idx, voltage_level_kv=kv, coordinates=coordinate)
+             for idx, kv, coordinate in zip(bus_idx, voltage_level_kv, coordinates)}
+
+    net.buses = buses
+    net.loads = {idx: Load(idx=idx, bus=buses[bus], s_rated_mva=s_rated_mva)
+                 for idx, bus, s_rated_mva in zip(*columns('load'))}
+    net.generators = {idx: Generator(idx=idx, bus=buses[bus], min_p_mw=min_p_mw, max_p_mw=max_p_mw,
+                                     min_q_mvar=min_q_mvar, max_q_mvar=max_q_mvar)
+                      for idx, bus, min_p_mw, max_p_mw, min_q_mvar, max_q_mvar in zip(*columns('generator'))}
+    net.shunts = {idx: Shunt(idx=idx, bus=buses[bus], p_mw=p_mw, q_mvar=q_mvar)
+                  for idx, bus, p_mw, q_mvar in zip(*columns('shunt'))}
+    net.batteries = {idx: Battery(idx=idx, bus=buses[bus], p_charge_mw=p_charge_mw, p_discharge_mw=p_discharge_mw,
+                                  soc=soc, capacity_mwh=capacity_mwh)
+                     for idx, bus, p_charge_mw, p_discharge_mw, soc, capacity_mwh in zip(*columns('battery'))}
+    net.lines = {idx: Line(idx=idx, from_bus=buses[f], to_bus=buses[t], closed=closed, r_ohm=r_ohm, x_ohm=x_ohm,
+                           b_total_mho=b_total_mho)
+                 for idx, f, t, closed, r_ohm, x_ohm, b_total_mho in zip(*columns('line'))}
+    net.transformers = {idx: Transformer(idx=idx, from_bus=buses[f], to_bus=buses[t], v_rated_high_kv=v_rated_high_kv,
+                                         v_rated_low_kv=v_rated_low_kv, rated_s_mva=rated_s_mva, r_pu=r_pu,
+                                         x_pu=x_pu, gm_pu=gm_pu, bm_pu=bm_pu, tap=None if tap != tap else tap,
+                                         phase_shift=phase_shift)
+                        for idx, f, t, v_rated_high_kv, v_rated_low_kv, rated_s_mva, r_pu, x_pu, gm_pu, bm_pu, tap,
+                        phase_shift in zip(*columns('transformer'))}
+    net.soft_open_points = {idx: SOP(idx=idx, from_bus=buses[f], to_bus=buses[t], rated_s=rated_s, closed=closed)
+                            for idx, f, t, rated_s, closed in zip(*columns('sop'))}
+    net.bus_map = {idx: position for position, idx in enumerate(bus_idx)}
+    net.line_map = {idx: position for position, idx in enumerate(data.blocks['line.idx'].tolist())}
+    net.transformer_map = {idx: position for position, idx in enumerate(data.blocks['transformer.idx'].tolist())}
+    # Duplicate element indices leave fewer elements than rows, compile_network sorts those out on first use
+    if len(net.buses) == len(bus_idx) and len(net.lines) == len(net.line_map) \
+            and len(net.transformers) == len(net.transformer_map):
+        net.arrays = create_arrays_from_binary(data)
+
+
+def create_arrays_from_binary(data: BinaryFile) -> NetworkArrays:
+    # Compiled arrays of a topology file in the order of compile_network, as views of the file where it has them.
+    # Loads and generators get their set points from load flow cases, so those start at zero like the elements.
+    blocks = data.blocks
+    n_transformers = len(blocks['transformer.idx'])
+    return NetworkArrays(
+        bus_idx=blocks['bus.idx'],
+        bus_kv=blocks['bus.voltage_level_kv'],
+
+        line_idx=blocks['line.idx'],
+        line_from=blocks['line.from_bus'],
+        line_to=blocks['line.to_bus'],
+        line_r_ohm=blocks['line.r_ohm'],
+        line_x_ohm=blocks['line.x_ohm'],
+        line_b_total_mho=blocks['line.b_total_mho'],
+        line_closed=blocks['line.closed'],
+
+        transformer_idx=blocks['transformer.idx'],
+        transformer_from=blocks['transformer.from_bus'],
+        transformer_to=blocks['transformer.to_bus'],
+        transformer_v_rated_low_kv=blocks['transformer.v_rated_low_kv'],
+        transformer_rated_s_mva=blocks['transformer.rated_s_mva'],
+        transformer_r_pu=blocks['transformer.r_pu'],
+        transformer_x_pu=blocks['transformer.x_pu'],
+        transformer_gm_pu=blocks['transformer.gm_pu'],
+        transformer_bm_pu=blocks['transformer.bm_pu'],
+        transformer_tap=blocks['transformer.tap'],
+        transformer_phase_shift=blocks['transformer.phase_shift'],
+        # Transformers of the JSON schema are always created closed
+        transformer_closed=ones(n_transformers, dtype=bool),
+
+        shunt_bus=blocks['shunt.bus'],
+        shunt_p_mw=blocks['shunt.p_mw'],
+        shunt_q_mvar=blocks['shunt.q_mvar'],
+        load_bus=blocks['load.bus'],
+        generator_bus=blocks['generator.bus'],
+    )
@@ -11,6 +11,7 @@ def create_bus(net,
                              voltage_level_kv=voltage_level_kv,
                              coordinates=coordinates
                              )
+    net.invalidate_arrays()
 
 
 def create_load(net,
@@ -22,6 +23,7 @@ def create_load(net,
                                bus=net.buses[bus_idx],
                                s_rated_mva=s_rated_mva
                                )
+    net.invalidate_arrays()
 
 
 def create_generator(net,
@@ -38,6 +40,7 @@ def create_generator(net,
                                                max_p_mw=max_p_mw,
                                                min_q_mvar=min_q_mvar,
                                                max_q_mvar=max_q_mvar)
+    net.invalidate_arrays()
 
 
 def create_shunt(net,
@@ -51,6 +54,7 @@ def create_shunt(net,
                                   p_mw=p_mw,
                                   q_mvar=q_mvar
                                   )
+    net.invalidate_arrays()
 
 
 def create_battery(net,
@@ -68,6 +72,7 @@ def create_battery(net,
                                          soc=soc,
                                          capacity_mwh=capacity_mwh
                                          )
+    net.invalidate_arrays()
 
 
 def create_line(net,
@@ -86,6 +91,7 @@ def create_line(net,
                                r_ohm=r_ohm,
                                x_ohm=x_ohm,
                                b_total_mho=b_total_mho)
+    net.invalidate_arrays()
 
 
 def create_transformer(net,
@@ -117,6 +123,7 @@ def create_transformer(net,
                                                     tap=tap,
                                                     phase_shift=phase_shift,
                                                     )
+    net.invalidate_arrays()
 
 
 def create_sop(net,
@@ -131,6 +138,7 @@ def create_sop(net,
                                         to_bus=net.buses[to_bus_idx],
                                         closed=closed,
                                         rated_s=rated_s)
+    net.invalidate_arrays()
 
 
 def create_bus_measurement(net,
@@ -145,6 +153,7 @@ def create_bus_measurement(net,
                                                                 std_dev=std_dev,
                                                                 value_pu=value_pu,
                                                                 measurement_type=measurement_type)
+    net.invalidate_measurement_model()
 
 
 def create_branch_measurement(net,
@@ -161,3 +170,4 @@ def create_branch_measurement(net,
                                                                          std_dev=std_dev,
                                                                          value_pu=value_pu,
                                                                          measurement_type=measurement_type)
+    net.invalidate_measurement_model()
@@ -0,0 +1,163 @@
+import json
+import re
+import sys
+from dataclasses import dataclass
+from time import perf_counter
+from .auxiliary import RECORD_CREATORS
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, peak RSS is then not reported
+    resource = None
+
+WHITESPACE = json.decoder.WHITESPACE
+KEY = re.compile(r'\s*"((?:[^"\\]|\\.)*)"\s*:\s*')
+SEPARATOR = re.compile(r'\s*([,}])')
+
+
+@dataclass(kw_only=True)
+class IngestStatistics:
+    elements: int  # Records created, over all element sections
+    characters_read: int  # Characters of the file decoded, bytes for ASCII files
+    seconds: float
+    peak_rss_mb: float  # Peak resident set size of the process so far, nan where it cannot be read
+
+    @property
+    def elements_per_second(self):
+        return self.elements / self.seconds if self.seconds > 0 else float('inf')
+
+
+class JSONSectionReader:
+    """
+    Incremental reader for files holding one JSON object of sections, each an object of records, like the topology
+    and load flow case files. Iterating yields (section, key, value) for every entry of every section in file order,
+    reading the file in chunks of chunk_size characters. Only the entry being decoded and the unread part of the
+    current chunk are kept in memory. Sections whose value is not an object are yielded whole with key None.
+    """
+    def __init__(self, f, chunk_size: int = 1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.end_of_file = False
+        self.characters_read = 0
+
+    def read_chunk(self) -> bool:
+        if self.end_of_file:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        self.characters_read += len(chunk)
+        self.end_of_file = not chunk
+        # Drop the consumed part so the buffer holds at most one chunk and one partly read entry
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return bool(chunk)
+
+    def peek(self) -> str:
+        # Next non-whitespace character, '' at the end of the file
+        while True:
+            self.position = WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer) or not self.read_chunk():
+                return self.buffer[self.position:self.position + 1]
+
+    def expect(self, characters: str) -> str:
+        character = self.peek()
+        if not character or character not in characters:
+            self.raise_error(' or '.join(repr(character) for character in characters))
+        self.position += 1
+        return character
+
+    def match(self, pattern, expected):
+        # Matches pattern at the current position, reading on while the match could continue in the next chunk
+        while True:
+            match = pattern.match(self.buffer, self.position)
+            if match and (match.end() < len(self.buffer) or self.end_of_file):
+                self.position = match.end()
+                return match
+            if not self.read_chunk() and not match:
+                self.raise_error(expected)
+
+    def raise_error(self, expected):
+        position = self.characters_read - len(self.buffer) + self.position
+        raise ValueError(f'Expected {expected} at character {position} of the JSON file, '
+                         f'found {self.buffer[self.position:self.position + 20]!r}.')
+
+    def decode(self):
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.end_of_file:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.end_of_file:
+                    raise
+            self.read_chunk()
+
+    def entries(self):
+        # Keys and values of the object starting at the current position, decoding each value when it is reached
+        self.expect('{')
+        if self.peek() == '}':
+            self.position += 1
+            return
+        while True:
+            key = self.match(KEY, 'a key').group(1)
+            yield json.loads(f'"{key}"') if '\\' in key else key
+            if self.match(SEPARATOR, "',' or '}'").group(1) == '}':
+                return
+
+    def __iter__(self):
+        for section in self.entries():
+            if self.buffer[self.position:self.position + 1] != '{':
+                yield section, None, self.decode()
+                continue
+            for key in self.entries():
+                yield section, key, self.decode()
+
+
+def create_network_from_json_stream(net, filename, chunk_size: int = 1 << 16) -> IngestStatistics:
+    """
+    Same network as create_network_from_json, built while the file is read so the parsed file is never held in
+    memory as a whole. Each record is turned into its element and dropped right away. Records of sections that come
+    before bus_data in the file are the only ones kept, until the buses exist.
+    """
+    start = perf_counter()
+    elements = 0
+    deferred = []
+    bus_data_read = False
+    with open(filename, 'r') as f:
+        reader = JSONSectionReader(f, chunk_size)
+        for section, key, value in reader:
+            if section == 'system_data':
+                if key in ('network_name', 's_base_mva', 'frequency_hz'):
+                    setattr(net, key, value)
+            elif section == 'bus_data':
+                RECORD_CREATORS[section](net, value)
+                elements += 1
+                bus_data_read = True
+            elif section in RECORD_CREATORS:
+                if not bus_data_read:
+                    deferred.append((section, value))
+                    continue
+                for deferred_section, record in deferred:
+                    RECORD_CREATORS[deferred_section](net, record)
+                elements += len(deferred) + 1
+                deferred = []
+                RECORD_CREATORS[section](net, value)
+        for deferred_section, record in deferred:
+            RECORD_CREATORS[deferred_section](net, record)
+        elements += len(deferred)
+    return IngestStatistics(elements=elements,
+                            characters_read=reader.characters_read,
+                            seconds=perf_counter() - start,
+                            peak_rss_mb=get_peak_rss_mb())
+
+
+def get_peak_rss_mb() -> float:
+    if resource is None:
+        return float('nan')
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
@@ -0,0 +1,92 @@
+from dataclasses import dataclass, field
+from numpy import ndarray, asarray, zeros
+from .linear_solver import SparseLUSolver
+from .network_matrices import create_dc_b_matrices, calculate_dc_phase_shift_injections
+from .topology import get_energized_buses
+
+
+@dataclass(kw_only=True)
+class DCLoadFlowResult:
+    # (scenarios x buses) and (scenarios x branches) arrays, or vectors for a single injection pattern
+    va: ndarray = field(repr=False)  # Voltage angles in rad
+    p_injection_pu: ndarray = field(repr=False)  # Bus injections B theta, the slack buses balance the network
+    p_from_pu: ndarray = field(repr=False)  # Active power entering every branch at its from bus, lines first
+    p_to_pu: ndarray = field(repr=False)  # Active power entering every branch at its to bus, -p_from_pu
+
+
+class DCLoadFlow:
+    """
+    DC load flow of a switching state: flat voltage magnitudes, lossless branches with the susceptances of their series
+    reactances and tap magnitudes, phase shifts as fixed injections.
+
+    B reduced to the energized buses without the slack buses is factorized once, every injection pattern then takes one
+    solve and any number of patterns are solved together as the columns of one right-hand side. Branch flows are
+    returned in the row order of y_bus_from_to, open branches carry no flow and de-energized buses keep a zero angle.
+    """
+    def __init__(self, net):
+        arrays = net.arrays
+        self.arrays = arrays
+        self.closed_state = arrays.branch_closed.tobytes()
+        self.slack_buses = sorted(net.slack_buses)
+        self.n_buses = arrays.n_buses
+        self.b_bus, self.b_branch = create_dc_b_matrices(net)
+        self.p_shift_branch, self.p_shift_bus = calculate_dc_phase_shift_injections(net)
+
+        # Slack buses and de-energized islands are left out, their angles stay at zero
+        solved = get_energized_buses(net)
+        solved[self.slack_buses] = False
+        self.buses = solved.nonzero()[0]
+        self.b_slack = self.b_bus[self.buses][:, self.slack_buses]
+        self.solver = SparseLUSolver()
+        if len(self.buses):
+            self.solver.factorize(self.b_bus[self.buses][:, self.buses])
+
+    def angles(self, p_pu: ndarray) -> ndarray:
+        # (buses x k) angles of (buses x k) injections without phase shifts, with zero slack angles
+        p_pu = asarray(p_pu, dtype=float).reshape(self.n_buses, -1)
+        theta = zeros(p_pu.shape)
+        if len(self.buses):
+            theta[self.buses] = self.solver.solve_factorized(p_pu[self.buses]).reshape(len(self.buses), -1)
+        return theta
+
+    def solve(self, p_scheduled_pu, va=None) -> DCLoadFlowResult:
+        """
+        p_scheduled_pu is one injection pattern, as a vector or the column set_scheduled_powers returns, or (scenarios
+        x buses) of them. The slack bus angles are taken from va, typically the flat start of the case, and default to
+        zero.
+        """
+        p_scheduled_pu = asarray(p_scheduled_pu, dtype=float)
+        single = p_scheduled_pu.size == self.n_buses
+        p_scheduled_pu = p_scheduled_pu.reshape(-1, self.n_buses).T
+        va_slack = zeros(len(self.slack_buses)) if va is None else asarray(va, dtype=float)[self.slack_buses]
+
+        rhs = p_scheduled_pu - self.p_shift_bus[:, None]
+        rhs[self.buses] -= (self.b_slack @ va_slack)[:, None]
+        theta = self.angles(rhs)
+        theta[self.slack_buses] = va_slack[:, None]
+        p_injection = self.b_bus @ theta + self.p_shift_bus[:, None]
+        p_from = self.b_branch @ theta + self.p_shift_branch[:, None]
+        if single:
+            theta, p_injection, p_from = theta[:, 0], p_injection[:, 0], p_from[:, 0]
+        else:
+            theta, p_injection, p_from = theta.T, p_injection.T, p_from.T
+        return DCLoadFlowResult(va=theta, p_injection_pu=p_injection, p_from_pu=p_from, p_to_pu=-p_from)
+
+
+def get_dc_load_flow(net) -> DCLoadFlow:
+    # Kept with its factorization until the compiled arrays are rebuilt, a branch is switched or the slack buses change
+    arrays = net.arrays
+    dc_load_flow = net.dc_load_flow
+    if (dc_load_flow is None or dc_load_flow.arrays is not arrays
+            or dc_load_flow.closed_state != arrays.branch_closed.tobytes()
+            or dc_load_flow.slack_buses != sorted(net.slack_buses)):
+        dc_load_flow = DCLoadFlow(net)
+        net.dc_load_flow = dc_load_flow
+    return dc_load_flow
+
+
+def run_dc_load_flow(net, p_scheduled_pu, va=None) -> DCLoadFlowResult:
+    """
+    DC load flow of one injection pattern or (scenarios x buses) of them with the cached factorization of the net
+    """
+    return get_dc_load_flow(net).solve(p_scheduled_pu, va)
@@ -20,8 +20,8 @@ def calculate_dsbranch_dx(y_bus_from_to: sparse, from_buses, v: list):
     m = arange(n_branch)
     n = arange(n_bus)
 
-    diag_v_from = sparse((v[from_buses], (m, m)))
-    diag_i_branch = sparse((i_branch, (m, m)))
+    diag_v_from = sparse((v[from_buses], (m, m)), (n_branch, n_branch))
+    diag_i_branch = sparse((i_branch, (m, m)), (n_branch, n_branch))
     diag_v = sparse((v, (n, n)))
     diag_v_norm = sparse((v_norm, (n, n)))
 
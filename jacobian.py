@@ -0,0 +1,84 @@
+from scipy.sparse import csr_matrix, coo_matrix, vstack, hstack
+from numpy import arange, array, array_equal, concatenate, conj, ones, zeros, take, exp, angle, cdouble, int64
+
+
+class JacobianPattern:
+    """
+    Newton-Raphson Jacobian structure for one Y-bus sparsity pattern and PV/PQ partition.
+
+    The pattern is worked out once; every iteration only computes dS/dVa and dS/dVm on the nonzeros of the Y-bus
+    and gathers them into the data array of the Jacobian through a precomputed index map.
+    """
+    def __init__(self, y_bus, pvpq_list, pq_list):
+        y_bus = csr_matrix(y_bus)
+        n = y_bus.shape[0]
+        self.pvpq = array(pvpq_list, dtype=int64)
+        self.pq = array(pq_list, dtype=int64)
+        self.y_indptr = y_bus.indptr.copy()
+        self.y_indices = y_bus.indices.copy()
+
+        # Structure of the Y-bus with the diagonal added, dS/dV has nonzeros exactly there
+        y_rows = y_bus.tocoo().row
+        diagonal = arange(n)
+        structure = coo_matrix((ones(len(y_rows) + n), (concatenate([y_rows, diagonal]),
+                                                         concatenate([y_bus.indices, diagonal]))),
+                               shape=(n, n)).tocsr()
+        structure.sort_indices()
+        nnz = structure.nnz
+        self.rows = structure.tocoo().row
+        self.cols = structure.indices.copy()
+
+        positions = csr_matrix((arange(1, nnz + 1, dtype=float), structure.indices, structure.indptr), shape=(n, n))
+        self.y_positions = array(positions[y_rows, y_bus.indices], dtype=int64).ravel() - 1
+        self.diagonal_positions = array(positions[diagonal, diagonal], dtype=int64).ravel() - 1
+
+        # Each block refers to its own quarter of [dS/dVa.real, dS/dVm.real, dS/dVa.imag, dS/dVm.imag]
+        def block(offset):
+            return csr_matrix((arange(1, nnz + 1, dtype=float) + offset * nnz, structure.indices, structure.indptr),
+                              shape=(n, n))
+
+        j11 = block(0)[self.pvpq, :][:, self.pvpq]
+        j12 = block(1)[self.pvpq, :][:, self.pq]
+        j21 = block(2)[self.pq, :][:, self.pvpq]
+        j22 = block(3)[self.pq, :][:, self.pq]
+        jacobian = vstack([hstack([j11, j12]), hstack([j21, j22])], format='csr')
+        jacobian.sort_indices()
+        self.jacobian_map = jacobian.data.astype(int64) - 1
+        self.jacobian = jacobian
+        self.jacobian.data = zeros(jacobian.nnz)
+        self.nnz = nnz
+
+    def matches(self, y_bus, pvpq_list, pq_list) -> bool:
+        return (array_equal(self.pvpq, pvpq_list) and
+                array_equal(self.pq, pq_list) and
+                array_equal(self.y_indptr, y_bus.indptr) and
+                array_equal(self.y_indices, y_bus.indices))
+
+    def calculate_dsbus_dx(self, y_bus, v):
+        y = zeros(self.nnz, dtype=cdouble)
+        y[self.y_positions] = y_bus.data
+        i_bus = y_bus * v
+        # Unit phasors, also defined for de-energized buses at zero voltage
+        v_norm = exp(1j * angle(v))
+        v_rows = v[self.rows]
+
+        dsbus_dvm = v_rows * conj(y * v_norm[self.cols])
+        dsbus_dvm[self.diagonal_positions] += conj(i_bus) * v_norm
+        dsbus_dva = -1j * v_rows * conj(y * v[self.cols])
+        dsbus_dva[self.diagonal_positions] += 1j * v * conj(i_bus)
+        return dsbus_dvm, dsbus_dva
+
+    def fill(self, y_bus, v):
+        # Updates the Jacobian data in place and returns the shared matrix
+        dsbus_dvm, dsbus_dva = self.calculate_dsbus_dx(y_bus, v)
+        values = concatenate([dsbus_dva.real, dsbus_dvm.real, dsbus_dva.imag, dsbus_dvm.imag])
+        take(values, self.jacobian_map, out=self.jacobian.data)
+        return self.jacobian
+
+
+def get_jacobian_pattern(net, pvpq_list, pq_list) -> JacobianPattern:
+    # Reuses the cached pattern as long as the Y-bus structure and bus type partition are unchanged
+    y_bus = csr_matrix(net.y_bus)
+    if net.jacobian_pattern is None or not net.jacobian_pattern.matches(y_bus, pvpq_list, pq_list):
+        net.jacobian_pattern = JacobianPattern(y_bus, pvpq_list, pq_list)
+    return net.jacobian_pattern
@@ -0,0 +1,96 @@
+from collections import OrderedDict
+from scipy.sparse import csc_matrix, isspmatrix_csr
+from scipy.sparse.linalg import splu
+from numpy import arange, argsort, cumsum, repeat, diff, empty, concatenate, int64
+
+
+class SparseOrdering:
+    # Fill-reducing column ordering of one sparsity pattern and the data map that applies it without fancy indexing
+    def __init__(self, matrix: csc_matrix, column_order):
+        lengths = diff(matrix.indptr)[column_order]
+        starts = matrix.indptr[column_order]
+        self.column_order = column_order
+        self.indptr = concatenate([[0], cumsum(lengths)]).astype(matrix.indptr.dtype)
+        self.data_map = repeat(starts - self.indptr[:-1], lengths) + arange(self.indptr[-1], dtype=int64)
+        self.indices = matrix.indices[self.data_map]
+
+    def permute(self, matrix: csc_matrix) -> csc_matrix:
+        return csc_matrix((matrix.data[self.data_map], self.indices, self.indptr), shape=matrix.shape)
+
+
+class SparseLUSolver:
+    """
+    Sparse LU solver that keeps the COLAMD orderings of the max_orderings sparsity patterns it used last.
+
+    The first factorization of a pattern computes the fill-reducing ordering, later ones apply it to the columns and
+    refactorize numerically with the natural ordering. With reuse_factorization > 1 the numeric LU is also kept for
+    that many solves (dishonest Newton), which trades a few extra iterations for skipped factorizations.
+    """
+    def __init__(self, reuse_factorization: int = 1, max_orderings: int = 8):
+        self.reuse_factorization = reuse_factorization
+        # Least recently used first, switching searches would otherwise keep the ordering of every state they visit
+        self.orderings = OrderedDict()
+        self.max_orderings = max_orderings
+        self.lu = None
+        self.ordering = None
+        self.transposed = False
+        self.permuted = False
+        self.solves_since_factorization = 0
+
+        # Statistics
+        self.analyses = 0
+        self.factorizations = 0
+        self.solves = 0
+
+    def reset(self) -> None:
+        # Forces a numeric refactorization at the next solve
+        self.lu = None
+
+    def factorize(self, matrix) -> None:
+        # A CSR matrix is the CSC storage of its transpose, so it is factorized without conversion
+        if isspmatrix_csr(matrix):
+            matrix = csc_matrix((matrix.data, matrix.indices, matrix.indptr), shape=matrix.shape[::-1])
+            self.transposed = True
+        else:
+            matrix = csc_matrix(matrix)
+            self.transposed = False
+        matrix.sum_duplicates()
+
+        key = (matrix.shape, matrix.indptr.tobytes(), matrix.indices.tobytes())
+        self.ordering = self.orderings.get(key)
+        if self.ordering is None:
+            # SuperLU factorizes A[:, argsort(perm_c)]
+            self.lu = splu(matrix, permc_spec='COLAMD')
+            self.ordering = SparseOrdering(matrix, argsort(self.lu.perm_c))
+            self.orderings[key] = self.ordering
+            if len(self.orderings) > self.max_orderings:
+                self.orderings.popitem(last=False)
+            self.permuted = False
+            self.analyses += 1
+        else:
+            self.orderings.move_to_end(key)
+            self.lu = splu(self.ordering.permute(matrix), permc_spec='NATURAL')
+            self.permuted = True
+        self.factorizations += 1
+        self.solves_since_factorization = 0
+
+    def solve_factorized(self, b):
+        self.solves += 1
+        self.solves_since_factorization += 1
+        b = b.astype(float).reshape(len(b), -1)
+        column_order = self.ordering.column_order
+        if not self.permuted:
+            # Factorized with its own ordering, SuperLU applies the permutation internally
+            x = self.lu.solve(b, trans='T' if self.transposed else 'N')
+        elif self.transposed:
+            x = self.lu.solve(b[column_order], trans='T')
+        else:
+            y = self.lu.solve(b)
+            x = empty(y.shape)
+            x[column_order] = y
+        return x.ravel() if x.shape[1] == 1 else x
+
+    def solve(self, matrix, b):
+        if self.lu is None or self.solves_since_factorization >= self.reuse_factorization:
+            self.factorize(matrix)
+        return self.solve_factorized(b)
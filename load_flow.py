@@ -1,11 +1,16 @@
-from numpy import ones, zeros, longdouble, deg2rad, exp, conj, concatenate
-from scipy.sparse import vstack, hstack, csr_matrix as sparse
-from scipy.sparse.linalg import spsolve
-from .ds_dx import calculate_dsbus_dx
+from dataclasses import dataclass, field
+from numpy import ndarray, ones, zeros, longdouble, deg2rad, exp, conj, concatenate, asarray, isfinite, fromiter, add
+from scipy.sparse import csr_matrix as sparse
+from .jacobian import get_jacobian_pattern
+from .linear_solver import SparseLUSolver
+from .radial_load_flow import RadialFeeder, backward_forward_sweep
+from .dc_load_flow import run_dc_load_flow
+from .topology import check_multiple_slacks, energize_buses
+from .create.binary import BinaryFile, BUS_TYPES, is_binary_file, read_binary_load_flow_case
 import json
-from .network_matrices import remove_line_from_y_bus, remove_transformer_from_y_bus
+from .network_matrices import create_decoupled_b_matrices
+from .switching import SwitchingManager, get_switching_manager, get_branch_states
 import networkx as nx
-from itertools import combinations
 
 
 def flat_start(net, load_flow_data):
@@ -21,46 +26,35 @@ def flat_start(net, load_flow_data):
     return vm, va
 
 
-def get_bus_load_flow_types(net, load_flow_data) -> None:
-    net.pq_buses = set()
-    net.pv_buses = set()
-    net.slack_buses = set()
+def read_bus_load_flow_types(net, load_flow_data):
+    # PQ, PV and slack bus positions of the case
+    pq_buses = set()
+    pv_buses = set()
+    slack_buses = set()
     for bus, bus_type in load_flow_data['load_flow_type'].items():
         i = net.bus_map[int(bus)]
         if bus_type == 'PQ':
-            net.pq_buses.add(i)
+            pq_buses.add(i)
         elif bus_type == 'PV':
-            net.pv_buses.add(i)
+            pv_buses.add(i)
         else:
-            net.slack_buses.add(i)
-
+            slack_buses.add(i)
+    return pq_buses, pv_buses, slack_buses
 
-def check_multiple_slacks(net) -> None:
-    G = nx.Graph()
 
-    # Add lines as edges
-    for line in net.lines.values():
-        if line.closed:
-            i = net.bus_map[line.from_bus.bus_idx]
-            j = net.bus_map[line.to_bus.bus_idx]
-            G.add_edge(i, j)
+def get_bus_load_flow_types(net, load_flow_data) -> None:
+    net.pq_buses, net.pv_buses, net.slack_buses = read_bus_load_flow_types(net, load_flow_data)
 
-    # Add transformers as edges
-    for transformer in net.transformers.values():
-        if transformer.closed:
-            i = net.bus_map[transformer.from_bus.bus_idx]
-            j = net.bus_map[transformer.to_bus.bus_idx]
-            G.add_edge(i, j)
 
-    # Add all buses as nodes (redundant if all are already in edges, but safe)
-    for bus in net.buses.values():
-        i = net.bus_map[bus.bus_idx]
-        G.add_node(i)
+def create_network_graph(net) -> nx.Graph:
+    arrays = net.arrays
+    closed = arrays.branch_closed
+    G = nx.Graph()
 
-    # Check if any two slack buses are connected
-    for u, v in combinations(net.slack_buses, 2):
-        if nx.has_path(G, u, v):
-            raise ValueError(f"Slack buses {u} and {v} are electrically connected.")
+    # Add closed lines and transformers as edges and every bus as a node
+    G.add_nodes_from(range(arrays.n_buses))
+    G.add_edges_from(zip(arrays.branch_from[closed].tolist(), arrays.branch_to[closed].tolist()))
+    return G
 
 
 def set_scheduled_powers(net, load_flow_data):
@@ -86,26 +80,64 @@ def calculate_injection_powers(net, v):
     return S.reshape((len(net.buses), 1))
 
 
-def calculate_jacobian_matrix(net, v, pvpq_list, pq_list):
-    ds_dvm, ds_dva = calculate_dsbus_dx(sparse(net.y_bus), v)
-
-    j11 = ds_dva[pvpq_list, :][:, pvpq_list].real
-    j12 = ds_dvm[pvpq_list, :][:, pq_list].real
-    J21 = ds_dva[pq_list, :][:, pvpq_list].imag
-    J22 = ds_dvm[pq_list, :][:, pq_list].imag
+def calculate_jacobian_matrix(net, v, pvpq_list, pq_list, jacobian_pattern=None):
+    if jacobian_pattern is None:
+        jacobian_pattern = get_jacobian_pattern(net, pvpq_list, pq_list)
+    return jacobian_pattern.fill(sparse(net.y_bus), v)
 
-    return vstack([hstack([j11, j12]), hstack([J21, J22])])
 
-
-def load_flow_step(net, v, pvpq_list, pq_list, p_scheduled_pu, q_scheduled_pu):
+def load_flow_step(net, v, pvpq_list, pq_list, p_scheduled_pu, q_scheduled_pu, jacobian_pattern=None, solver=None):
     S = calculate_injection_powers(net, v)
 
-    J  = calculate_jacobian_matrix(net, v, pvpq_list, pq_list)
+    J = calculate_jacobian_matrix(net, v, pvpq_list, pq_list, jacobian_pattern)
     delta_p = S.real[pvpq_list] - p_scheduled_pu[pvpq_list]
     delta_q = S.imag[pq_list] - q_scheduled_pu[pq_list]
 
-    F = concatenate([delta_p, delta_q])
-    return -spsolve(J, F), F
+    # SuperLU only accepts double precision right-hand sides
+    F = concatenate([delta_p, delta_q]).astype(float)
+    if solver is None:
+        solver = net.load_flow_solver
+    return -solver.solve(J, F), F
+
+
+def get_bus_positions(net, bus_idx):
+    return fromiter(map(net.bus_map.__getitem__, bus_idx.tolist()), dtype=int, count=len(bus_idx))
+
+
+def flat_start_from_binary(net, case: BinaryFile):
+    vm = ones(len(net.buses))
+    va = zeros(len(net.buses))
+    vm[get_bus_positions(net, case.blocks['generation.bus_idx'])] = case.blocks['generation.vm_pu']
+    slack_buses = get_bus_positions(net, case.blocks['slack_bus.bus_idx'])
+    vm[slack_buses] = case.blocks['slack_bus.vm_pu']
+    va[slack_buses] = deg2rad(case.blocks['slack_bus.va_degree'])
+    return vm, va
+
+
+def read_bus_load_flow_types_from_binary(net, case: BinaryFile):
+    buses = get_bus_positions(net, case.blocks['load_flow_type.bus_idx'])
+    bus_types = case.blocks['load_flow_type.type']
+    return tuple(set(buses[bus_types == code].tolist()) for code in range(len(BUS_TYPES)))
+
+
+def get_bus_load_flow_types_from_binary(net, case: BinaryFile) -> None:
+    net.pq_buses, net.pv_buses, net.slack_buses = read_bus_load_flow_types_from_binary(net, case)
+
+
+def set_scheduled_powers_from_binary(net, case: BinaryFile):
+    # Accumulated in the order of set_scheduled_powers so both file formats give the same scheduled powers
+    p_scheduled_pu = zeros((len(net.buses), 1), dtype=longdouble)
+    q_scheduled_pu = zeros((len(net.buses), 1), dtype=longdouble)
+    blocks = case.blocks
+    add.at(p_scheduled_pu[:, 0], get_bus_positions(net, blocks['generation.bus_idx']),
+           net.mw_to_pu(blocks['generation.p_mw']))
+    load_buses = get_bus_positions(net, blocks['load.bus_idx'])
+    add.at(p_scheduled_pu[:, 0], load_buses, -net.mw_to_pu(blocks['load.p_mw']))
+    add.at(q_scheduled_pu[:, 0], load_buses, -net.mw_to_pu(blocks['load.q_mvar']))
+    static_generation_buses = get_bus_positions(net, blocks['static_generation.bus_idx'])
+    add.at(p_scheduled_pu[:, 0], static_generation_buses, net.mw_to_pu(blocks['static_generation.p_mw']))
+    add.at(q_scheduled_pu[:, 0], static_generation_buses, net.mw_to_pu(blocks['static_generation.q_mvar']))
+    return p_scheduled_pu, q_scheduled_pu
 
 
 def read_load_flow_data(load_flow_case):
@@ -115,28 +147,156 @@ def read_load_flow_data(load_flow_case):
     return load_flow_data
 
 
-def run_load_flow_from_case_file(net, load_flow_case) -> None:
+@dataclass(kw_only=True)
+class LoadFlowCase:
+    p_scheduled_pu: ndarray = field(repr=False)
+    q_scheduled_pu: ndarray = field(repr=False)
+    vm: ndarray = field(repr=False)  # Flat start with the PV and slack set points
+    va: ndarray = field(repr=False)
+    pq_buses: set = field(repr=False)
+    pv_buses: set = field(repr=False)
+    slack_buses: set = field(repr=False)
+    open_lines: list
+    open_transformers: list
+
+
+def read_load_flow_case(net, load_flow_case) -> LoadFlowCase:
+    # Inputs of a JSON case or a binary case written by convert_load_flow_case_to_binary, the net is left untouched
+    if is_binary_file(load_flow_case):
+        case = read_binary_load_flow_case(load_flow_case)
+        p_scheduled_pu, q_scheduled_pu = set_scheduled_powers_from_binary(net, case)
+        vm, va = flat_start_from_binary(net, case)
+        pq_buses, pv_buses, slack_buses = read_bus_load_flow_types_from_binary(net, case)
+        open_lines = case.blocks['open_line.line_idx'].tolist()
+        open_transformers = case.blocks['open_transformer.transformer_idx'].tolist()
+    else:
+        load_flow_data = read_load_flow_data(load_flow_case)
+        p_scheduled_pu, q_scheduled_pu = set_scheduled_powers(net, load_flow_data)
+        vm, va = flat_start(net, load_flow_data)
+        pq_buses, pv_buses, slack_buses = read_bus_load_flow_types(net, load_flow_data)
+        open_lines = list(load_flow_data['open_line'].values())
+        open_transformers = list(load_flow_data['open_transformer'].values())
+    return LoadFlowCase(p_scheduled_pu=p_scheduled_pu, q_scheduled_pu=q_scheduled_pu, vm=vm, va=va,
+                        pq_buses=pq_buses, pv_buses=pv_buses, slack_buses=slack_buses,
+                        open_lines=open_lines, open_transformers=open_transformers)
+
+
+def prepare_load_flow_from_case_file(net, load_flow_case):
     """
-    Wrapper function for load flow to run with case file
+    Sets bus types and y_bus of the case and returns its scheduled powers and flat start. Buses in islands without a
+    slack bus are flagged as de-energized, left out of the PQ and PV buses and start at zero voltage. The case is
+    either a JSON file or a binary file written by convert_load_flow_case_to_binary.
     """
-    load_flow_data = read_load_flow_data(load_flow_case)
-    p_scheduled_pu, q_scheduled_pu = set_scheduled_powers(net, load_flow_data)
-    vm, va = flat_start(net, load_flow_data)
-    get_bus_load_flow_types(net, load_flow_data)
-    net.y_bus = net.full_y_bus.copy()
-    update_y_bus(net, load_flow_data)
+    case = read_load_flow_case(net, load_flow_case)
+    net.pq_buses, net.pv_buses, net.slack_buses = case.pq_buses, case.pv_buses, case.slack_buses
+    # Matrices with every branch stored, the case's open branches are switched out in place
+    net.switching_manager = SwitchingManager(net, get_branch_states(net, case.open_lines, case.open_transformers))
     check_multiple_slacks(net)
-    load_flow(net, p_scheduled_pu, q_scheduled_pu, vm, va)
+    energized = energize_buses(net)
+    vm, va = case.vm, case.va
+    vm[~energized] = 0
+    va[~energized] = 0
+    return case.p_scheduled_pu, case.q_scheduled_pu, vm, va
+
+
+def run_load_flow_from_case_file(net, load_flow_case, method='NR') -> None:
+    """
+    Wrapper function for load flow to run with case file
+    """
+    p_scheduled_pu, q_scheduled_pu, vm, va = prepare_load_flow_from_case_file(net, load_flow_case)
+    load_flow(net, p_scheduled_pu, q_scheduled_pu, vm, va, method=method)
 
 
 def update_y_bus(net, load_flow_data):
-    for line_idx in load_flow_data['open_line'].values():
-        net.lines[line_idx].closed = False
-        remove_line_from_y_bus(net, net.lines[line_idx])
+    open_branches(net, load_flow_data['open_line'].values(), load_flow_data['open_transformer'].values())
+
+
+def open_branches(net, line_indices, transformer_indices):
+    # Cases may list a branch more than once, switching an open branch does nothing
+    manager = get_switching_manager(net)
+    for line_idx in line_indices:
+        manager.open_line(line_idx)
+
+    for transformer_idx in transformer_indices:
+        manager.open_transformer(transformer_idx)
+
+
+def newton_raphson(y_bus,
+                   vm,
+                   va,
+                   p_scheduled_pu,
+                   q_scheduled_pu,
+                   jacobian_pattern,
+                   solver,
+                   max_iteration: int = 100,
+                   tolerance: float = 1e-8,
+                   mismatch_history: list = None):
+    # Updates vm and va in place, returns the iteration count and whether the mismatch fell below the tolerance.
+    # The largest mismatch of every iteration is appended to mismatch_history when one is given.
+    y_bus = sparse(y_bus)
+    pvpq_list = jacobian_pattern.pvpq
+    pq_list = jacobian_pattern.pq
+    p_scheduled_pu = asarray(p_scheduled_pu, dtype=float).ravel()
+    q_scheduled_pu = asarray(q_scheduled_pu, dtype=float).ravel()
 
-    for transformer_idx in load_flow_data['open_transformer'].values():
-        net.transformers[transformer_idx].closed = False
-        remove_transformer_from_y_bus(net, net.transformers[transformer_idx])
+    iteration = 0
+    while iteration < max_iteration:
+        iteration += 1
+        v = vm*exp(1j*va)
+        S = v * conj(y_bus * v)
+        F = concatenate([S.real[pvpq_list] - p_scheduled_pu[pvpq_list], S.imag[pq_list] - q_scheduled_pu[pq_list]])
+        if mismatch_history is not None:
+            mismatch_history.append(float(abs(F).max(initial=0)))
+        if not isfinite(F).all():
+            return iteration, False
+        J = jacobian_pattern.fill(y_bus, v)
+        delta_x = -solver.solve(J, F)
+
+        va[pvpq_list] += delta_x[0:len(pvpq_list)]
+        vm[pq_list] += delta_x[len(pvpq_list):len(pvpq_list) + len(pq_list)]
+
+        if abs(F).max() < tolerance:
+            return iteration, True
+    return iteration, False
+
+
+def fast_decoupled(y_bus,
+                   vm,
+                   va,
+                   p_scheduled_pu,
+                   q_scheduled_pu,
+                   b_prime_solver,
+                   b_double_prime_solver,
+                   pvpq_list,
+                   pq_list,
+                   max_iteration: int = 100,
+                   tolerance: float = 1e-8,
+                   mismatch_history: list = None):
+    # Alternating P-theta and Q-V half steps on factorized B' and B'', updates vm and va in place. An iteration is
+    # one pair of half steps and the mismatch is checked after each of them, and appended to mismatch_history when
+    # one is given.
+    y_bus = sparse(y_bus)
+    s_scheduled_pu = asarray(p_scheduled_pu, dtype=float).ravel() + 1j*asarray(q_scheduled_pu, dtype=float).ravel()
+
+    def mismatch():
+        v = vm*exp(1j*va)
+        S = v * conj(y_bus * v) - s_scheduled_pu
+        max_mismatch = abs(concatenate([S.real[pvpq_list], S.imag[pq_list]])).max(initial=0)
+        if mismatch_history is not None:
+            mismatch_history.append(float(max_mismatch))
+        return S, max_mismatch
+
+    S, max_mismatch = mismatch()
+    half_steps = 0
+    while max_mismatch >= tolerance and half_steps < 2 * max_iteration:
+        if half_steps % 2 == 0:
+            va[pvpq_list] -= b_prime_solver.solve_factorized(S.real[pvpq_list] / vm[pvpq_list])
+        else:
+            vm[pq_list] -= b_double_prime_solver.solve_factorized(S.imag[pq_list] / vm[pq_list])
+        half_steps += 1
+        S, max_mismatch = mismatch()
+    # A non finite mismatch fails the comparison and ends the loop as not converged
+    return (half_steps + 1) // 2, bool(max_mismatch < tolerance)
 
 
 def load_flow(net,
@@ -145,29 +305,53 @@ def load_flow(net,
               vm,
               va,
               max_iteration: int = 100,
-              tolerance: float = 1e-8) -> None:
+              tolerance: float = 1e-8,
+              reuse_factorization: int = 1,
+              method: str = 'NR',
+              verbose: bool = True) -> None:
+    # method is 'NR' (Newton-Raphson), 'FDXB' / 'FDBX' (fast decoupled), 'BFS' (backward/forward sweep, radial only) or
+    # 'DC' (linear DC approximation)
+    # reuse_factorization > 1 keeps each Jacobian LU for that many iterations (dishonest Newton)
 
     pvpq_list = sorted(list(net.pq_buses) + list(net.pv_buses))
     pq_list = sorted(list(net.pq_buses))
-
-    iteration = 0
-
-    while iteration < max_iteration:
-        iteration += 1
-        v = vm*exp(1j*va)
-        delta_x, F = load_flow_step(net, v, pvpq_list, pq_list, p_scheduled_pu, q_scheduled_pu)
-        delta_va = delta_x[0:len(pvpq_list)]
-        delta_vm = delta_x[len(pvpq_list):len(pvpq_list) + len(pq_list)]
-
-        va[pvpq_list] += delta_va
-        vm[pq_list] += delta_vm
-
-        eps = max(abs(F))
-        if eps < tolerance:
-            print(f'Newton-Raphson Load FLow Converged at Iteration {iteration}')
-            net.vm = vm
-            net.va = va
-            break
-
-        if iteration == max_iteration:
-            print(f'Did not converge!')
+    if method == 'NR':
+        jacobian_pattern = get_jacobian_pattern(net, pvpq_list, pq_list)
+        solver = net.load_flow_solver
+        solver.reuse_factorization = reuse_factorization
+        solver.reset()
+
+        iteration, converged = newton_raphson(net.y_bus, vm, va, p_scheduled_pu, q_scheduled_pu, jacobian_pattern,
+                                              solver, max_iteration, tolerance)
+        method_name = 'Newton-Raphson'
+    elif method in ('FDXB', 'FDBX'):
+        # B' and B'' are factorized once and kept for every iteration
+        b_prime, b_double_prime = create_decoupled_b_matrices(net, method[2:])
+        b_prime_solver = SparseLUSolver()
+        b_prime_solver.factorize(b_prime[pvpq_list][:, pvpq_list])
+        b_double_prime_solver = SparseLUSolver()
+        b_double_prime_solver.factorize(b_double_prime[pq_list][:, pq_list])
+
+        iteration, converged = fast_decoupled(net.y_bus, vm, va, p_scheduled_pu, q_scheduled_pu, b_prime_solver,
+                                              b_double_prime_solver, pvpq_list, pq_list, max_iteration, tolerance)
+        method_name = f'Fast Decoupled ({method[2:]})'
+    elif method == 'BFS':
+        feeder = RadialFeeder(net, create_network_graph(net), sorted(net.slack_buses))
+        iteration, converged = backward_forward_sweep(sparse(net.y_bus), vm, va, p_scheduled_pu, q_scheduled_pu,
+                                                      feeder, max_iteration, tolerance)
+        method_name = 'Backward/Forward Sweep'
+    elif method == 'DC':
+        # One solve with the cached factorization of B, the voltage magnitudes keep their start values
+        va[:] = run_dc_load_flow(net, p_scheduled_pu, va).va
+        iteration, converged = 1, True
+        method_name = 'DC'
+    else:
+        raise ValueError(f'Unknown load flow method {method}, expected NR, FDXB, FDBX, BFS or DC.')
+
+    if converged:
+        if verbose:
+            print(f'{method_name} Load FLow Converged at Iteration {iteration}')
+        net.vm = vm
+        net.va = va
+    elif verbose:
+        print(f'Did not converge!')
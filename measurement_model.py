@@ -0,0 +1,143 @@
+from dataclasses import dataclass
+from collections import Counter
+from numpy import ndarray, array, conj, concatenate, where, arange, ones, cumsum, int64
+from scipy.sparse import csr_matrix, vstack, hstack, diags
+from .ds_dx import calculate_dsbranch_dx
+
+BUS_MEASUREMENT_TYPES = ['v_magnitude', 'p_injection', 'q_injection']
+BRANCH_MEASUREMENT_TYPES = ['p_flow', 'q_flow']
+
+
+# Measured bus rows and branch rows in the order of the measurement vector, flows are taken at the from end of the
+# branch unless the measurement names its buses the other way around
+@dataclass(kw_only=True)
+class MeasurementLocations:
+    v_magnitude_bus: ndarray
+    p_injection_bus: ndarray
+    q_injection_bus: ndarray
+    p_flow_branch: ndarray
+    p_flow_from_side: ndarray
+    q_flow_branch: ndarray
+    q_flow_from_side: ndarray
+
+
+class MeasurementModel:
+    """
+    Measurement set compiled once against the network matrices.
+
+    Measurements are ordered by type: voltage magnitudes, active and reactive injections, active and reactive flows.
+    Every power measurement is s = V_t conj(y V) for one admittance row y and one terminal bus t, a row of y_bus for
+    injections and a row of y_bus_from_to or y_bus_to_from for flows, so h(x) and its Jacobian are evaluated on the
+    stacked rows of the measured locations only. Values changed on the measurement objects afterwards need
+    net.invalidate_measurement_model().
+    """
+    def __init__(self, net):
+        measured = {measurement_type: [] for measurement_type in BUS_MEASUREMENT_TYPES + BRANCH_MEASUREMENT_TYPES}
+        for idx, measurement in net.bus_measurements.items():
+            measurement_type = measurement.measurement_type
+            if measurement_type not in ('v_magnitude', 'p_injection'):
+                measurement_type = 'q_injection'
+            measured[measurement_type].append((('bus', idx), net.bus_map[measurement.bus.bus_idx], measurement))
+
+        # Parallel branches between the same buses are assigned to consecutive measurements of the same type
+        arrays = net.arrays
+        terminals = {}
+        for branch, (i, j) in enumerate(zip(arrays.branch_from.tolist(), arrays.branch_to.tolist())):
+            terminals.setdefault((i, j), []).append((branch, True))
+            terminals.setdefault((j, i), []).append((branch, False))
+        assigned = Counter()
+        for idx, measurement in net.branch_measurements.items():
+            measurement_type = measurement.measurement_type
+            if measurement_type not in BRANCH_MEASUREMENT_TYPES:
+                continue
+            buses = (net.bus_map[measurement.from_bus.bus_idx], net.bus_map[measurement.to_bus.bus_idx])
+            if buses not in terminals:
+                raise ValueError(f'No branch between buses {measurement.from_bus.bus_idx} and '
+                                 f'{measurement.to_bus.bus_idx} for measurement {measurement.measurement_idx}.')
+            candidates = terminals[buses]
+            location = candidates[min(assigned[measurement_type, buses], len(candidates) - 1)]
+            measured[measurement_type].append((('branch', idx), location, measurement))
+            assigned[measurement_type, buses] += 1
+
+        def rows(measurement_type):
+            return [location for _, location, _ in measured[measurement_type]]
+
+        def branches(measurement_type):
+            return (array([branch for branch, _ in rows(measurement_type)], dtype=int64),
+                    array([from_side for _, from_side in rows(measurement_type)], dtype=bool))
+
+        p_flow_branch, p_flow_from_side = branches('p_flow')
+        q_flow_branch, q_flow_from_side = branches('q_flow')
+        self.locations = MeasurementLocations(v_magnitude_bus=array(rows('v_magnitude'), dtype=int64),
+                                              p_injection_bus=array(rows('p_injection'), dtype=int64),
+                                              q_injection_bus=array(rows('q_injection'), dtype=int64),
+                                              p_flow_branch=p_flow_branch,
+                                              p_flow_from_side=p_flow_from_side,
+                                              q_flow_branch=q_flow_branch,
+                                              q_flow_from_side=q_flow_from_side)
+
+        ordered = sum(measured.values(), [])
+        self.measurement_keys = [key for key, _, _ in ordered]  # ('bus' or 'branch', measurement dict key)
+        self.measurement_types = [measurement_type for measurement_type, entries in measured.items() for _ in entries]
+        self.z = array([measurement.value_pu for _, _, measurement in ordered], dtype=float)
+        self.std_dev = array([measurement.std_dev for _, _, measurement in ordered], dtype=float)
+        self.weights = 1 / self.std_dev ** 2
+        self.weight_matrix = diags(self.weights, format='csr')
+
+        # Admittance rows and terminal buses of the power measurements
+        locations = self.locations
+        n_branches = arrays.n_branches
+        y_bus = csr_matrix(net.y_bus)
+        y_bus_sides = vstack((net.y_bus_from_to, net.y_bus_to_from), format='csr')
+        flow_rows = concatenate([where(locations.p_flow_from_side, locations.p_flow_branch,
+                                       locations.p_flow_branch + n_branches),
+                                 where(locations.q_flow_from_side, locations.q_flow_branch,
+                                       locations.q_flow_branch + n_branches)]).astype(int64)
+        self.power_y = vstack((y_bus[locations.p_injection_bus],
+                               y_bus[locations.q_injection_bus],
+                               y_bus_sides[flow_rows]), format='csr')
+        self.power_terminal = concatenate([locations.p_injection_bus,
+                                           locations.q_injection_bus,
+                                           where(locations.p_flow_from_side,
+                                                 arrays.branch_from[locations.p_flow_branch],
+                                                 arrays.branch_to[locations.p_flow_branch]),
+                                           where(locations.q_flow_from_side,
+                                                 arrays.branch_from[locations.q_flow_branch],
+                                                 arrays.branch_to[locations.q_flow_branch])]).astype(int64)
+        # Row ranges of P injections, Q injections, P flows and Q flows in power_y
+        self.power_bounds = cumsum([0,
+                                    len(locations.p_injection_bus),
+                                    len(locations.q_injection_bus),
+                                    len(p_flow_branch),
+                                    len(q_flow_branch)]).tolist()
+        self.n_buses = arrays.n_buses
+
+    @property
+    def n_measurements(self):
+        return len(self.z)
+
+    def split_power(self, s):
+        # Real parts of the active power rows and imaginary parts of the reactive power rows, in measurement order
+        b = self.power_bounds
+        return s[b[0]:b[1]].real, s[b[1]:b[2]].imag, s[b[2]:b[3]].real, s[b[3]:b[4]].imag
+
+    def hx(self, v):
+        s = v[self.power_terminal] * conj(self.power_y * v)
+        return concatenate([abs(v[self.locations.v_magnitude_bus]), *self.split_power(s)])
+
+    def jacobian(self, v, angle_indices):
+        # Rows for the measurements only, columns for the angles of angle_indices and every voltage magnitude
+        ds_dvm, ds_dva = calculate_dsbranch_dx(self.power_y, self.power_terminal, v)
+        n_v = len(self.locations.v_magnitude_bus)
+        v_jac_vm = csr_matrix((ones(n_v), (arange(n_v), self.locations.v_magnitude_bus)), shape=(n_v, self.n_buses))
+        jac_va = vstack((csr_matrix((n_v, self.n_buses)), *self.split_power(ds_dva)), format='csc')
+        jac_vm = vstack((v_jac_vm, *self.split_power(ds_dvm)), format='csr')
+        return hstack((jac_va[:, angle_indices], jac_vm), format='csr')
+
+
+def compile_measurements(net) -> MeasurementModel:
+    return MeasurementModel(net)
+
+
+def locate_measurements(net) -> MeasurementLocations:
+    return net.measurement_model.locations
@@ -1,6 +1,8 @@
 import numpy as np
-from scipy.sparse.linalg import inv
 import math
+from .network_arrays import compile_network
+from .measurement_model import compile_measurements
+from .linear_solver import SparseLUSolver
 
 
 class Net:
@@ -57,6 +59,19 @@ class Net:
         self._line_map = {}
         self._transformer_map = {}
 
+        # Compiled Arrays
+        self._arrays = None
+        self._measurement_model = None
+
+        # Solver Caches
+        self._topology = None
+        self._jacobian_pattern = None
+        self._switching_manager = None
+        self._distribution_factors = None
+        self._dc_load_flow = None
+        self._load_flow_solver = SparseLUSolver()
+        self._state_estimation_solver = SparseLUSolver()
+
     def __repr__(self):
         return (f'System Properties\n'
                 f'-------------------------\n'
@@ -109,6 +124,35 @@ class Net:
         return pu*yBase
     # endregion
 
+    # region Compiled Arrays
+    @property
+    def arrays(self):
+        # Built on first use and dropped whenever elements are added or replaced
+        if self._arrays is None:
+            self._arrays = compile_network(self)
+        return self._arrays
+
+    @arrays.setter
+    def arrays(self, value):
+        # Arrays built elsewhere, e.g. views of a binary network file, must be in the order of the index maps
+        self._arrays = value
+        self._measurement_model = None
+
+    def invalidate_arrays(self):
+        self._arrays = None
+        self._measurement_model = None
+
+    @property
+    def measurement_model(self):
+        # Built on first use and dropped whenever measurements, branches or the network matrices are replaced
+        if self._measurement_model is None:
+            self._measurement_model = compile_measurements(self)
+        return self._measurement_model
+
+    def invalidate_measurement_model(self):
+        self._measurement_model = None
+    # endregion
+
     # region Getters and Setters
     @property
     def buses(self):
@@ -117,6 +161,7 @@ class Net:
     @buses.setter
     def buses(self, value):
         self._buses = value
+        self.invalidate_arrays()
 
     @property
     def generators(self):
@@ -125,6 +170,7 @@ class Net:
     @generators.setter
     def generators(self, value):
         self._generators = value
+        self.invalidate_arrays()
 
     @property
     def loads(self):
@@ -133,6 +179,7 @@ class Net:
     @loads.setter
     def loads(self, value):
         self._loads = value
+        self.invalidate_arrays()
 
     @property
     def shunts(self):
@@ -141,6 +188,7 @@ class Net:
     @shunts.setter
     def shunts(self, value):
         self._shunts = value
+        self.invalidate_arrays()
 
     @property
     def batteries(self):
@@ -149,6 +197,7 @@ class Net:
     @batteries.setter
     def batteries(self, value):
         self._batteries = value
+        self.invalidate_arrays()
 
     @property
     def lines(self):
@@ -157,6 +206,7 @@ class Net:
     @lines.setter
     def lines(self, value):
         self._lines = value
+        self.invalidate_arrays()
 
     @property
     def transformers(self):
@@ -165,6 +215,7 @@ class Net:
     @transformers.setter
     def transformers(self, value):
         self._transformers = value
+        self.invalidate_arrays()
 
     @property
     def soft_open_points(self):
@@ -173,6 +224,7 @@ class Net:
     @soft_open_points.setter
     def soft_open_points(self, value):
         self._soft_open_points = value
+        self.invalidate_arrays()
 
     @property
     def network_name(self):
@@ -213,6 +265,7 @@ class Net:
     @y_bus_from_to.setter
     def y_bus_from_to(self, value):
         self._y_bus_from_to = value
+        self.invalidate_measurement_model()
 
     @property
     def y_bus_to_from(self):
@@ -221,6 +274,7 @@ class Net:
     @y_bus_to_from.setter
     def y_bus_to_from(self, value):
         self._y_bus_to_from = value
+        self.invalidate_measurement_model()
 
     @property
     def full_y_bus_shunt(self):
@@ -237,6 +291,7 @@ class Net:
     @y_bus.setter
     def y_bus(self, value):
         self._y_bus = value
+        self.invalidate_measurement_model()
 
     @property
     def pq_buses(self):
@@ -285,6 +340,7 @@ class Net:
     @bus_measurements.setter
     def bus_measurements(self, value):
         self._bus_measurements = value
+        self.invalidate_measurement_model()
 
     @property
     def branch_measurements(self):
@@ -293,6 +349,7 @@ class Net:
     @branch_measurements.setter
     def branch_measurements(self, value):
         self._branch_measurements = value
+        self.invalidate_measurement_model()
 
     @property
     def vm_estimated(self):
@@ -317,6 +374,7 @@ class Net:
     @bus_map.setter
     def bus_map(self, value):
         self._bus_map = value
+        self.invalidate_arrays()
 
     @property
     def line_map(self):
@@ -325,6 +383,7 @@ class Net:
     @line_map.setter
     def line_map(self, value):
         self._line_map = value
+        self.invalidate_arrays()
 
     @property
     def transformer_map(self):
@@ -333,4 +392,61 @@ class Net:
     @transformer_map.setter
     def transformer_map(self, value):
         self._transformer_map = value
+        self.invalidate_arrays()
+
+    @property
+    def topology(self):
+        return self._topology
+
+    @topology.setter
+    def topology(self, value):
+        self._topology = value
+
+    @property
+    def jacobian_pattern(self):
+        return self._jacobian_pattern
+
+    @jacobian_pattern.setter
+    def jacobian_pattern(self, value):
+        self._jacobian_pattern = value
+
+    @property
+    def switching_manager(self):
+        return self._switching_manager
+
+    @switching_manager.setter
+    def switching_manager(self, value):
+        self._switching_manager = value
+
+    @property
+    def distribution_factors(self):
+        return self._distribution_factors
+
+    @distribution_factors.setter
+    def distribution_factors(self, value):
+        self._distribution_factors = value
+
+    @property
+    def dc_load_flow(self):
+        return self._dc_load_flow
+
+    @dc_load_flow.setter
+    def dc_load_flow(self, value):
+        self._dc_load_flow = value
+
+    @property
+    def load_flow_solver(self):
+        return self._load_flow_solver
+
+    @load_flow_solver.setter
+    def load_flow_solver(self, value):
+        self._load_flow_solver = value
+
+    @property
+    def state_estimation_solver(self):
+        return self._state_estimation_solver
+
+    @state_estimation_solver.setter
+    def state_estimation_solver(self, value):
+        self._state_estimation_solver = value
     # endregion
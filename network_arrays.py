@@ -0,0 +1,137 @@
+from dataclasses import dataclass
+from numpy import ndarray, fromiter, empty, concatenate
+
+
+# Columnar view of a Net. Bus arrays are ordered by bus_map, line arrays by line_map and transformer arrays by
+# transformer_map. Branch arrays stack lines first and transformers after them, which is also the row order of
+# y_bus_from_to and y_bus_to_from.
+@dataclass(kw_only=True)
+class NetworkArrays:
+    # Buses
+    bus_idx: ndarray
+    bus_kv: ndarray
+
+    # Lines
+    line_idx: ndarray
+    line_from: ndarray
+    line_to: ndarray
+    line_r_ohm: ndarray
+    line_x_ohm: ndarray
+    line_b_total_mho: ndarray
+    line_closed: ndarray
+
+    # Transformers
+    transformer_idx: ndarray
+    transformer_from: ndarray
+    transformer_to: ndarray
+    transformer_v_rated_low_kv: ndarray
+    transformer_rated_s_mva: ndarray
+    transformer_r_pu: ndarray
+    transformer_x_pu: ndarray
+    transformer_gm_pu: ndarray
+    transformer_bm_pu: ndarray
+    transformer_tap: ndarray
+    transformer_phase_shift: ndarray
+    transformer_closed: ndarray
+
+    # Shunt elements
+    shunt_bus: ndarray
+    shunt_p_mw: ndarray
+    shunt_q_mvar: ndarray
+    # Loads and generators by bus only, their powers are scheduled by the load flow case
+    load_bus: ndarray
+    generator_bus: ndarray
+
+    @property
+    def n_buses(self):
+        return len(self.bus_kv)
+
+    @property
+    def n_lines(self):
+        return len(self.line_from)
+
+    @property
+    def n_branches(self):
+        return len(self.line_from) + len(self.transformer_from)
+
+    @property
+    def branch_from(self):
+        return concatenate([self.line_from, self.transformer_from])
+
+    @property
+    def branch_to(self):
+        return concatenate([self.line_to, self.transformer_to])
+
+    @property
+    def branch_closed(self):
+        return concatenate([self.line_closed, self.transformer_closed])
+
+
+def ordered_array(elements, rows, attribute, dtype):
+    # Scatter an element attribute into the position given by its index map
+    values = empty(len(rows), dtype=dtype)
+    values[rows] = fromiter((attribute(element) for element in elements), dtype=dtype, count=len(rows))
+    return values
+
+
+def element_rows(elements, element_map, key):
+    return fromiter((element_map[key(element)] for element in elements), dtype=int, count=len(elements))
+
+
+def compile_network(net) -> NetworkArrays:
+    buses = list(net.buses.values())
+    lines = list(net.lines.values())
+    transformers = list(net.transformers.values())
+    shunts = list(net.shunts.values())
+    loads = list(net.loads.values())
+    generators = list(net.generators.values())
+
+    bus_rows = element_rows(buses, net.bus_map, lambda b: b.bus_idx)
+    line_rows = element_rows(lines, net.line_map, lambda l: l.idx)
+    transformer_rows = element_rows(transformers, net.transformer_map, lambda t: t.idx)
+
+    def bus_position(bus):
+        return net.bus_map[bus.bus_idx]
+
+    def line_array(attribute, dtype=float):
+        return ordered_array(lines, line_rows, attribute, dtype)
+
+    def transformer_array(attribute, dtype=float):
+        return ordered_array(transformers, transformer_rows, attribute, dtype)
+
+    def shunt_element_array(elements, attribute, dtype=float):
+        return fromiter((attribute(element) for element in elements), dtype=dtype, count=len(elements))
+
+    return NetworkArrays(
+        bus_idx=ordered_array(buses, bus_rows, lambda b: b.bus_idx, int),
+        bus_kv=ordered_array(buses, bus_rows, lambda b: b.voltage_level_kv, float),
+
+        line_idx=line_array(lambda l: l.idx, int),
+        line_from=line_array(lambda l: bus_position(l.from_bus), int),
+        line_to=line_array(lambda l: bus_position(l.to_bus), int),
+        line_r_ohm=line_array(lambda l: l.r_ohm),
+        line_x_ohm=line_array(lambda l: l.x_ohm),
+        line_b_total_mho=line_array(lambda l: l.b_total_mho),
+        line_closed=line_array(lambda l: l.closed, bool),
+
+        transformer_idx=transformer_array(lambda t: t.idx, int),
+        transformer_from=transformer_array(lambda t: bus_position(t.from_bus), int),
+        transformer_to=transformer_array(lambda t: bus_position(t.to_bus), int),
+        transformer_v_rated_low_kv=transformer_array(lambda t: t.v_rated_low_kv),
+        transformer_rated_s_mva=transformer_array(lambda t: t.rated_s_mva),
+        transformer_r_pu=transformer_array(lambda t: t.r_pu),
+        transformer_x_pu=transformer_array(lambda t: t.x_pu),
+        transformer_gm_pu=transformer_array(lambda t: t.gm_pu),
+        transformer_bm_pu=transformer_array(lambda t: t.bm_pu),
+        # A missing tap is stored as None, which becomes nan here
+        transformer_tap=transformer_array(lambda t: float('nan') if t.tap is None else t.tap),
+        transformer_phase_shift=transformer_array(lambda t: t.phase_shift),
+        transformer_closed=transformer_array(lambda t: t.closed, bool),
+
+        shunt_bus=shunt_element_array(shunts, lambda s: bus_position(s.bus), int),
+        shunt_p_mw=shunt_element_array(shunts, lambda s: s.p_mw),
+        shunt_q_mvar=shunt_element_array(shunts, lambda s: s.q_mvar),
+        load_bus=shunt_element_array(loads, lambda l: bus_position(l.bus), int),
+        generator_bus=shunt_element_array(generators, lambda g: bus_position(g.bus), int),
+    )
+
@@ -1,62 +1,196 @@
-from scipy.sparse import lil_matrix
-from numpy import cdouble, deg2rad, conjugate, exp
+from scipy.sparse import coo_matrix
+from numpy import cdouble, deg2rad, conjugate, exp, concatenate, where, isnan, ones, zeros, arange, array, repeat, \
+    diff, searchsorted, asarray, angle, bincount, int64
+
+
+def calculate_line_admittances(net, r_ohm, x_ohm, b_total_mho, vn_kv):
+    r_pu = net.ohm_to_pu(r_ohm, vn_kv)
+    x_pu = net.ohm_to_pu(x_ohm, vn_kv)
+    b_total_pu = net.mho_to_pu(b_total_mho, vn_kv)
+    y_series = 1 / (r_pu + 1j * x_pu)
+    y_shunt = 1j * b_total_pu
+    return y_series, y_shunt, ones(len(r_ohm), dtype=cdouble)
+
+
+def calculate_transformer_admittances(net, r_pu, x_pu, gm_pu, bm_pu, tap, phase_shift,
+                                      v_rated_low_kv, rated_s_mva, vn_to_kv):
+    z_base_transformer = v_rated_low_kv ** 2 / rated_s_mva
+    r_system_pu = net.ohm_to_pu(r_pu * z_base_transformer, v_rated_low_kv)
+    x_system_pu = net.ohm_to_pu(x_pu * z_base_transformer, v_rated_low_kv)
+    gm_system_pu = net.mho_to_pu(gm_pu / z_base_transformer, vn_to_kv)
+    bm_system_pu = net.mho_to_pu(bm_pu / z_base_transformer, vn_to_kv)
+    y_series = 1 / (r_system_pu + 1j * x_system_pu)
+    y_shunt = gm_system_pu + 1j * bm_system_pu
+    tap = where((tap == 0) | isnan(tap), 1, tap)
+    a = tap * exp(1j * deg2rad(phase_shift))
+    return y_series, y_shunt, a
+
+
+def calculate_branch_stamps(y_series, y_shunt, a):
+    # Nodal admittance entries of each branch pi model: (from, from), (from, to), (to, from), (to, to)
+    y_ff = y_series / abs(a) ** 2 + y_shunt / 2
+    y_ft = -y_series / conjugate(a)
+    y_tf = -y_series / a
+    y_tt = y_series + y_shunt / 2
+    return y_ff, y_ft, y_tf, y_tt
+
+
+def calculate_branch_admittances(net, arrays):
+    # Series admittance, total shunt admittance and complex ratio of every branch in branch row order
+    line_y_series, line_y_shunt, line_a = calculate_line_admittances(net,
+                                                                     arrays.line_r_ohm,
+                                                                     arrays.line_x_ohm,
+                                                                     arrays.line_b_total_mho,
+                                                                     arrays.bus_kv[arrays.line_from])
+    transformer_y_series, transformer_y_shunt, transformer_a = calculate_transformer_admittances(
+        net,
+        arrays.transformer_r_pu,
+        arrays.transformer_x_pu,
+        arrays.transformer_gm_pu,
+        arrays.transformer_bm_pu,
+        arrays.transformer_tap,
+        arrays.transformer_phase_shift,
+        arrays.transformer_v_rated_low_kv,
+        arrays.transformer_rated_s_mva,
+        arrays.bus_kv[arrays.transformer_to])
+    return (concatenate([line_y_series, transformer_y_series]),
+            concatenate([line_y_shunt, transformer_y_shunt]),
+            concatenate([line_a, transformer_a]))
 
 
 def create_y_bus(net):
-    net.full_y_bus = lil_matrix((len(net.buses), len(net.buses)), dtype=cdouble)
-    net.y_bus_from_to = lil_matrix((len(net.lines) + len(net.transformers), len(net.buses)), dtype=cdouble)
-    net.y_bus_to_from = lil_matrix((len(net.lines) + len(net.transformers), len(net.buses)), dtype=cdouble)
-
-    for shunt in net.shunts.values():
-        i = net.bus_map[shunt.bus.bus_idx]
-        net.full_y_bus[i, i] += (shunt.p_mw - 1j*shunt.q_mvar)/net.s_base_mva
-
-    for line in net.lines.values():
-        i = net.bus_map[line.from_bus.bus_idx]
-        j = net.bus_map[line.to_bus.bus_idx]
-        r_pu = net.ohm_to_pu(line.r_ohm, line.from_bus.voltage_level_kv)
-        x_pu = net.ohm_to_pu(line.x_ohm, line.from_bus.voltage_level_kv)
-        b_total_pu = net.mho_to_pu(line.b_total_mho, line.from_bus.voltage_level_kv)
-        y_series = 1 / complex(r_pu, x_pu)
-        net.full_y_bus[i, i] += y_series + 1j * b_total_pu / 2
-        net.full_y_bus[i, j] -= y_series
-        net.full_y_bus[j, i] -= y_series
-        net.full_y_bus[j, j] += y_series + 1j * b_total_pu/2
-        line_idx = net.line_map[line.idx]
-        net.y_bus_from_to[line_idx, i] -= -y_series - 1j * b_total_pu/2
-        net.y_bus_from_to[line_idx, j] += -y_series
-
-        net.y_bus_to_from[line_idx, i] += -y_series
-        net.y_bus_to_from[line_idx, j] -= -y_series - 1j * b_total_pu / 2
-
-    for transformer in net.transformers.values():
-        i = net.bus_map[transformer.from_bus.bus_idx]
-        j = net.bus_map[transformer.to_bus.bus_idx]
-        z_base_transformer = transformer.v_rated_low_kv**2/transformer.rated_s_mva
-        r_pu = net.ohm_to_pu(transformer.r_pu*z_base_transformer, transformer.v_rated_low_kv)
-        x_pu = net.ohm_to_pu(transformer.x_pu*z_base_transformer, transformer.v_rated_low_kv)
-
-        gm_pu = net.mho_to_pu(transformer.gm_pu/z_base_transformer, transformer.to_bus.voltage_level_kv)
-        bm_pu = net.mho_to_pu(transformer.bm_pu/z_base_transformer, transformer.to_bus.voltage_level_kv)
-        y_shunt = complex(gm_pu, bm_pu)
-        y_series = 1/complex(r_pu, x_pu)
-        tap = transformer.tap
-        phase_shift = transformer.phase_shift
-
-        if tap == 0 or tap == None:
-            tap = 1
-        a = tap*exp(1j*deg2rad(phase_shift))
-
-        net.full_y_bus[i, i] += y_series/(tap**2) + y_shunt/2
-        net.full_y_bus[i, j] -= y_series/conjugate(a)
-        net.full_y_bus[j, i] -= y_series/a
-        net.full_y_bus[j, j] += y_series + y_shunt/2
-        transformer_idx = net.transformer_map[transformer.idx]
-        net.y_bus_from_to[transformer_idx, i] -= -y_series - y_shunt/2
-        net.y_bus_from_to[transformer_idx, j] += -y_series
-
-        net.y_bus_to_from[transformer_idx, i] += -y_series
-        net.y_bus_to_from[transformer_idx, j] -= -y_series - y_shunt/2
+    arrays = net.arrays
+    n_bus = arrays.n_buses
+    n_branch = arrays.n_branches
+    rows = arange(n_branch)
+    f = arrays.branch_from
+    t = arrays.branch_to
+
+    y_series, y_shunt, a = calculate_branch_admittances(net, arrays)
+    y_ff, y_ft, y_tf, y_tt = calculate_branch_stamps(y_series, y_shunt, a)
+    y_shunt_bus = (arrays.shunt_p_mw - 1j*arrays.shunt_q_mvar)/net.s_base_mva
+
+    net.full_y_bus = coo_matrix((concatenate([y_ff, y_ft, y_tf, y_tt, y_shunt_bus]),
+                                 (concatenate([f, f, t, t, arrays.shunt_bus]),
+                                  concatenate([f, t, f, t, arrays.shunt_bus]))),
+                                shape=(n_bus, n_bus)).tocsr()
+
+    # Branch current matrices use the untapped series admittance on both sides
+    y_self = y_series + y_shunt/2
+    net.y_bus_from_to = coo_matrix((concatenate([y_self, -y_series]),
+                                    (concatenate([rows, rows]), concatenate([f, t]))),
+                                   shape=(n_branch, n_bus)).tocsr()
+    net.y_bus_to_from = coo_matrix((concatenate([-y_series, y_self]),
+                                    (concatenate([rows, rows]), concatenate([f, t]))),
+                                   shape=(n_branch, n_bus)).tocsr()
+
+
+def calculate_series_reactances(arrays, y_series, branches):
+    # Series reactances in pu of the given branch rows. The models that keep the reactance only have no susceptance for
+    # a branch without one, it is rejected rather than entering them as inf or nan.
+    x = (1 / y_series[branches]).imag
+    zero = (x == 0).nonzero()[0]
+    if len(zero):
+        branch = int(branches[zero[0]])
+        if branch < arrays.n_lines:
+            element = f'Line {int(arrays.line_idx[branch])}'
+        else:
+            element = f'Transformer {int(arrays.transformer_idx[branch - arrays.n_lines])}'
+        raise ValueError(f'{element} has no series reactance, the DC and fast decoupled models need one.')
+    return x
+
+
+def create_decoupled_b_matrices(net, method='XB'):
+    """
+    B' and B'' of the fast decoupled load flow over the closed branches, as full (buses x buses) CSR matrices.
+    B' drops the branch and bus shunts and the tap magnitudes, B'' drops the phase shifts. The XB scheme neglects the
+    series resistance in B', the BX scheme in B''. Closed branches without series reactance raise a ValueError.
+    """
+    if method not in ('XB', 'BX'):
+        raise ValueError(f'Unknown fast decoupled scheme {method}, expected XB or BX.')
+    arrays = net.arrays
+    closed = arrays.branch_closed
+    f = arrays.branch_from[closed]
+    t = arrays.branch_to[closed]
+    y_series, y_shunt, a = calculate_branch_admittances(net, arrays)
+    y_reactance = 1 / (1j * calculate_series_reactances(arrays, y_series, closed.nonzero()[0]))
+    y_series, y_shunt, a = y_series[closed], y_shunt[closed], a[closed]
+
+    def b_matrix(y_series, y_shunt, a, y_shunt_bus):
+        y_ff, y_ft, y_tf, y_tt = calculate_branch_stamps(y_series, y_shunt, a)
+        y_bus = coo_matrix((concatenate([y_ff, y_ft, y_tf, y_tt, y_shunt_bus]),
+                            (concatenate([f, f, t, t, arrays.shunt_bus]),
+                             concatenate([f, t, f, t, arrays.shunt_bus]))),
+                           shape=(arrays.n_buses, arrays.n_buses)).tocsr()
+        return -y_bus.imag
+
+    b_prime = b_matrix(y_reactance if method == 'XB' else y_series,
+                       zeros(len(y_series)),
+                       exp(1j * angle(a)),
+                       zeros(len(arrays.shunt_bus)))
+    b_double_prime = b_matrix(y_reactance if method == 'BX' else y_series,
+                              y_shunt,
+                              abs(a).astype(cdouble),
+                              (arrays.shunt_p_mw - 1j * arrays.shunt_q_mvar) / net.s_base_mva)
+    return b_prime, b_double_prime
+
+
+def calculate_dc_branch_susceptances(net, arrays):
+    # Susceptance 1 / (x |a|) of the series reactance and tap magnitude of every branch, zero for open branches, and
+    # the phase shift in radians. Closed branches without series reactance raise a ValueError.
+    y_series, _, a = calculate_branch_admittances(net, arrays)
+    closed = arrays.branch_closed.nonzero()[0]
+    b = zeros(arrays.n_branches)
+    b[closed] = 1 / (calculate_series_reactances(arrays, y_series, closed) * abs(a[closed]))
+    return b, angle(a)
+
+
+def create_dc_b_matrices(net):
+    """
+    B (buses x buses) and Bf (branches x buses) of the DC model, so that the branch flows are Bf theta and the bus
+    injections B theta in pu without phase shifters. Closed branches enter with the susceptance of their series
+    reactance and tap magnitude, resistances and shunts are neglected. Rows of open branches in Bf are zero.
+    """
+    arrays = net.arrays
+    n_branch = arrays.n_branches
+    b, _ = calculate_dc_branch_susceptances(net, arrays)
+    rows = concatenate([arange(n_branch), arange(n_branch)])
+    cols = concatenate([arrays.branch_from, arrays.branch_to])
+    incidence = coo_matrix((concatenate([ones(n_branch), -ones(n_branch)]), (rows, cols)),
+                           shape=(n_branch, arrays.n_buses)).tocsr()
+    b_branch = coo_matrix((concatenate([b, -b]), (rows, cols)), shape=(n_branch, arrays.n_buses)).tocsr()
+    b_bus = (incidence.T @ b_branch).tocsr()
+    return b_bus, b_branch
+
+
+def calculate_dc_phase_shift_injections(net):
+    # Branch flows and bus injections in pu that the phase shifts add to Bf theta and B theta, a shift at the from
+    # end as in create_y_bus
+    arrays = net.arrays
+    b, shift = calculate_dc_branch_susceptances(net, arrays)
+    p_shift_branch = -b * shift
+    p_shift_bus = (bincount(arrays.branch_from, p_shift_branch, minlength=arrays.n_buses) -
+                   bincount(arrays.branch_to, p_shift_branch, minlength=arrays.n_buses))
+    return p_shift_branch, p_shift_bus
+
+
+def get_branch_stamps(net):
+    # Y-bus entries of every branch in branch row order, stacked as rows (y_ff, y_ft, y_tf, y_tt)
+    y_series, y_shunt, a = calculate_branch_admittances(net, net.arrays)
+    return array(calculate_branch_stamps(y_series, y_shunt, a))
+
+
+def get_entry_positions(matrix, rows, cols):
+    # Positions of the (rows, cols) entries in the data array of a CSR matrix with sorted indices
+    matrix.sort_indices()
+    n_cols = matrix.shape[1]
+    stored_rows = repeat(arange(matrix.shape[0], dtype=int64), diff(matrix.indptr))
+    keys = stored_rows * n_cols + matrix.indices
+    queries = asarray(rows, dtype=int64) * n_cols + asarray(cols, dtype=int64)
+    positions = searchsorted(keys, queries).clip(max=max(len(keys) - 1, 0))
+    if len(queries) and (len(keys) == 0 or (keys[positions] != queries).any()):
+        raise ValueError('Requested entries are not stored in the matrix.')
+    return positions
 
 
 def remove_line_from_y_bus(net, line):
@@ -98,11 +232,11 @@ def remove_transformer_from_y_bus(net, transformer):
         tap = 1
     a = tap * exp(1j * deg2rad(phase_shift))
 
-    net.y_bus[i, i] += y_series / (tap ** 2) + y_shunt / 2
-    net.y_bus[i, j] -= y_series / conjugate(a)
-    net.full_y_bus[j, i] -= y_series / a
-    net.full_y_bus[j, j] += y_series + y_shunt / 2
-    transformer_idx = net.transformer_map[transformer.idx]
+    net.y_bus[i, i] -= y_series / (tap ** 2) + y_shunt / 2
+    net.y_bus[i, j] += y_series / conjugate(a)
+    net.y_bus[j, i] += y_series / a
+    net.y_bus[j, j] -= y_series + y_shunt / 2
+    transformer_idx = len(net.lines) + net.transformer_map[transformer.idx]
     net.y_bus_from_to[transformer_idx, i] += -y_series - y_shunt / 2
     net.y_bus_from_to[transformer_idx, j] -= -y_series
 
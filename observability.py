@@ -0,0 +1,292 @@
+from dataclasses import dataclass, field
+from numpy import ndarray, array, ones, zeros, full, unique, argsort, split, flatnonzero, concatenate, repeat, arange, \
+    diff, bincount, isin, int64
+from scipy.linalg import null_space
+from scipy.sparse import csr_matrix, coo_matrix
+from scipy.sparse.csgraph import connected_components
+from .ds_dx import calculate_dsbus_dx
+
+
+@dataclass(kw_only=True)
+class ObservabilityResult:
+    observable: bool
+    angle_islands: list  # Bus rows of every P-theta observable island, the one referenced to the slack buses first
+    magnitude_islands: list  # Same for Q-V, referenced to the voltage magnitude measurements
+    pseudo_measurements: list = field(default_factory=list)  # (measurement_type, bus_idx) restoring observability
+
+
+class IslandMerger:
+    """
+    Observable islands of one decoupled measurement model (P-theta or Q-V) over its Jacobian rows.
+
+    Buses whose values are determined relative to each other share an island, and islands determined absolutely are
+    merged with a virtual reference node. A row touching two islands merges them. Rows touching more islands are kept
+    pending and resolved numerically: their Jacobian values are summed per island and the null space of that reduced
+    matrix gives the islands that are determined (zero null space rows) or determined relative to each other (equal
+    null space rows).
+    """
+    def __init__(self, n_buses: int, tolerance: float = 1e-8):
+        self.n_buses = n_buses
+        self.reference = n_buses
+        self.parent = list(range(n_buses + 1))
+        self.tolerance = tolerance
+        self.pending = []  # (columns, values) of rows touching more than two islands
+
+    def find(self, node):
+        root = node
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[node] != root:
+            self.parent[node], node = root, self.parent[node]
+        return root
+
+    def union(self, a, b) -> bool:
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        # The reference node stays the root of its island
+        if a == self.reference:
+            a, b = b, a
+        self.parent[a] = b
+        return True
+
+    def roots(self) -> ndarray:
+        return array([self.find(node) for node in range(self.n_buses + 1)], dtype=int64)
+
+    def add_reference(self, bus) -> None:
+        self.union(bus, self.reference)
+
+    def add_row(self, columns, values) -> None:
+        # A row on one bus determines it, a row on two islands merges them
+        if len(columns) == 1:
+            self.add_reference(columns[0])
+            return
+        islands = {self.find(column) for column in columns}
+        if len(islands) == 2:
+            self.union(*islands)
+        elif len(islands) > 2:
+            self.pending.append((columns, values))
+
+    def resolve(self) -> None:
+        # Pending rows are checked again after every merge, the numerical step runs once no row merges directly
+        while self.pending:
+            merged = False
+            remaining = []
+            for columns, values in self.pending:
+                islands = {self.find(column) for column in columns}
+                if len(islands) == 2:
+                    merged |= self.union(*islands)
+                elif len(islands) > 2:
+                    remaining.append((columns, values))
+            self.pending = remaining
+            if not merged and (not remaining or not self.resolve_numerically()):
+                return
+
+    def resolve_numerically(self) -> bool:
+        # Pending rows summed per island, the reference island is known and its column dropped
+        roots = self.roots()
+        rows = concatenate([full(len(columns), row) for row, (columns, _) in enumerate(self.pending)])
+        islands, columns = unique(roots[concatenate([columns for columns, _ in self.pending])], return_inverse=True)
+        values = concatenate([values for _, values in self.pending])
+        reduced = coo_matrix((values, (rows, columns)), shape=(len(self.pending), len(islands))).tocsr()
+        unknown = flatnonzero(islands != self.reference)
+        islands, reduced = islands[unknown], reduced[:, unknown]
+
+        # Rows and islands linked through the reduced matrix are analysed together
+        n_rows = reduced.shape[0]
+        link = reduced.tocoo()
+        _, group = connected_components(coo_matrix((ones(link.nnz), (link.row, link.col + n_rows)),
+                                                   shape=(n_rows + len(islands),) * 2), directed=False)
+        merged = False
+        for g in unique(group[n_rows:]):
+            group_rows = flatnonzero(group[:n_rows] == g)
+            group_islands = flatnonzero(group[n_rows:] == g)
+            if len(group_rows) == 0:
+                continue
+            basis = null_space(reduced[group_rows][:, group_islands].toarray(), rcond=self.tolerance)
+            classes = []
+            for island, row in zip(islands[group_islands].tolist(), basis):
+                if abs(row).max(initial=0) <= self.tolerance:
+                    merged |= self.union(island, self.reference)
+                    continue
+                for representative, representative_row in classes:
+                    if abs(row - representative_row).max() <= self.tolerance:
+                        merged |= self.union(island, representative)
+                        break
+                else:
+                    classes.append((island, row))
+        return merged
+
+    def islands(self) -> list:
+        # Bus rows of every island, the reference island first (empty when nothing is referenced)
+        roots = self.roots()
+        order = argsort(roots[:-1], kind='stable')
+        labels, starts = unique(roots[:-1][order], return_index=True)
+        groups = dict(zip(labels.tolist(), split(order, starts[1:])))
+        reference_island = groups.pop(self.reference, array([], dtype=int64))
+        return [reference_island] + sorted(groups.values(), key=len, reverse=True)
+
+    def deficiency(self) -> int:
+        # Islands that still need a measurement to be referenced
+        return len(self.islands()) - 1
+
+
+def get_decoupled_jacobians(net, measurement_model=None):
+    # P-theta rows (active powers) and Q-V rows (reactive powers and voltage magnitudes) of the measurement Jacobian
+    # at flat start, with a column for every bus
+    model = net.measurement_model if measurement_model is None else measurement_model
+    n = len(net.buses)
+    active = isin(model.measurement_types, ['p_injection', 'p_flow'])
+    H = model.jacobian(ones(n, dtype=complex), list(range(n)))
+    return H[active][:, :n].tocsr(), H[~active][:, n:].tocsr()
+
+
+def get_injection_jacobians(net):
+    # Rows of a P injection (P-theta) and of a Q injection (Q-V) at every bus at flat start
+    ds_dvm, ds_dva = calculate_dsbus_dx(csr_matrix(net.y_bus), ones(len(net.buses), dtype=complex))
+    return csr_matrix(ds_dva.real), csr_matrix(ds_dvm.imag)
+
+
+def create_island_merger(H, references=()) -> IslandMerger:
+    merger = IslandMerger(H.shape[1])
+    for bus in references:
+        merger.add_reference(bus)
+    H = csr_matrix(H)
+    for row in range(H.shape[0]):
+        start, stop = H.indptr[row], H.indptr[row + 1]
+        merger.add_row(H.indices[start:stop], H.data[start:stop])
+    merger.resolve()
+    return merger
+
+
+def count_row_islands(H, roots, reference=None):
+    # Distinct islands every row of H touches, and whether one of them is the reference island
+    n_labels = len(roots)
+    rows = repeat(arange(H.shape[0], dtype=int64), diff(H.indptr))
+    keys = unique(rows * n_labels + roots[H.indices])
+    counts = bincount(keys // n_labels, minlength=H.shape[0])
+    touches_reference = zeros(H.shape[0], dtype=bool)
+    if reference is not None:
+        touches_reference[keys[keys % n_labels == reference] // n_labels] = True
+    return counts, touches_reference
+
+
+def add_merging_rows(merger: IslandMerger, H, available):
+    # Adds available rows of H that merge exactly two islands, at most one per pair of islands and none closing a
+    # cycle between islands, or else the available row touching the fewest islands. Returns the added rows.
+    roots = merger.roots()
+    counts, _ = count_row_islands(H, roots)
+    candidates = flatnonzero(available & (counts == 2))
+    added = []
+    forest = IslandMerger(len(roots))
+    for row in candidates.tolist():
+        a, b = {int(roots[column]) for column in H.indices[H.indptr[row]:H.indptr[row + 1]]}
+        if forest.union(a, b):
+            added.append(row)
+    if not added:
+        candidates = flatnonzero(available & (counts > 2))
+        if len(candidates):
+            added.append(int(candidates[counts[candidates].argmin()]))
+    for row in added:
+        merger.add_row(H.indices[H.indptr[row]:H.indptr[row + 1]], H.data[H.indptr[row]:H.indptr[row + 1]])
+    merger.resolve()
+    return added
+
+
+def find_pseudo_measurements(net, angle_merger: IslandMerger, magnitude_merger: IslandMerger):
+    """
+    Greedy set of pseudo-measurements that references every island: P and Q injections at buses without one that
+    merge islands, then a voltage magnitude in every Q-V island left without a reference. Updates the mergers.
+    """
+    model = net.measurement_model
+    bus_idx = net.arrays.bus_idx
+    p_rows, q_rows = get_injection_jacobians(net)
+    pseudo_measurements = []
+    for merger, H, measurement_type, measured in [(angle_merger, p_rows, 'p_injection',
+                                                   model.locations.p_injection_bus),
+                                                  (magnitude_merger, q_rows, 'q_injection',
+                                                   model.locations.q_injection_bus)]:
+        available = ones(H.shape[0], dtype=bool)
+        available[measured] = False
+        while merger.deficiency() > 0:
+            added = add_merging_rows(merger, H, available)
+            if not added:
+                break
+            available[added] = False
+            pseudo_measurements += [(measurement_type, int(bus_idx[bus])) for bus in added]
+
+    for island in magnitude_merger.islands()[1:]:
+        magnitude_merger.add_reference(island[0])
+        pseudo_measurements.append(('v_magnitude', int(bus_idx[island[0]])))
+    return pseudo_measurements
+
+
+def analyze_observability(net, measurement_model=None, pseudo_measurements: bool = True) -> ObservabilityResult:
+    """
+    Observable islands of the measurement set, from the decoupled P-theta and Q-V structure of its Jacobian at flat
+    start, referenced to the slack bus angles and to the voltage magnitude measurements. The net is observable when
+    every bus is in the referenced island of both. With pseudo_measurements the result also lists pseudo-measurements
+    that make it observable.
+    """
+    H_angle, H_magnitude = get_decoupled_jacobians(net, measurement_model)
+    angle_merger = create_island_merger(H_angle, sorted(net.slack_buses))
+    magnitude_merger = create_island_merger(H_magnitude)
+    angle_islands = angle_merger.islands()
+    magnitude_islands = magnitude_merger.islands()
+    result = ObservabilityResult(observable=len(angle_islands) == 1 and len(magnitude_islands) == 1,
+                                 angle_islands=angle_islands,
+                                 magnitude_islands=magnitude_islands)
+    if pseudo_measurements and not result.observable:
+        result.pseudo_measurements = find_pseudo_measurements(net, angle_merger, magnitude_merger)
+    return result
+
+
+def place_meters(net, measurement_model=None, candidate_buses=None) -> list:
+    """
+    Greedy placement of bus meters (voltage magnitude, P and Q injection) that make the net observable together with
+    the configured measurements. Every round places meters at the buses merging or referencing the most islands,
+    skipping buses whose islands another meter of the round already touches. Returns the bus_idx of the meters.
+    """
+    H_angle, H_magnitude = get_decoupled_jacobians(net, measurement_model)
+    angle_merger = create_island_merger(H_angle, sorted(net.slack_buses))
+    magnitude_merger = create_island_merger(H_magnitude)
+    p_rows, q_rows = get_injection_jacobians(net)
+    n = len(net.buses)
+    available = zeros(n, dtype=bool)
+    available[[net.bus_map[bus] for bus in net.bus_map] if candidate_buses is None else
+              [net.bus_map[bus] for bus in candidate_buses]] = True
+
+    meters = []
+    while angle_merger.deficiency() + magnitude_merger.deficiency() > 0:
+        angle_roots, magnitude_roots = angle_merger.roots(), magnitude_merger.roots()
+        angle_counts, _ = count_row_islands(p_rows, angle_roots)
+        magnitude_counts, touches_reference = count_row_islands(q_rows, magnitude_roots, magnitude_merger.reference)
+        # The voltage magnitude references the island of the bus, the Q injection then merges the islands it
+        # still touches besides the reference
+        unreferenced = magnitude_roots[:n] != magnitude_merger.reference
+        magnitude_counts_after = magnitude_counts - (unreferenced & touches_reference)
+        score = (angle_counts >= 2).astype(int) + unreferenced + (magnitude_counts_after >= 2)
+        score[~available] = 0
+        if score.max() == 0:
+            break
+
+        touched = set()
+        for bus in argsort(-score, kind='stable').tolist():
+            if score[bus] < score.max():
+                break
+            islands = {('angle', int(angle_roots[column])) for column in
+                       p_rows.indices[p_rows.indptr[bus]:p_rows.indptr[bus + 1]]} | \
+                      {('magnitude', int(magnitude_roots[column])) for column in
+                       q_rows.indices[q_rows.indptr[bus]:q_rows.indptr[bus + 1]]}
+            islands -= {('angle', angle_merger.reference), ('magnitude', magnitude_merger.reference)}
+            if islands & touched:
+                continue
+            touched |= islands
+            meters.append(bus)
+            available[bus] = False
+            magnitude_merger.add_reference(bus)
+            for merger, H in [(angle_merger, p_rows), (magnitude_merger, q_rows)]:
+                merger.add_row(H.indices[H.indptr[bus]:H.indptr[bus + 1]], H.data[H.indptr[bus]:H.indptr[bus + 1]])
+        angle_merger.resolve()
+        magnitude_merger.resolve()
+    return [int(net.arrays.bus_idx[bus]) for bus in meters]
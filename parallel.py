@@ -0,0 +1,184 @@
+from dataclasses import dataclass
+from multiprocessing import Pool
+from numpy import ndarray, asarray, array, empty, zeros, int64
+from scipy.sparse import csr_matrix
+from .jacobian import JacobianPattern
+from .linear_solver import SparseLUSolver
+from .load_flow import newton_raphson
+from .network_matrices import get_branch_stamps, get_entry_positions
+
+
+# Read-only arrays that a worker process needs to solve load flows without the Net object
+@dataclass(kw_only=True)
+class NetworkSnapshot:
+    y_bus_data: ndarray
+    y_bus_indices: ndarray
+    y_bus_indptr: ndarray
+    pvpq: ndarray
+    pq: ndarray
+    vm: ndarray
+    va: ndarray
+    p_scheduled_pu: ndarray
+    q_scheduled_pu: ndarray
+    branch_from: ndarray
+    branch_to: ndarray
+    branch_closed: ndarray
+    branch_stamps: ndarray
+
+    @property
+    def n_buses(self):
+        return len(self.vm)
+
+
+def create_network_snapshot(net, p_scheduled_pu, q_scheduled_pu, vm, va) -> NetworkSnapshot:
+    # The Net must be prepared for load flow (y_bus and bus types set), vm and va are the starting point
+    y_bus = csr_matrix(net.y_bus, copy=True)
+    y_bus.sort_indices()
+    arrays = net.arrays
+    return NetworkSnapshot(y_bus_data=y_bus.data,
+                           y_bus_indices=y_bus.indices,
+                           y_bus_indptr=y_bus.indptr,
+                           pvpq=array(sorted(list(net.pq_buses) + list(net.pv_buses)), dtype=int64),
+                           pq=array(sorted(net.pq_buses), dtype=int64),
+                           vm=asarray(vm, dtype=float).copy(),
+                           va=asarray(va, dtype=float).copy(),
+                           p_scheduled_pu=asarray(p_scheduled_pu, dtype=float).ravel(),
+                           q_scheduled_pu=asarray(q_scheduled_pu, dtype=float).ravel(),
+                           branch_from=arrays.branch_from,
+                           branch_to=arrays.branch_to,
+                           branch_closed=arrays.branch_closed,
+                           branch_stamps=get_branch_stamps(net))
+
+
+class SnapshotSolver:
+    # Worker side state, built once per process from the snapshot
+    def __init__(self, snapshot: NetworkSnapshot, max_iteration: int = 100, tolerance: float = 1e-8):
+        self.snapshot = snapshot
+        self.max_iteration = max_iteration
+        self.tolerance = tolerance
+        n = snapshot.n_buses
+        self.y_bus = csr_matrix((snapshot.y_bus_data, snapshot.y_bus_indices, snapshot.y_bus_indptr), shape=(n, n))
+        self.jacobian_pattern = JacobianPattern(self.y_bus, snapshot.pvpq, snapshot.pq)
+        self.solver = SparseLUSolver()
+        self.stamp_positions = None
+        self.vm, self.va = snapshot.vm, snapshot.va
+
+    def solve(self, y_bus, vm, va, p_scheduled_pu, q_scheduled_pu):
+        vm, va = vm.copy(), va.copy()
+        try:
+            iteration, converged = newton_raphson(y_bus, vm, va, p_scheduled_pu, q_scheduled_pu, self.jacobian_pattern,
+                                                  self.solver, self.max_iteration, self.tolerance)
+        except RuntimeError:
+            # Singular Jacobian, e.g. an outage that leaves a bus without connection
+            iteration, converged = 0, False
+        return vm, va, iteration, converged
+
+    def solve_scenario(self, injections):
+        # Consecutive scenarios handled by this worker warm-start from each other
+        p_scheduled_pu, q_scheduled_pu = injections
+        vm, va, iteration, converged = self.solve(self.y_bus, self.vm, self.va, p_scheduled_pu, q_scheduled_pu)
+        if converged:
+            self.vm, self.va = vm, va
+        return vm, va, iteration, converged
+
+    def outage_y_bus(self, branches):
+        if self.stamp_positions is None:
+            snapshot = self.snapshot
+            f, t = snapshot.branch_from, snapshot.branch_to
+            self.stamp_positions = array([get_entry_positions(self.y_bus, f, f),
+                                          get_entry_positions(self.y_bus, f, t),
+                                          get_entry_positions(self.y_bus, t, f),
+                                          get_entry_positions(self.y_bus, t, t)])
+        y_bus = self.y_bus.copy()
+        for branch in branches:
+            if not self.snapshot.branch_closed[branch]:
+                continue
+            y_bus.data[self.stamp_positions[:, branch]] -= self.snapshot.branch_stamps[:, branch]
+        return y_bus
+
+    def solve_contingency(self, branches):
+        # Branch rows to open, warm-started from the snapshot operating point
+        snapshot = self.snapshot
+        return self.solve(self.outage_y_bus(branches), snapshot.vm, snapshot.va,
+                          snapshot.p_scheduled_pu, snapshot.q_scheduled_pu)
+
+
+_snapshot_solver = None
+
+
+def _initialize_worker(snapshot, max_iteration, tolerance):
+    global _snapshot_solver
+    _snapshot_solver = SnapshotSolver(snapshot, max_iteration, tolerance)
+
+
+def _solve_scenario(injections):
+    return _snapshot_solver.solve_scenario(injections)
+
+
+def _solve_contingency(branches):
+    return _snapshot_solver.solve_contingency(branches)
+
+
+def print_progress(completed, total):
+    print(f'\rCompleted {completed}/{total}', end='\n' if completed == total else '')
+
+
+def run_in_pool(function, snapshot, tasks, n_tasks, processes=None, chunk_size=16, progress=None,
+                max_iteration=100, tolerance=1e-8):
+    # Sends the snapshot to every worker once, streams the tasks and gathers the results in task order
+    n_buses = snapshot.n_buses
+    vm = empty((n_tasks, n_buses))
+    va = empty((n_tasks, n_buses))
+    iterations = zeros(n_tasks, dtype=int)
+    converged = zeros(n_tasks, dtype=bool)
+    with Pool(processes, initializer=_initialize_worker, initargs=(snapshot, max_iteration, tolerance)) as pool:
+        for task, result in enumerate(pool.imap(function, tasks, chunksize=chunk_size)):
+            vm[task], va[task], iterations[task], converged[task] = result
+            if progress is not None:
+                progress(task + 1, n_tasks)
+    return vm, va, iterations, converged
+
+
+def run_parallel_scenarios(net,
+                           p_scheduled_pu,
+                           q_scheduled_pu,
+                           vm,
+                           va,
+                           processes=None,
+                           chunk_size=16,
+                           progress=None,
+                           max_iteration=100,
+                           tolerance=1e-8):
+    """
+    Solves stacked (scenarios x buses) injections in a process pool. Returns vm, va (scenarios x buses), iteration
+    counts and convergence flags in scenario order.
+    """
+    p_scheduled_pu = asarray(p_scheduled_pu, dtype=float)
+    q_scheduled_pu = asarray(q_scheduled_pu, dtype=float)
+    snapshot = create_network_snapshot(net, p_scheduled_pu[0], q_scheduled_pu[0], vm, va)
+    tasks = ((p_scheduled_pu[scenario], q_scheduled_pu[scenario]) for scenario in range(len(p_scheduled_pu)))
+    return run_in_pool(_solve_scenario, snapshot, tasks, len(p_scheduled_pu), processes, chunk_size, progress,
+                       max_iteration, tolerance)
+
+
+def run_parallel_contingencies(net,
+                               contingencies,
+                               p_scheduled_pu,
+                               q_scheduled_pu,
+                               vm=None,
+                               va=None,
+                               processes=None,
+                               chunk_size=16,
+                               progress=None,
+                               max_iteration=100,
+                               tolerance=1e-8):
+    """
+    Solves branch outages in a process pool. Every contingency is a sequence of branch rows (lines first, then
+    transformers, as in y_bus_from_to) that are opened together. Starts from net.vm and net.va unless given.
+    """
+    contingencies = [tuple(branches) for branches in contingencies]
+    snapshot = create_network_snapshot(net, p_scheduled_pu, q_scheduled_pu,
+                                       net.vm if vm is None else vm,
+                                       net.va if va is None else va)
+    return run_in_pool(_solve_contingency, snapshot, iter(contingencies), len(contingencies), processes, chunk_size,
+                       progress, max_iteration, tolerance)
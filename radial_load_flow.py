@@ -0,0 +1,154 @@
+from numpy import array, asarray, zeros, exp, conj, angle, bincount, searchsorted, arange, isfinite, add, concatenate, \
+    allclose, diag, cdouble, int64
+from numpy.linalg import solve as dense_solve
+import networkx as nx
+from .network_matrices import get_branch_stamps
+
+
+class RadialFeeder:
+    """
+    Tree ordering of the feeders fed from the slack buses and the branch coefficients of the sweeps.
+
+    Buses are ordered by their depth below the slack bus of their feeder. For the tree branch from parent bus p to
+    child bus c with nodal stamps y_pp, y_pc, y_cp and y_cc, the forward sweep sets V_c = -(I_c + y_cp V_p) / y_cc from
+    the current I_c the branch delivers to c, and the backward sweep adds (y_pp - y_pc y_cp / y_cc) V_p - y_pc / y_cc I_c
+    to the current drawn at p. For a plain series branch this is I_c itself, shunts and taps enter through the stamps.
+
+    Parallel branches are merged into one. Weakly meshed feeders are opened at one branch per loop, the series current
+    of every opened branch is drawn at its ends and corrected between sweeps through the breakpoint impedance matrix.
+    """
+    def __init__(self, net, G, slack_list):
+        arrays = net.arrays
+        if net.pv_buses:
+            raise ValueError('Backward/forward sweep only supports PQ and slack buses.')
+
+        # Buses of every feeder, layer by layer from its slack bus
+        depth = {}
+        parent = {}
+        for slack in slack_list:
+            for level, layer in enumerate(nx.bfs_layers(G, slack)):
+                depth.update(dict.fromkeys(layer, level))
+            parent.update(nx.bfs_predecessors(G, slack))
+        energized = sorted(net.pq_buses) + sorted(net.slack_buses)
+        if len(depth) != len(energized):
+            raise ValueError(f'{len(energized) - len(depth)} buses are not connected to a slack bus.')
+
+        # Stamps of every connected bus pair (a, b) with a < b fed from a slack bus, parallel branches summed
+        fed = zeros(arrays.n_buses, dtype=bool)
+        fed[list(depth)] = True
+        closed = (arrays.branch_closed & fed[arrays.branch_from]).nonzero()[0]
+        stamps = get_branch_stamps(net)[:, closed]
+        f, t = arrays.branch_from[closed], arrays.branch_to[closed]
+        swapped = f > t
+        stamps[:, swapped] = stamps[::-1, swapped]
+        pair_stamps = {}
+        for pair, stamp in zip(zip(f.tolist(), t.tolist()), stamps.T):
+            pair = tuple(sorted(pair))
+            pair_stamps[pair] = pair_stamps[pair] + stamp if pair in pair_stamps else stamp
+
+        # Child buses by increasing depth and the branch feeding each of them
+        children = array(sorted(parent, key=depth.get), dtype=int64)
+        parents = array([parent[child] for child in children.tolist()], dtype=int64)
+        levels = array([depth[child] for child in children.tolist()])
+        bounds = searchsorted(levels, arange(1, levels.max() + 2 if len(levels) else 1)).tolist()
+        self.levels = [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+        self.children = children
+        self.parents = parents
+
+        tree_stamps = array([pair_stamps.pop(tuple(sorted(edge)))
+                             for edge in zip(parents.tolist(), children.tolist())]).reshape(-1, 4).T
+        parent_first = parents < children
+        y_aa, y_ab, y_ba, y_bb = tree_stamps
+        y_pp = y_aa * parent_first + y_bb * ~parent_first
+        y_pc = y_ab * parent_first + y_ba * ~parent_first
+        y_cp = y_ba * parent_first + y_ab * ~parent_first
+        y_cc = y_bb * parent_first + y_aa * ~parent_first
+        self.y_cc = y_cc
+        self.y_cp = y_cp
+        self.alpha = y_pp - y_pc * y_cp / y_cc
+        self.beta = -y_pc / y_cc
+
+        # Shunt elements draw y V at their bus
+        y_shunt = (arrays.shunt_p_mw - 1j * arrays.shunt_q_mvar) / net.s_base_mva
+        self.y_shunt_bus = (bincount(arrays.shunt_bus, y_shunt.real, minlength=arrays.n_buses) +
+                            1j * bincount(arrays.shunt_bus, y_shunt.imag, minlength=arrays.n_buses))
+
+        # Branches left outside the tree close a loop, the series part of each is a breakpoint current
+        # J = y_series (V_a - V_b) drawn at a and injected at b, its shunt parts are added to the bus shunts
+        loop_pairs = list(pair_stamps)
+        y_aa, y_ab, y_ba, y_bb = array(list(pair_stamps.values())).reshape(-1, 4).T
+        if not allclose(y_ab, y_ba):
+            raise ValueError('Backward/forward sweep does not support phase shifting branches that close a loop.')
+        self.loop_from = array([a for a, _ in loop_pairs], dtype=int64)
+        self.loop_to = array([b for _, b in loop_pairs], dtype=int64)
+        self.loop_y_series = -y_ab
+        add.at(self.y_shunt_bus, self.loop_from, y_aa + y_ab)
+        add.at(self.y_shunt_bus, self.loop_to, y_bb + y_ba)
+        self.loop_matrix = self.calculate_loop_matrix(arrays.n_buses)
+
+    @property
+    def n_loops(self):
+        return len(self.loop_from)
+
+    def calculate_loop_matrix(self, n_buses):
+        # Response of the breakpoint voltage differences to unit breakpoint currents through the series parts of the
+        # tree, returned as the Newton matrix diag(1 / y_series) - response of the breakpoint currents
+        loops = arange(self.n_loops)
+        current = zeros((n_buses, self.n_loops), dtype=cdouble)
+        add.at(current, (self.loop_from, loops), 1)
+        add.at(current, (self.loop_to, loops), -1)
+        v = zeros((n_buses, self.n_loops), dtype=cdouble)
+        for level in reversed(self.levels):
+            add.at(current, self.parents[level], self.beta[level, None] * current[self.children[level]])
+        for level in self.levels:
+            v[self.children[level]] = -(current[self.children[level]] +
+                                        self.y_cp[level, None] * v[self.parents[level]]) / self.y_cc[level, None]
+        response = v[self.loop_from] - v[self.loop_to]
+        return diag(1 / self.loop_y_series) - response
+
+    def sweep(self, v, current):
+        # One backward sweep of the currents drawn at the buses and one forward sweep of bus voltages, updates v in place
+        for level in reversed(self.levels):
+            # Currents of this level are complete once the deeper levels have been added
+            buses, parents = self.children[level], self.parents[level]
+            add.at(current, parents, self.alpha[level] * v[parents] + self.beta[level] * current[buses])
+        for level in self.levels:
+            buses, parents = self.children[level], self.parents[level]
+            v[buses] = -(current[buses] + self.y_cp[level] * v[parents]) / self.y_cc[level]
+
+
+def backward_forward_sweep(y_bus,
+                           vm,
+                           va,
+                           p_scheduled_pu,
+                           q_scheduled_pu,
+                           feeder: RadialFeeder,
+                           max_iteration: int = 100,
+                           tolerance: float = 1e-8):
+    # Updates vm and va in place, the mismatch of the PQ buses is checked after every sweep as in Newton-Raphson
+    s_scheduled_pu = asarray(p_scheduled_pu, dtype=float).ravel() + 1j * asarray(q_scheduled_pu, dtype=float).ravel()
+    pq = feeder.children
+    v = (vm * exp(1j * va)).astype(cdouble)
+    loop_current = feeder.loop_y_series * (v[feeder.loop_from] - v[feeder.loop_to])
+
+    iteration = 0
+    converged = False
+    while iteration < max_iteration and not converged:
+        iteration += 1
+        current = feeder.y_shunt_bus * v
+        current[pq] -= conj(s_scheduled_pu[pq] / v[pq])
+        add.at(current, feeder.loop_from, loop_current)
+        add.at(current, feeder.loop_to, -loop_current)
+        feeder.sweep(v, current)
+        if feeder.n_loops:
+            residual = v[feeder.loop_from] - v[feeder.loop_to] - loop_current / feeder.loop_y_series
+            loop_current += dense_solve(feeder.loop_matrix, residual)
+
+        S = v * conj(y_bus * v) - s_scheduled_pu
+        F = concatenate([S.real[pq], S.imag[pq]])
+        if not isfinite(F).all():
+            break
+        converged = bool(abs(F).max(initial=0) < tolerance)
+    vm[:] = abs(v)
+    va[:] = angle(v)
+    return iteration, converged
@@ -0,0 +1,232 @@
+from dataclasses import dataclass, field
+from time import perf_counter
+from numpy import ndarray, asarray, zeros, exp, conj, inf
+from numpy.linalg import LinAlgError
+import networkx as nx
+from .jacobian import get_jacobian_pattern
+from .linear_solver import SparseLUSolver
+from .load_flow import newton_raphson, prepare_load_flow_from_case_file
+from .switching import get_switching_manager
+from .topology import get_topology, get_energized_buses
+from .contingency import ContingencyScreening, get_branch_elements
+
+
+@dataclass(kw_only=True)
+class ReconfigurationResult:
+    open_branches: tuple  # Branch rows (lines first, then transformers) open in the final configuration
+    elements: tuple  # ('line', idx) or ('transformer', idx) for every open branch
+    initial_losses_mw: float
+    losses_mw: float
+    exchanges: list = field(default_factory=list)  # (closed branch row, opened branch row, losses_mw) accepted in order
+    configurations: int = 0  # Configurations solved, cached ones are not counted again
+    cache_hits: int = 0
+    fallbacks: int = 0  # Configurations solved again with full Newton-Raphson
+    seconds: float = 0.0
+    vm: ndarray = field(default=None, repr=False)
+    va: ndarray = field(default=None, repr=False)
+
+    @property
+    def configurations_per_second(self):
+        return self.configurations / self.seconds if self.seconds else 0.0
+
+
+def calculate_losses_mw(net, y_bus, vm, va) -> float:
+    # Active power losses are the sum of the bus injections
+    v = vm * exp(1j * va)
+    return float(net.pu_to_mw((v * conj(y_bus * v)).real.sum()))
+
+
+class BranchExchange:
+    """
+    Loss minimizing feeder reconfiguration by branch exchange.
+
+    Closing an open switchable branch (a tie) closes a loop through the closed branches and opening any other branch of
+    that loop restores the number of loops without splitting an island, so every exchange keeps the configuration
+    radial, the islands and the energized buses unchanged. The islands are found once and the candidates need no
+    island search. Every sweep evaluates all exchanges of the current configuration and accepts the one that reduces
+    the losses most, until none does.
+
+    Candidates are switched in place by the switching manager of the net, which keeps the y_bus structure. An exchange
+    changes the Y-bus at the ends of two branches only, so every candidate is solved by ContingencyScreening around
+    the factorized Jacobian of the current configuration, warm-started from its solution. Losses are cached by
+    configuration.
+    """
+    def __init__(self, net, p_scheduled_pu, q_scheduled_pu, vm, va, switchable=None, max_iteration: int = 50,
+                 tolerance: float = 1e-8):
+        arrays = net.arrays
+        self.net = net
+        self.manager = get_switching_manager(net)
+        self.p_scheduled_pu = asarray(p_scheduled_pu, dtype=float).ravel()
+        self.q_scheduled_pu = asarray(q_scheduled_pu, dtype=float).ravel()
+        self.max_iteration = max_iteration
+        self.tolerance = tolerance
+
+        # Every line is switchable by default, switchable takes branch rows
+        self.switchable = zeros(arrays.n_branches, dtype=bool)
+        if switchable is None:
+            self.switchable[:arrays.n_lines] = True
+        else:
+            self.switchable[asarray(switchable, dtype=int)] = True
+        self.elements = get_branch_elements(net)
+
+        # Exchanges never change the islands, they are found once
+        topology = get_topology(net)
+        self.bus_island = topology.bus_island
+        self.energized = get_energized_buses(net, topology)
+        self.graph = nx.Graph()
+        self.graph.add_nodes_from(range(arrays.n_buses))
+        for branch in self.manager.closed.nonzero()[0].tolist():
+            self.add_edge(branch)
+        self.loops = {}
+
+        # Initial configuration solved from the given start with full Newton-Raphson
+        self.vm, self.va = asarray(vm, dtype=float).copy(), asarray(va, dtype=float).copy()
+        pvpq_list = sorted(list(net.pq_buses) + list(net.pv_buses))
+        pq_list = sorted(list(net.pq_buses))
+        _, converged = newton_raphson(self.manager.y_bus, self.vm, self.va, self.p_scheduled_pu, self.q_scheduled_pu,
+                                      get_jacobian_pattern(net, pvpq_list, pq_list), SparseLUSolver(), max_iteration,
+                                      tolerance)
+        if not converged:
+            raise ValueError('Load flow of the initial configuration did not converge.')
+        self.current_losses = calculate_losses_mw(net, self.manager.y_bus, self.vm, self.va)
+        self.losses = {self.manager.closed.tobytes(): self.current_losses}
+        self.configurations = 1
+        self.cache_hits = 0
+        self.fallbacks = 0
+        self.screening = None
+
+    def add_edge(self, branch):
+        f, t = int(self.net.arrays.branch_from[branch]), int(self.net.arrays.branch_to[branch])
+        if self.graph.has_edge(f, t):
+            self.graph.edges[f, t]['branches'].append(branch)
+        else:
+            self.graph.add_edge(f, t, branches=[branch])
+
+    def remove_edge(self, branch):
+        f, t = int(self.net.arrays.branch_from[branch]), int(self.net.arrays.branch_to[branch])
+        branches = self.graph.edges[f, t]['branches']
+        branches.remove(branch)
+        if not branches:
+            self.graph.remove_edge(f, t)
+
+    def find_loop(self, tie) -> list:
+        # Switchable branches that can be opened after closing the tie, empty if the tie joins two islands or lies in
+        # a de-energized one. Branches with a parallel closed branch do not open the loop and are left out.
+        if tie not in self.loops:
+            f, t = int(self.net.arrays.branch_from[tie]), int(self.net.arrays.branch_to[tie])
+            loop = []
+            if self.bus_island[f] == self.bus_island[t] and self.energized[f] and f != t:
+                path = nx.shortest_path(self.graph, f, t)
+                for u, v in zip(path[:-1], path[1:]):
+                    branches = self.graph.edges[u, v]['branches']
+                    if len(branches) == 1 and self.switchable[branches[0]]:
+                        loop.append(branches[0])
+            self.loops[tie] = loop
+        return self.loops[tie]
+
+    def evaluate(self):
+        # Losses of the switched configuration, with its solution when it was solved now and not read from the cache
+        key = self.manager.closed.tobytes()
+        if key in self.losses:
+            self.cache_hits += 1
+            return self.losses[key], None, None
+        try:
+            vm, va, _, converged = self.screening.solve_switched(self.manager.y_bus, self.max_iteration,
+                                                                 self.tolerance)
+        except LinAlgError:
+            converged = False
+        self.configurations += 1
+        losses = calculate_losses_mw(self.net, self.manager.y_bus, vm, va) if converged else inf
+        self.losses[key] = losses
+        return (losses, vm, va) if converged else (losses, None, None)
+
+    def sweep(self):
+        # Evaluates every exchange of the current configuration, returns the best as (tie, opened, losses, vm, va)
+        best = (None, None, self.current_losses, None, None)
+        if self.screening is None:
+            self.screening = ContingencyScreening(self.net, self.p_scheduled_pu, self.q_scheduled_pu, self.vm, self.va)
+        checkpoint = self.manager.checkpoint()
+        for tie in (~self.manager.closed & self.switchable).nonzero()[0].tolist():
+            loop = self.find_loop(tie)
+            if not loop:
+                continue
+            self.manager.set_branch(tie, True)
+            for branch in loop:
+                self.manager.set_branch(branch, False)
+                losses, vm, va = self.evaluate()
+                if losses < best[2]:
+                    best = (tie, branch, losses, vm, va)
+                self.manager.undo(checkpoint + 1)
+            self.manager.undo(checkpoint)
+        return best
+
+    def exchange(self, tie, branch, vm=None, va=None) -> None:
+        self.manager.set_branch(tie, True)
+        self.manager.set_branch(branch, False)
+        self.add_edge(tie)
+        self.remove_edge(branch)
+        self.loops = {}
+        if vm is None:
+            # Best configuration read from the cache, solved again for its voltages
+            self.losses.pop(self.manager.closed.tobytes())
+            self.current_losses, vm, va = self.evaluate()
+        self.vm, self.va = vm, va
+        # The next sweep factorizes the Jacobian of the new configuration
+        self.fallbacks += self.screening.fallbacks
+        self.screening = None
+
+    def run(self, max_exchanges: int = None) -> ReconfigurationResult:
+        start = perf_counter()
+        initial_losses = self.current_losses
+        exchanges = []
+        while max_exchanges is None or len(exchanges) < max_exchanges:
+            tie, branch, losses, vm, va = self.sweep()
+            if tie is None:
+                break
+            self.exchange(tie, branch, vm, va)
+            self.current_losses = losses
+            exchanges.append((tie, branch, losses))
+        open_branches = tuple((~self.manager.closed).nonzero()[0].tolist())
+        fallbacks = self.fallbacks + (self.screening.fallbacks if self.screening is not None else 0)
+        return ReconfigurationResult(open_branches=open_branches,
+                                     elements=tuple(self.elements[branch] for branch in open_branches),
+                                     initial_losses_mw=initial_losses,
+                                     losses_mw=self.current_losses,
+                                     exchanges=exchanges,
+                                     configurations=self.configurations,
+                                     cache_hits=self.cache_hits,
+                                     fallbacks=fallbacks,
+                                     seconds=perf_counter() - start,
+                                     vm=self.vm,
+                                     va=self.va)
+
+
+def run_reconfiguration(net,
+                        p_scheduled_pu,
+                        q_scheduled_pu,
+                        vm,
+                        va,
+                        switchable=None,
+                        max_exchanges: int = None,
+                        max_iteration: int = 50,
+                        tolerance: float = 1e-8) -> ReconfigurationResult:
+    """
+    Branch exchange from the current switching state of the net, solved from vm and va. The net is left switched to
+    the final configuration with its solution in net.vm and net.va. switchable takes branch rows and defaults to
+    every line.
+    """
+    start = perf_counter()
+    search = BranchExchange(net, p_scheduled_pu, q_scheduled_pu, vm, va, switchable, max_iteration, tolerance)
+    result = search.run(max_exchanges)
+    result.seconds = perf_counter() - start
+    net.vm = result.vm
+    net.va = result.va
+    return result
+
+
+def run_reconfiguration_from_case_file(net, load_flow_case, **kwargs) -> ReconfigurationResult:
+    """
+    Wrapper function for reconfiguration to run with case file, starting from the open branches of the case
+    """
+    p_scheduled_pu, q_scheduled_pu, vm, va = prepare_load_flow_from_case_file(net, load_flow_case)
+    return run_reconfiguration(net, p_scheduled_pu, q_scheduled_pu, vm, va, **kwargs)
@@ -0,0 +1,55 @@
+from numpy import atleast_2d, asarray, empty, zeros
+from .jacobian import get_jacobian_pattern
+from .load_flow import newton_raphson
+
+
+def run_load_flow_scenarios(net,
+                            p_scheduled_pu,
+                            q_scheduled_pu,
+                            vm,
+                            va,
+                            max_iteration: int = 100,
+                            tolerance: float = 1e-8,
+                            warm_start: bool = True,
+                            reuse_factorization: int = 1):
+    """
+    Solves stacked operating points (scenarios x buses) against the current y_bus and bus load flow types.
+
+    vm and va are the flat start holding the PV and slack set points. With warm_start every scenario starts from the
+    previous converged solution. The results are returned as (scenarios x buses) arrays, net.vm and net.va are left
+    untouched.
+    """
+    p_scheduled_pu = atleast_2d(asarray(p_scheduled_pu, dtype=float))
+    q_scheduled_pu = atleast_2d(asarray(q_scheduled_pu, dtype=float))
+    n_scenarios, n_buses = p_scheduled_pu.shape
+
+    pvpq_list = sorted(list(net.pq_buses) + list(net.pv_buses))
+    pq_list = sorted(list(net.pq_buses))
+    jacobian_pattern = get_jacobian_pattern(net, pvpq_list, pq_list)
+    solver = net.load_flow_solver
+    solver.reuse_factorization = reuse_factorization
+    solver.reset()
+
+    vm_results = empty((n_scenarios, n_buses))
+    va_results = empty((n_scenarios, n_buses))
+    iterations = zeros(n_scenarios, dtype=int)
+    converged = zeros(n_scenarios, dtype=bool)
+
+    vm_start, va_start = asarray(vm, dtype=float), asarray(va, dtype=float)
+    for scenario in range(n_scenarios):
+        vm_scenario, va_scenario = vm_start.copy(), va_start.copy()
+        iterations[scenario], converged[scenario] = newton_raphson(net.y_bus,
+                                                                   vm_scenario,
+                                                                   va_scenario,
+                                                                   p_scheduled_pu[scenario],
+                                                                   q_scheduled_pu[scenario],
+                                                                   jacobian_pattern,
+                                                                   solver,
+                                                                   max_iteration,
+                                                                   tolerance)
+        vm_results[scenario] = vm_scenario
+        va_results[scenario] = va_scenario
+        if warm_start and converged[scenario]:
+            vm_start, va_start = vm_scenario, va_scenario
+
+    return vm_results, va_results, iterations, converged
@@ -0,0 +1,152 @@
+from numpy import ndarray, asarray, arange, zeros, full, exp, column_stack, nan, int64
+from scipy.sparse import csr_matrix
+from .jacobian import get_jacobian_pattern
+from .linear_solver import SparseLUSolver
+from .dc_load_flow import get_dc_load_flow
+
+
+class DistributionFactors:
+    """
+    PTDF and LODF of the DC model of a switching state, computed by column on demand.
+
+    The factorization of the DC load flow of the net is shared and no inverse of B is formed. A PTDF column, the change
+    of every branch flow per unit injection at one bus withdrawn at the slack bus of its island, takes one solve with
+    the factorization. An LODF column, the change of every branch flow per unit pre-outage flow on one branch when that
+    branch opens, takes one solve for the transfer between the ends of the branch. Columns are kept once computed.
+    Buses and branches are positions and rows as in y_bus and y_bus_from_to.
+    """
+    def __init__(self, net):
+        arrays = net.arrays
+        self.arrays = arrays
+        self.closed_state = arrays.branch_closed.tobytes()
+        self.slack_buses = sorted(net.slack_buses)
+        self.n_buses = arrays.n_buses
+        self.n_branches = arrays.n_branches
+        self.dc_load_flow = get_dc_load_flow(net)
+
+        self.ptdf_columns = {}
+        self.lodf_columns = {}
+
+    def branch_flows(self, injections: ndarray) -> ndarray:
+        # DC branch flows of (buses x k) injections balanced by the slack buses
+        return self.dc_load_flow.b_branch @ self.dc_load_flow.angles(injections)
+
+    def unit_injections(self, buses, withdrawals=None) -> ndarray:
+        injections = zeros((self.n_buses, len(buses)))
+        injections[buses, arange(len(buses))] = 1
+        if withdrawals is not None:
+            injections[withdrawals, arange(len(buses))] -= 1
+        return injections
+
+    def ptdf(self, buses=None) -> ndarray:
+        # (branches x buses) flow changes per unit injection at each bus, every bus by default
+        buses = arange(self.n_buses) if buses is None else asarray(buses, dtype=int64).ravel()
+        missing = [bus for bus in dict.fromkeys(buses.tolist()) if bus not in self.ptdf_columns]
+        if missing:
+            columns = self.branch_flows(self.unit_injections(missing))
+            self.ptdf_columns.update(zip(missing, columns.T))
+        return column_stack([self.ptdf_columns[bus] for bus in buses.tolist()]) if len(buses) else \
+            zeros((self.n_branches, 0))
+
+    def lodf(self, branches=None, tolerance: float = 1e-10) -> ndarray:
+        """
+        (branches x outaged branches) flow changes per unit pre-outage flow on each outaged branch, every branch by
+        default. The outaged branch itself loses its flow, -1. Columns of open branches and of branches whose outage
+        splits an island are nan.
+        """
+        branches = arange(self.n_branches) if branches is None else asarray(branches, dtype=int64).ravel()
+        missing = [branch for branch in dict.fromkeys(branches.tolist()) if branch not in self.lodf_columns]
+        if missing:
+            f, t = self.arrays.branch_from[missing], self.arrays.branch_to[missing]
+            transfers = self.branch_flows(self.unit_injections(f, t))
+            closed = self.arrays.branch_closed
+            for k, branch in enumerate(missing):
+                # The transfer the outaged branch itself carries returns through the rest of the network
+                remaining = 1 - transfers[branch, k]
+                if not closed[branch] or abs(remaining) < tolerance:
+                    column = full(self.n_branches, nan)
+                else:
+                    column = transfers[:, k] / remaining
+                    column[branch] = -1
+                self.lodf_columns[branch] = column
+        return column_stack([self.lodf_columns[branch] for branch in branches.tolist()]) if len(branches) else \
+            zeros((self.n_branches, 0))
+
+
+def get_distribution_factors(net) -> DistributionFactors:
+    # Kept with its factorization and columns until the compiled arrays are rebuilt, a branch is switched or the slack
+    # buses change
+    arrays = net.arrays
+    factors = net.distribution_factors
+    if (factors is None or factors.arrays is not arrays or factors.closed_state != arrays.branch_closed.tobytes()
+            or factors.slack_buses != sorted(net.slack_buses)):
+        factors = DistributionFactors(net)
+        net.distribution_factors = factors
+    return factors
+
+
+class VoltageSensitivities:
+    """
+    Sensitivities of the bus voltages to the scheduled injections at a converged operating point, by default net.vm
+    and net.va, computed by column on demand.
+
+    The Newton-Raphson Jacobian of the operating point is factorized once. A unit change of the active or reactive
+    injection at one bus moves the voltages by one solve with it, [dva_pvpq, dvm_pq] = J^-1 e. Slack buses hold their
+    voltage and PV buses their magnitude, their rows and the columns of slack and de-energized buses are zero. Columns
+    are kept once computed. Injections are in pu and buses are positions as in y_bus.
+    """
+    def __init__(self, net, vm=None, va=None):
+        vm = asarray(net.vm if vm is None else vm, dtype=float)
+        va = asarray(net.va if va is None else va, dtype=float)
+        self.n_buses = len(vm)
+        self.pvpq = asarray(sorted(list(net.pq_buses) + list(net.pv_buses)), dtype=int64)
+        self.pq = asarray(sorted(list(net.pq_buses)), dtype=int64)
+        jacobian_pattern = get_jacobian_pattern(net, self.pvpq.tolist(), self.pq.tolist())
+        self.solver = SparseLUSolver()
+        self.solver.factorize(jacobian_pattern.fill(csr_matrix(net.y_bus), vm * exp(1j * va)))
+
+        # Jacobian rows of the P mismatch of every PV and PQ bus and of the Q mismatch of every PQ bus
+        self.rows = {'p': full(self.n_buses, -1, dtype=int64), 'q': full(self.n_buses, -1, dtype=int64)}
+        self.rows['p'][self.pvpq] = arange(len(self.pvpq))
+        self.rows['q'][self.pq] = len(self.pvpq) + arange(len(self.pq))
+        self.columns = {}
+
+    def solve_columns(self, quantity: str, buses) -> None:
+        if quantity not in self.rows:
+            raise ValueError(f'Unknown injection {quantity}, expected p or q.')
+        missing = [bus for bus in dict.fromkeys(buses.tolist()) if (quantity, bus) not in self.columns]
+        rows = self.rows[quantity][missing]
+        n = len(self.pvpq) + len(self.pq)
+        rhs = zeros((n, len(missing)))
+        rhs[rows[rows >= 0], (rows >= 0).nonzero()[0]] = 1
+        dx = self.solver.solve_factorized(rhs).reshape(n, -1) if missing else zeros((n, 0))
+        for k, bus in enumerate(missing):
+            dvm, dva = zeros(self.n_buses), zeros(self.n_buses)
+            dva[self.pvpq] = dx[:len(self.pvpq), k]
+            dvm[self.pq] = dx[len(self.pvpq):, k]
+            self.columns[quantity, bus] = dvm, dva
+
+    def sensitivities(self, quantity: str = 'p', buses=None):
+        """
+        (buses x buses) changes of the voltage magnitudes and angles per unit injection of quantity 'p' or 'q' at each
+        of the given buses, every bus by default. Returns (dvm, dva).
+        """
+        buses = arange(self.n_buses) if buses is None else asarray(buses, dtype=int64).ravel()
+        self.solve_columns(quantity, buses)
+        dvm = zeros((self.n_buses, len(buses)))
+        dva = zeros((self.n_buses, len(buses)))
+        for k, bus in enumerate(buses.tolist()):
+            dvm[:, k], dva[:, k] = self.columns[quantity, bus]
+        return dvm, dva
+
+    def dvm_dp(self, buses=None) -> ndarray:
+        return self.sensitivities('p', buses)[0]
+
+    def dvm_dq(self, buses=None) -> ndarray:
+        return self.sensitivities('q', buses)[0]
+
+    def dva_dp(self, buses=None) -> ndarray:
+        return self.sensitivities('p', buses)[1]
+
+    def dva_dq(self, buses=None) -> ndarray:
+        return self.sensitivities('q', buses)[1]
@@ -0,0 +1,218 @@
+from dataclasses import dataclass, field
+from time import perf_counter
+from numpy import ndarray, asarray, array
+from scipy.sparse import csr_matrix
+from .jacobian import JacobianPattern
+from .linear_solver import SparseLUSolver
+from .load_flow import LoadFlowCase, read_load_flow_case, newton_raphson, fast_decoupled
+from .network_matrices import create_y_bus, create_decoupled_b_matrices
+from .switching import SwitchingManager, get_switching_manager, get_branch_states
+from .topology import get_topology, get_energized_buses, check_multiple_slacks
+
+
+@dataclass(frozen=True, kw_only=True)
+class LoadFlowResult:
+    method: str
+    converged: bool
+    iterations: int
+    mismatch_history: tuple = field(repr=False)  # Largest mismatch in pu before every step and after the last one
+    vm: ndarray = field(repr=False)  # Read-only copies, de-energized buses are zero
+    va: ndarray = field(repr=False)
+    setup_seconds: float  # Bringing the session up to date with the net and the requested state
+    solve_seconds: float
+    factorizations: int
+    rebuilt: tuple = ()  # Names of the cached structures rebuilt for this solve, empty when everything was reused
+
+    @property
+    def total_seconds(self):
+        return self.setup_seconds + self.solve_seconds
+
+
+def read_only_copy(values) -> ndarray:
+    values = array(values, dtype=float).ravel()
+    values.flags.writeable = False
+    return values
+
+
+class LoadFlowSession:
+    """
+    Repeated load flows of one net that share every structure the inputs leave unchanged.
+
+    The session holds its own bus type partition, switching state, energized buses, Jacobian pattern and LU solver,
+    and never writes net.pq_buses, net.pv_buses, net.slack_buses, net.vm or net.va. The admittance matrices are those
+    of the switching manager of the net, the requested switching state is applied to them in place before a solve and
+    only the branches that differ are switched. Before every solve update compares the compiled arrays, the switching
+    manager, the switching state and the bus types with what the cached structures were built for and rebuilds only
+    those that are out of date, with their names in LoadFlowResult.rebuilt.
+
+    Solves return immutable LoadFlowResult objects and print nothing. Without start voltages a solve is warm-started
+    from the last converged result, newly energized buses start at 1 pu.
+    """
+    def __init__(self, net):
+        self.net = net
+        self.arrays = None
+        self.manager = None
+        self.closed = None
+        # Bus types of the net as the starting point, none before a case was prepared
+        self.pq_buses = set(net.pq_buses or ())
+        self.pv_buses = set(net.pv_buses or ())
+        self.slack_buses = set(net.slack_buses or ())
+
+        self.energized_key = None
+        self.energized = None
+        self.pvpq_list = None
+        self.pq_list = None
+        self.jacobian_pattern = None
+        self.solver = SparseLUSolver()
+        self.b_prime_solver = SparseLUSolver()
+        self.b_double_prime_solver = SparseLUSolver()
+        self.decoupled_key = None
+        self.last_result = None
+        self.rebuilt = []
+
+    def set_bus_types(self, pq_buses, pv_buses, slack_buses) -> None:
+        self.pq_buses = set(pq_buses)
+        self.pv_buses = set(pv_buses)
+        self.slack_buses = set(slack_buses)
+
+    def set_switching_state(self, closed) -> None:
+        # Branch row states, lines first, applied at the next solve
+        self.update_arrays()
+        closed = asarray(closed, dtype=bool)
+        if closed.shape != (self.arrays.n_branches,):
+            raise ValueError(f'Expected {self.arrays.n_branches} branch states, got {closed.size}.')
+        self.closed = closed.copy()
+
+    def set_open_branches(self, open_lines=(), open_transformers=()) -> None:
+        self.update_arrays()
+        self.closed = get_branch_states(self.net, open_lines, open_transformers)
+
+    def update_arrays(self) -> None:
+        # Recompiled elements need new matrices, the switching state is then taken from the element flags again. The
+        # switching manager of the net is adopted when it belongs to the current arrays.
+        net = self.net
+        if self.arrays is not net.arrays:
+            arrays = net.arrays
+            manager = net.switching_manager
+            if manager is None or manager.arrays is not arrays or manager.y_bus is not net.y_bus:
+                create_y_bus(net)
+                manager = SwitchingManager(net)
+                net.switching_manager = manager
+                self.rebuilt.append('y_bus')
+            self.manager = manager
+            self.arrays = arrays
+            self.closed = manager.closed.copy()
+            self.energized_key = None
+            self.rebuilt.append('arrays')
+
+    def update(self) -> None:
+        net = self.net
+        self.update_arrays()
+        manager = get_switching_manager(net)
+        if manager is not self.manager:
+            self.manager = manager
+            self.rebuilt.append('y_bus')
+
+        changed = (manager.closed != self.closed).nonzero()[0]
+        for branch in changed.tolist():
+            manager.set_branch(branch, bool(self.closed[branch]))
+        if len(changed):
+            self.rebuilt.append('switching')
+
+        energized_key = (self.closed.tobytes(), tuple(sorted(self.slack_buses)))
+        if energized_key != self.energized_key:
+            check_multiple_slacks(net, self.slack_buses)
+            self.energized = get_energized_buses(net, get_topology(net), self.slack_buses)
+            self.energized_key = energized_key
+            self.rebuilt.append('topology')
+
+        de_energized = set((~self.energized).nonzero()[0].tolist())
+        self.pvpq_list = sorted((self.pq_buses | self.pv_buses) - de_energized)
+        self.pq_list = sorted(self.pq_buses - de_energized)
+        y_bus = csr_matrix(manager.y_bus)
+        if self.jacobian_pattern is None or not self.jacobian_pattern.matches(y_bus, self.pvpq_list, self.pq_list):
+            self.jacobian_pattern = JacobianPattern(y_bus, self.pvpq_list, self.pq_list)
+            self.rebuilt.append('jacobian_pattern')
+
+    def factorize_decoupled(self, method: str) -> None:
+        # B' and B'' factorized for the method, switching state and bus types of the session
+        key = (method, self.closed.tobytes(), tuple(self.pvpq_list), tuple(self.pq_list))
+        if key != self.decoupled_key:
+            b_prime, b_double_prime = create_decoupled_b_matrices(self.net, method[2:])
+            self.b_prime_solver.factorize(b_prime[self.pvpq_list][:, self.pvpq_list])
+            self.b_double_prime_solver.factorize(b_double_prime[self.pq_list][:, self.pq_list])
+            self.decoupled_key = key
+            self.rebuilt.append('decoupled_matrices')
+
+    def start_voltages(self, vm, va):
+        if vm is None or va is None:
+            if self.last_result is None:
+                raise ValueError('No converged result to start from, pass vm and va.')
+            vm = self.last_result.vm if vm is None else vm
+            va = self.last_result.va if va is None else va
+        vm = array(vm, dtype=float).ravel()
+        va = array(va, dtype=float).ravel()
+        vm[self.energized & (vm == 0)] = 1
+        vm[~self.energized] = 0
+        va[~self.energized] = 0
+        return vm, va
+
+    def solve(self,
+              p_scheduled_pu,
+              q_scheduled_pu,
+              vm=None,
+              va=None,
+              method: str = 'NR',
+              max_iteration: int = 100,
+              tolerance: float = 1e-8) -> LoadFlowResult:
+        """
+        Load flow of the scheduled powers with the bus types and switching state of the session. method is 'NR'
+        (Newton-Raphson) or 'FDXB' / 'FDBX' (fast decoupled).
+        """
+        if method not in ('NR', 'FDXB', 'FDBX'):
+            raise ValueError(f'Unknown load flow method {method}, expected NR, FDXB or FDBX.')
+        solvers = (self.solver, self.b_prime_solver, self.b_double_prime_solver)
+        factorizations = sum(solver.factorizations for solver in solvers)
+        start = perf_counter()
+        self.update()
+        vm, va = self.start_voltages(vm, va)
+        if method != 'NR':
+            self.factorize_decoupled(method)
+        setup_seconds = perf_counter() - start
+
+        start = perf_counter()
+        mismatch_history = []
+        if method == 'NR':
+            self.solver.reset()
+            iteration, converged = newton_raphson(self.manager.y_bus, vm, va, p_scheduled_pu, q_scheduled_pu,
+                                                  self.jacobian_pattern, self.solver, max_iteration, tolerance,
+                                                  mismatch_history)
+        else:
+            iteration, converged = fast_decoupled(self.manager.y_bus, vm, va, p_scheduled_pu, q_scheduled_pu,
+                                                  self.b_prime_solver, self.b_double_prime_solver, self.pvpq_list,
+                                                  self.pq_list, max_iteration, tolerance, mismatch_history)
+        solve_seconds = perf_counter() - start
+
+        result = LoadFlowResult(method=method,
+                                converged=converged,
+                                iterations=iteration,
+                                mismatch_history=tuple(mismatch_history),
+                                vm=read_only_copy(vm),
+                                va=read_only_copy(va),
+                                setup_seconds=setup_seconds,
+                                solve_seconds=solve_seconds,
+                                factorizations=sum(solver.factorizations for solver in solvers) - factorizations,
+                                rebuilt=tuple(self.rebuilt))
+        self.rebuilt = []
+        if converged:
+            self.last_result = result
+        return result
+
+    def solve_case(self, load_flow_case, **kwargs) -> LoadFlowResult:
+        # A LoadFlowCase, a JSON case or a binary case, solved from the flat start of the case
+        if not isinstance(load_flow_case, LoadFlowCase):
+            load_flow_case = read_load_flow_case(self.net, load_flow_case)
+        self.set_bus_types(load_flow_case.pq_buses, load_flow_case.pv_buses, load_flow_case.slack_buses)
+        self.set_open_branches(load_flow_case.open_lines, load_flow_case.open_transformers)
+        return self.solve(load_flow_case.p_scheduled_pu, load_flow_case.q_scheduled_pu, load_flow_case.vm,
+                          load_flow_case.va, **kwargs)
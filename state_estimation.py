@@ -1,74 +1,97 @@
-from numpy import ones, exp, conj, zeros, eye, c_, r_, array, diagflat, concatenate
-from scipy.sparse import csr_matrix, vstack, hstack, eye as sparse_eye
-from scipy.sparse.linalg import spsolve
+from numpy import ones, exp, zeros, concatenate, maximum, full, inf, c_
+from scipy.sparse import diags, hstack, bmat, csc_matrix, eye as sparse_eye
 from scipy.optimize import linprog as lp
-from .ds_dx import calculate_dsbus_dx, calculate_dsbranch_dx
+from .linear_solver import SparseLUSolver
+from .measurement_model import MeasurementModel
+from .observability import analyze_observability
 
 
 def create_measurement_vector(net):
-    v_magnitude = []
-    p_injection = []
-    q_injection = []
-    p_flow = []
-    q_flow = []
-    r_cov = []
-    for idx, measurement in net.bus_measurements.items():
-        if measurement.measurement_type == 'v_magnitude':
-            v_magnitude.append(measurement.value_pu)
-            r_cov.append(measurement.std_dev**2)
-        elif measurement.measurement_type == 'p_injection':
-            p_injection.append(measurement.value_pu)
-            r_cov.append(measurement.std_dev**2)
-        else:
-            q_injection.append(measurement.value_pu)
-            r_cov.append(measurement.std_dev**2)
-
-    for idx, measurement in net.branch_measurements.items():
-        if measurement.measurement_type == 'p_flow':
-            p_flow.append(measurement.value_pu)
-            r_cov.append(measurement.std_dev**2)
-        elif measurement.measurement_type == 'q_flow':
-            q_flow.append(measurement.value_pu)
-            r_cov.append(measurement.std_dev**2)
-
-    return array(v_magnitude + p_injection + q_injection + p_flow + q_flow), csr_matrix(diagflat(1 / array(r_cov) ** 2))
-
-
-def create_jacobian_matrix(net, v, angle_indices, magnitude_indices):
-    dsbus_dvm, dsbus_dva = calculate_dsbus_dx(net.y_bus, v)
-    dsbranch_dvm, dsbranch_dva = calculate_dsbranch_dx(net.y_bus_from_to,
-                                                       net.from_buses,
-                                                       v)
-
-    v_jac_va, v_jac_vm = zeros((v.shape[0], v.shape[0])), eye(v.shape[0], v.shape[0])
-    s_jac_va = vstack((dsbus_dva.real,
-                       dsbus_dva.imag,
-                       dsbranch_dva.real,
-                       dsbranch_dva.imag))
-
-    s_jac_vm = vstack((dsbus_dvm.real,
-                      dsbus_dvm.imag,
-                      dsbranch_dvm.real,
-                      dsbranch_dvm.imag))
+    model = net.measurement_model
+    return model.z, diags(model.weights, format='csr')
 
-    s_jac = hstack((s_jac_va, s_jac_vm)).toarray()
 
-    vm_jac = c_[v_jac_va, v_jac_vm]
-    H = r_[vm_jac, s_jac]
-
-    return csr_matrix(H[:, angle_indices + magnitude_indices])
+def create_jacobian_matrix(net, v, angle_indices, magnitude_indices=None):
+    # Sparse measurement Jacobian with rows for the measurements and columns for angle_indices and every magnitude
+    return net.measurement_model.jacobian(v, angle_indices)
 
 
 def create_hx(net, v):
-    s_flow = v[net.from_buses] * conj(net.y_bus_from_to * v)
-    s_bus = v * conj(net.y_bus * v)
-    hx = r_[abs(v),
-            s_bus.real,
-            s_bus.imag,
-            s_flow.real,
-            s_flow.imag]
-
-    return hx
+    return net.measurement_model.hx(v)
+
+
+class LAVProblem:
+    """
+    Linear program of one LAV step, min sum(u + w) subject to H dx + u - w = r with u, w >= 0 and dx free.
+
+    The constraint matrix [H, I, -I] is assembled once per sparsity pattern of H. H comes first in its CSC storage,
+    so later iterations only overwrite the first H.nnz values, the costs, bounds and identity blocks are kept.
+
+    The optimal basis of the LP is the set of measurements the step interpolates, H_B dx = r_B. Once it is known the
+    following steps are sparse solves on that set alone, and the LP is solved again only when they have converged to
+    confirm the basis at the new point. A basis that was already converged on is accepted, which ends the cycling
+    between bases that are tied at the estimate.
+    """
+    def __init__(self, n_measurements, n_states, method='highs-ds', basis_tolerance=1e-9):
+        m, n = n_measurements, n_states
+        self.method = method
+        self.basis_tolerance = basis_tolerance
+        self.c = concatenate([zeros(n), ones(2 * m)])
+        self.bounds = c_[concatenate([full(n, -inf), zeros(2 * m)]), full(n + 2 * m, inf)]
+        self.slack = hstack((sparse_eye(m, format='csc'), -sparse_eye(m, format='csc')), format='csc')
+        self.A = None
+        self.pattern = None
+        self.basis = None
+        self.converged_bases = set()
+        self.solver = SparseLUSolver()
+
+        # Statistics
+        self.assemblies = 0
+        self.lp_solves = 0
+        self.basis_solves = 0
+
+    def update(self, H):
+        H = csc_matrix(H)
+        H.sort_indices()
+        pattern = (H.indptr.tobytes(), H.indices.tobytes())
+        if pattern != self.pattern:
+            self.A = hstack((H, self.slack), format='csc')
+            self.pattern = pattern
+            self.assemblies += 1
+        else:
+            self.A.data[:H.nnz] = H.data
+
+    def solve(self, H, r):
+        # LP step, also sets the basis unless the interpolated measurements do not determine the step
+        self.update(H)
+        res = lp(c=self.c, A_eq=self.A, b_eq=r, bounds=self.bounds, method=self.method)
+        self.lp_solves += 1
+        if res.x is None:
+            raise RuntimeError(f'LAV linear program failed: {res.message}')
+        dx = res.x[:H.shape[1]]
+        basis = (abs(r - H * dx) <= self.basis_tolerance).nonzero()[0]
+        self.basis = basis if len(basis) >= H.shape[1] else None
+        return dx
+
+    def solve_basis(self, H, r):
+        # Square basis solved directly, degenerate ones with more interpolated rows in the least squares sense
+        H_b = H[self.basis]
+        self.basis_solves += 1
+        if H_b.shape[0] == H_b.shape[1]:
+            return self.solver.solve(H_b, r[self.basis])
+        return self.solver.solve(H_b.T * H_b, H_b.T * r[self.basis])
+
+    def step(self, H, r, tolerance):
+        if self.basis is None:
+            return self.solve(H, r)
+        dx = self.solve_basis(H, r)
+        if abs(dx).max() >= tolerance:
+            return dx
+        self.converged_bases.add(self.basis.tobytes())
+        lp_dx = self.solve(H, r)
+        if self.basis is not None and self.basis.tobytes() in self.converged_bases:
+            return dx
+        return lp_dx
 
 
 def flat_start(net):
@@ -80,44 +103,68 @@ def flat_start(net):
 def estimate(net,
              max_iteration=100,
              tolerance=1e-8,
-             algorithm='WLS'):
-
+             algorithm='WLS',
+             reuse_factorization=1,
+             measurement_model: MeasurementModel = None,
+             irls_threshold: float = 1e-6,
+             check_observability: bool = False):
+    # The measurement model is compiled once per measurement set and kept on the net unless one is given
+    # algorithm is 'WLS', 'WLS_AUGMENTED', 'LAV' (linear programs, see LAVProblem) or 'LAV_IRLS' (iteratively
+    # reweighted least squares, residuals below irls_threshold are weighted as if they were at the threshold). IRLS
+    # converges linearly and is meant for looser tolerances than the default. check_observability runs the topological
+    # analysis of observability.py first and raises instead of iterating on a singular gain matrix.
+
+    model = net.measurement_model if measurement_model is None else measurement_model
+    if check_observability:
+        observability = analyze_observability(net, model)
+        if not observability.observable:
+            raise ValueError(f'The network is not observable with {model.n_measurements} measurements: '
+                             f'{len(observability.angle_islands)} angle and {len(observability.magnitude_islands)} '
+                             f'magnitude islands, {len(observability.pseudo_measurements)} pseudo measurements '
+                             f'needed.')
     vm, va = flat_start(net)
+    solver = net.state_estimation_solver
+    solver.reuse_factorization = reuse_factorization
+    solver.reset()
     angle_indices = [i for i in range(len(net.buses)) if i not in net.slack_buses]
-    magnitude_indices = list(range(len(net.buses), 2 * len(net.buses)))
+    z, r_inv = model.z, model.weight_matrix
+    alpha = (1 / model.weights).min()
+    lav_problem = LAVProblem(model.n_measurements, len(angle_indices) + len(net.buses)) if algorithm == 'LAV' else None
     iteration = 0
     while iteration < max_iteration:
         iteration += 1
         v = vm * exp(1j * va)
-        z, r_inv = create_measurement_vector(net)
-        H = create_jacobian_matrix(net, v, angle_indices, magnitude_indices)
-        hx = create_hx(net, v)
+        H = model.jacobian(v, angle_indices)
+        hx = model.hx(v)
         r = z - hx
         if algorithm =='WLS':
             G_m = H.T * (r_inv * H)
 
-            dx = spsolve(G_m, H.T * (r_inv * r))
+            dx = solver.solve(G_m, H.T * (r_inv * r))
 
-        elif algorithm == 'LAV':
+        elif algorithm == 'WLS_AUGMENTED':
+            # Hachtel's augmented matrix [[R / alpha, H], [H.T, 0]] [alpha * R^-1 (r - H dx), dx] = [r, 0] gives the
+            # WLS step without forming H.T R^-1 H, whose condition number is the square of that of R^-1/2 H
             m, n = H.shape
+            K = bmat([[diags(1 / (model.weights * alpha), format='csr'), H], [H.T, None]], format='csr')
+            dx = solver.solve(K, concatenate([r, zeros(n)]))[m:]
 
-            C = concatenate((zeros((1, n)), zeros((1, n)), ones((1, m)), ones((1, m))), axis=1)
-            A = hstack((H, -H, sparse_eye(m, format='csc'), -sparse_eye(m, format='csc')))
-
-            res = lp(c=C, A_eq=A, b_eq=r, method="highs-ds")
-            sol = res.x
+        elif algorithm == 'LAV':
+            dx = lav_problem.step(H, r, tolerance)
 
-            delXu = sol[0:n]
-            delXv = sol[n:n + n]
+        elif algorithm == 'LAV_IRLS':
+            # sum |r_i| is approximated by sum r_i^2 / |r_i| around the current residuals, the gain matrix keeps the
+            # pattern of the WLS one so the solver reuses its ordering
+            d = diags(1 / maximum(abs(r), irls_threshold), format='csr')
+            dx = solver.solve(H.T * (d * H), H.T * (d * r))
 
-            dx = delXu - delXv
         else:
             raise NotImplementedError
 
-        va[angle_indices] += dx[:len(net.buses)-1]
-        vm += dx[len(net.buses)-1:]
+        va[angle_indices] += dx[:len(angle_indices)]
+        vm += dx[len(angle_indices):]
 
-        eps = max(abs(dx))
+        eps = abs(dx).max()
         if eps < tolerance:
             print(f'{algorithm} State Estimation Converged at Iteration {iteration}')
             net.vm_estimated = vm
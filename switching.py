@@ -0,0 +1,181 @@
+from numpy import ndarray, array, asarray, ones, concatenate, arange, repeat, cumsum, argsort, searchsorted, bincount, \
+    tile, full, append
+from scipy.sparse import coo_matrix, csr_matrix
+from .network_matrices import calculate_branch_admittances, calculate_branch_stamps, get_entry_positions
+
+
+class SwitchingManager:
+    """
+    Open/closed state of the lines, transformers and SOPs of a net, applied to y_bus, y_bus_from_to and y_bus_to_from
+    in place.
+
+    The matrices keep the structure of every branch whatever its state, so switching never changes a sparsity pattern
+    and the cached Jacobian patterns and orderings stay valid. Every y_bus entry is the sum of the stamps of the closed
+    branches and the bus shunts stored at that position, always summed in the same order. Switching a branch
+    recomputes its four entries from those terms instead of adding and subtracting its stamps, so any sequence of
+    actions that ends in the same state gives bit for bit the same matrices. Rows of the branch current matrices
+    belong to one branch and are zeroed or restored.
+
+    Every action that changes the state is logged. undo returns to a checkpoint, which lets searches over switching
+    states flip thousands of switches without rebuilding the matrices.
+    """
+    def __init__(self, net, closed=None):
+        arrays = net.arrays
+        self.net = net
+        self.arrays = arrays
+        self.n_lines = arrays.n_lines
+        n_branch = arrays.n_branches
+        self.closed = arrays.branch_closed.copy() if closed is None else asarray(closed, dtype=bool).copy()
+        f, t = arrays.branch_from, arrays.branch_to
+
+        # y_bus with the structure of every branch
+        y_series, y_shunt, a = calculate_branch_admittances(net, arrays)
+        stamps = array(calculate_branch_stamps(y_series, y_shunt, a))
+        y_shunt_bus = (arrays.shunt_p_mw - 1j * arrays.shunt_q_mvar) / net.s_base_mva
+        self.y_bus = csr_matrix(net.full_y_bus, copy=True)
+        self.y_bus.sort_indices()
+        branch_positions = array([get_entry_positions(self.y_bus, f, f), get_entry_positions(self.y_bus, f, t),
+                                  get_entry_positions(self.y_bus, t, f), get_entry_positions(self.y_bus, t, t)])
+        shunt_positions = get_entry_positions(self.y_bus, arrays.shunt_bus, arrays.shunt_bus)
+        self.branch_positions = branch_positions
+
+        # Terms of every y_bus entry grouped by position, in the order of create_y_bus within a position. Shunt terms
+        # belong to the extra always closed branch n_branch.
+        positions = concatenate([branch_positions.ravel(), shunt_positions])
+        order = argsort(positions, kind='stable')
+        self.term_values = concatenate([stamps.ravel(), y_shunt_bus])[order]
+        self.term_branches = concatenate([tile(arange(n_branch), 4), full(len(shunt_positions), n_branch)])[order]
+        self.term_indptr = searchsorted(positions[order], arange(self.y_bus.nnz + 1))
+
+        # Branch current matrices with every branch, the stored rows of the open ones are zeroed
+        rows = arange(n_branch)
+        y_self = y_series + y_shunt / 2
+        self.y_bus_from_to = coo_matrix((concatenate([y_self, -y_series]), (concatenate([rows, rows]),
+                                                                           concatenate([f, t]))),
+                                        shape=(n_branch, arrays.n_buses)).tocsr()
+        self.y_bus_to_from = coo_matrix((concatenate([-y_series, y_self]), (concatenate([rows, rows]),
+                                                                           concatenate([f, t]))),
+                                        shape=(n_branch, arrays.n_buses)).tocsr()
+        self.y_bus_from_to.sort_indices()
+        self.y_bus_to_from.sort_indices()
+        # Data positions of the from and to bus entries of every row, the same entry for a branch from a bus to itself
+        self.row_positions = array([get_entry_positions(self.y_bus_from_to, rows, f),
+                                    get_entry_positions(self.y_bus_from_to, rows, t)])
+        self.from_to_values = self.y_bus_from_to.data.copy()
+        self.to_from_values = self.y_bus_to_from.data.copy()
+
+        self.update_entries(arange(self.y_bus.nnz))
+        for matrix in (self.y_bus_from_to, self.y_bus_to_from):
+            matrix.data[self.row_positions[:, ~self.closed].ravel()] = 0
+
+        # Elements in branch row order, their flags follow the state
+        self.elements = ([net.lines[int(idx)] for idx in arrays.line_idx] +
+                         [net.transformers[int(idx)] for idx in arrays.transformer_idx])
+        for branch in range(n_branch):
+            self.set_flags(branch, self.closed[branch])
+
+        self.log = []
+        net.y_bus = self.y_bus
+        net.y_bus_from_to = self.y_bus_from_to
+        net.y_bus_to_from = self.y_bus_to_from
+
+    def update_entries(self, positions: ndarray) -> None:
+        # Sums the terms of the closed branches at the given y_bus data positions
+        starts = self.term_indptr[positions]
+        lengths = self.term_indptr[positions + 1] - starts
+        terms = repeat(starts - cumsum(lengths) + lengths, lengths) + arange(lengths.sum())
+        values = self.term_values[terms] * append(self.closed, True)[self.term_branches[terms]]
+        local = repeat(arange(len(positions)), lengths)
+        self.y_bus.data[positions] = (bincount(local, values.real, minlength=len(positions))
+                                      + 1j * bincount(local, values.imag, minlength=len(positions)))
+
+    def set_flags(self, branch, closed) -> None:
+        closed = bool(closed)
+        self.elements[branch].closed = closed
+        if branch < self.n_lines:
+            self.arrays.line_closed[branch] = closed
+        else:
+            self.arrays.transformer_closed[branch - self.n_lines] = closed
+
+    def set_branch(self, branch: int, closed: bool, log: bool = True) -> bool:
+        # Branch row as in y_bus_from_to, lines first. Returns whether the state changed, repeated actions do nothing.
+        if self.closed[branch] == closed:
+            return False
+        if self.net.arrays is not self.arrays:
+            raise ValueError('The network elements changed since the switching manager was created.')
+        self.closed[branch] = closed
+        self.update_entries(self.branch_positions[:, branch])
+        positions = self.row_positions[:, branch]
+        self.y_bus_from_to.data[positions] = self.from_to_values[positions] if closed else 0
+        self.y_bus_to_from.data[positions] = self.to_from_values[positions] if closed else 0
+        self.set_flags(branch, closed)
+        if log:
+            self.log.append(('branch', branch, not closed))
+        # Compiled measurement rows hold copies of the changed admittances
+        self.net.invalidate_measurement_model()
+        return True
+
+    def set_sop(self, sop_idx, closed: bool, log: bool = True) -> bool:
+        # SOPs are not part of the admittance matrices, only their flag is switched
+        sop = self.net.soft_open_points[sop_idx]
+        if sop.closed == closed:
+            return False
+        sop.closed = closed
+        if log:
+            self.log.append(('sop', sop_idx, not closed))
+        return True
+
+    def line_branch(self, line_idx) -> int:
+        return self.net.line_map[line_idx]
+
+    def transformer_branch(self, transformer_idx) -> int:
+        return self.n_lines + self.net.transformer_map[transformer_idx]
+
+    def open_line(self, line_idx) -> bool:
+        return self.set_branch(self.line_branch(line_idx), False)
+
+    def close_line(self, line_idx) -> bool:
+        return self.set_branch(self.line_branch(line_idx), True)
+
+    def open_transformer(self, transformer_idx) -> bool:
+        return self.set_branch(self.transformer_branch(transformer_idx), False)
+
+    def close_transformer(self, transformer_idx) -> bool:
+        return self.set_branch(self.transformer_branch(transformer_idx), True)
+
+    def open_sop(self, sop_idx) -> bool:
+        return self.set_sop(sop_idx, False)
+
+    def close_sop(self, sop_idx) -> bool:
+        return self.set_sop(sop_idx, True)
+
+    def checkpoint(self) -> int:
+        return len(self.log)
+
+    def undo(self, checkpoint: int = None) -> None:
+        # Reverts the actions after the checkpoint, or the last action without one
+        if checkpoint is None:
+            checkpoint = len(self.log) - 1
+        while len(self.log) > max(checkpoint, 0):
+            kind, key, closed = self.log.pop()
+            if kind == 'branch':
+                self.set_branch(key, closed, log=False)
+            else:
+                self.set_sop(key, closed, log=False)
+
+
+def get_switching_manager(net) -> SwitchingManager:
+    # Kept while it owns the matrices of the net and the compiled arrays are unchanged, otherwise built from the flags
+    manager = net.switching_manager
+    if manager is None or manager.arrays is not net.arrays or manager.y_bus is not net.y_bus:
+        manager = SwitchingManager(net)
+        net.switching_manager = manager
+    return manager
+
+
+def get_branch_states(net, open_lines=(), open_transformers=()) -> ndarray:
+    # Branch row states with every branch closed except the given ones
+    closed = ones(net.arrays.n_branches, dtype=bool)
+    closed[[net.line_map[line_idx] for line_idx in open_lines]] = False
+    closed[[net.arrays.n_lines + net.transformer_map[idx] for idx in open_transformers]] = False
+    return closed
@@ -0,0 +1,283 @@
+import os
+from dataclasses import dataclass, field
+from time import perf_counter
+from numpy import ndarray, array, asarray, zeros, ones, empty, exp, conj, concatenate, isfinite, loadtxt, load, \
+    ascontiguousarray, dtype as dtype_of, float64, int64
+from numpy.lib.format import write_array_header_1_0, dtype_to_descr
+from scipy.sparse import csr_matrix
+from .jacobian import get_jacobian_pattern
+from .linear_solver import SparseLUSolver
+from .load_flow import prepare_load_flow_from_case_file, read_load_flow_data, get_bus_positions
+from .create.binary import CASE_ELEMENT_INDEX_KEYS, is_binary_file, read_binary_load_flow_case, \
+    get_case_element_indices
+
+# Quantities a profile can replace and the sign of the element on the bus injection
+PROFILE_QUANTITIES = {('load', 'p_mw'): -1, ('load', 'q_mvar'): -1, ('generation', 'p_mw'): 1,
+                      ('static_generation', 'p_mw'): 1, ('static_generation', 'q_mvar'): 1}
+RESULT_NAMES = ('vm', 'va', 'p_from_pu', 'q_from_pu')
+
+
+@dataclass(kw_only=True)
+class Profile:
+    element: str  # 'load', 'generation' or 'static_generation' of the load flow case
+    quantity: str  # 'p_mw' or 'q_mvar'
+    element_idx: ndarray  # Case element index of every column
+    values: ndarray = field(repr=False)  # (timesteps x elements), may be a memory map that is read chunk by chunk
+
+    @property
+    def n_timesteps(self):
+        return self.values.shape[0]
+
+
+@dataclass(kw_only=True)
+class TimeSeriesResult:
+    n_timesteps: int
+    seconds: float
+    factorizations: int
+    iterations: ndarray = field(repr=False)
+    converged: ndarray = field(repr=False)
+    # (timesteps x buses) and (timesteps x branches in branch row order), memory maps when written to a directory
+    vm: ndarray = field(repr=False)
+    va: ndarray = field(repr=False)
+    p_from_pu: ndarray = field(repr=False)
+    q_from_pu: ndarray = field(repr=False)
+
+    @property
+    def timesteps_per_second(self):
+        return self.n_timesteps / self.seconds if self.seconds > 0 else float('inf')
+
+
+def read_profile_csv(filename, element, quantity) -> Profile:
+    # The header row holds the element indices of the columns, every further row is one timestep
+    with open(filename, 'r') as f:
+        element_idx = array([int(float(idx)) for idx in f.readline().split(',')], dtype=int64)
+    values = loadtxt(filename, delimiter=',', skiprows=1, ndmin=2)
+    return Profile(element=element, quantity=quantity, element_idx=element_idx, values=values)
+
+
+def read_profile_npy(filename, element, quantity, element_idx) -> Profile:
+    return Profile(element=element, quantity=quantity, element_idx=asarray(element_idx, dtype=int64),
+                   values=load(filename, mmap_mode='r'))
+
+
+def convert_profile_csv_to_npy(csv_filename, npy_filename, chunk_rows: int = 4096) -> ndarray:
+    """
+    Writes the values of a profile CSV to a .npy file chunk_rows rows at a time, so that profiles longer than the
+    memory can be memory mapped with read_profile_npy. Returns the element indices of the header.
+    """
+    with open(csv_filename, 'r') as f:
+        element_idx = array([int(float(idx)) for idx in f.readline().split(',')], dtype=int64)
+        n_timesteps = sum(1 for line in f if line.strip())
+    with open(csv_filename, 'r') as f, create_npy_file(npy_filename, (n_timesteps, len(element_idx)), float64) as npy:
+        f.readline()
+        row = 0
+        while row < n_timesteps:
+            chunk = loadtxt(f, delimiter=',', max_rows=chunk_rows, ndmin=2)
+            npy.write(ascontiguousarray(chunk, dtype=float64).tobytes())
+            row += len(chunk)
+    return element_idx
+
+
+def read_case_elements(load_flow_case, element):
+    # Element indices, bus_idx and case values (p_mw, q_mvar) of one injection table of a JSON or binary case
+    if is_binary_file(load_flow_case):
+        blocks = read_binary_load_flow_case(load_flow_case).blocks
+        n = len(blocks[f'{element}.idx'])
+        return (blocks[f'{element}.idx'], blocks[f'{element}.bus_idx'], blocks[f'{element}.p_mw'],
+                blocks[f'{element}.q_mvar'] if f'{element}.q_mvar' in blocks else zeros(n))
+    records = read_load_flow_data(load_flow_case)[element]
+    values = list(records.values())
+    return (array(get_case_element_indices(records, CASE_ELEMENT_INDEX_KEYS[element]), dtype=int64).reshape(-1),
+            array([record['bus_idx'] for record in values], dtype=int64).reshape(-1),
+            array([record['p_mw'] for record in values], dtype=float64).reshape(-1),
+            array([record.get('q_mvar', 0.0) for record in values], dtype=float64).reshape(-1))
+
+
+class TimeSeriesLoadFlow:
+    """
+    Newton-Raphson load flows of one load flow case with its injections replaced by profiles, one per timestep.
+
+    Profiled elements take their values from the profiles, every other element keeps its case value. The injections
+    of a chunk of timesteps are mapped to the buses with one sparse incidence matrix product per profile. Every
+    timestep starts from the previous solution and keeps the Jacobian LU of earlier timesteps while the mismatch
+    contracts by at least the contraction factor, otherwise it is factorized again at the current state. The mismatch
+    always uses the current state, so the solutions meet the tolerance whatever Jacobian the steps were taken with.
+    """
+    def __init__(self,
+                 net,
+                 load_flow_case,
+                 profiles,
+                 max_iteration: int = 30,
+                 tolerance: float = 1e-8,
+                 contraction: float = 0.25):
+        p_scheduled_pu, q_scheduled_pu, self.vm, self.va = prepare_load_flow_from_case_file(net, load_flow_case)
+        self.net = net
+        self.y_bus = csr_matrix(net.y_bus)
+        self.y_bus_from_to = csr_matrix(net.y_bus_from_to)
+        self.branch_from = net.arrays.branch_from
+        self.pvpq = array(sorted(list(net.pq_buses) + list(net.pv_buses)), dtype=int64)
+        self.pq = array(sorted(net.pq_buses), dtype=int64)
+        self.jacobian_pattern = get_jacobian_pattern(net, self.pvpq, self.pq)
+        self.solver = SparseLUSolver()
+        self.max_iteration = max_iteration
+        self.tolerance = tolerance
+        self.contraction = contraction
+
+        self.profiles = list(profiles)
+        n_timesteps = {profile.n_timesteps for profile in self.profiles}
+        if len(n_timesteps) != 1:
+            raise ValueError(f'Profiles must all have the same number of timesteps, got {sorted(n_timesteps)}.')
+        self.n_timesteps = n_timesteps.pop()
+
+        # Bus injections of the case without the profiled elements, and the incidence matrix of every profile
+        self.p_base_pu = asarray(p_scheduled_pu, dtype=float64).ravel()
+        self.q_base_pu = asarray(q_scheduled_pu, dtype=float64).ravel()
+        self.incidences = []
+        n_buses = len(net.buses)
+        for profile in self.profiles:
+            sign = PROFILE_QUANTITIES.get((profile.element, profile.quantity))
+            if sign is None:
+                raise ValueError(f'No profile for {profile.quantity} of {profile.element}, expected one of '
+                                 f'{sorted(PROFILE_QUANTITIES)}.')
+            element_idx, bus_idx, p_mw, q_mvar = read_case_elements(load_flow_case, profile.element)
+            rows = {idx: row for row, idx in enumerate(element_idx.tolist())}
+            missing = [idx for idx in profile.element_idx.tolist() if idx not in rows]
+            if missing:
+                raise ValueError(f'The case has no {profile.element} with index {missing[0]}.')
+            case_rows = array([rows[idx] for idx in profile.element_idx.tolist()], dtype=int64).reshape(-1)
+            buses = get_bus_positions(net, bus_idx[case_rows])
+            incidence = csr_matrix((ones(len(buses)) * sign / net.s_base_mva, (buses, range(len(buses)))),
+                                   shape=(n_buses, len(buses)))
+            base = self.p_base_pu if profile.quantity == 'p_mw' else self.q_base_pu
+            base -= incidence * (p_mw if profile.quantity == 'p_mw' else q_mvar)[case_rows]
+            self.incidences.append(incidence)
+
+    def injections(self, start, stop):
+        # Scheduled (timesteps x buses) injections of timesteps start to stop, reading only those rows of the profiles
+        p_scheduled_pu = zeros((stop - start, len(self.p_base_pu))) + self.p_base_pu
+        q_scheduled_pu = zeros((stop - start, len(self.q_base_pu))) + self.q_base_pu
+        for profile, incidence in zip(self.profiles, self.incidences):
+            injection = (incidence * asarray(profile.values[start:stop], dtype=float64).T).T
+            if profile.quantity == 'p_mw':
+                p_scheduled_pu += injection
+            else:
+                q_scheduled_pu += injection
+        return p_scheduled_pu, q_scheduled_pu
+
+    def solve(self, p_scheduled_pu, q_scheduled_pu):
+        # One timestep from the previous solution, returns vm, va, iterations, factorizations and convergence
+        vm, va = self.vm.copy(), self.va.copy()
+        pvpq, pq = self.pvpq, self.pq
+        factorizations = 0
+        refactorize = self.solver.lu is None
+        previous_mismatch = None
+        converged = False
+        iteration = 0
+        while iteration < self.max_iteration:
+            v = vm * exp(1j * va)
+            S = v * conj(self.y_bus * v)
+            F = concatenate([S.real[pvpq] - p_scheduled_pu[pvpq], S.imag[pq] - q_scheduled_pu[pq]])
+            mismatch = abs(F).max(initial=0)
+            if not isfinite(mismatch):
+                break
+            if mismatch < self.tolerance:
+                converged = True
+                break
+            iteration += 1
+            # A slowly contracting mismatch means the kept Jacobian no longer matches the state
+            if refactorize or (previous_mismatch is not None and mismatch > self.contraction * previous_mismatch):
+                self.solver.factorize(self.jacobian_pattern.fill(self.y_bus, v))
+                factorizations += 1
+                refactorize = False
+            previous_mismatch = mismatch
+            dx = self.solver.solve_factorized(F)
+            va[pvpq] -= dx[:len(pvpq)]
+            vm[pq] -= dx[len(pvpq):]
+
+        if converged:
+            self.vm, self.va = vm, va
+        else:
+            # The next timestep starts over with a fresh Jacobian from the last converged state
+            self.solver.reset()
+        return vm, va, iteration, factorizations, converged
+
+    def run(self, output_directory=None, chunk_size: int = 96, result_dtype=float64, progress=None) -> TimeSeriesResult:
+        """
+        Solves every timestep. With an output_directory the results of every chunk_size timesteps are appended to
+        .npy files (vm, va, p_from_pu, q_from_pu, iterations, converged) and returned as read-only memory maps once
+        all are solved, so only one chunk is held in memory. Without one they are returned as arrays.
+        """
+        n_buses, n_branches = len(self.p_base_pu), self.y_bus_from_to.shape[0]
+        columns = {'vm': n_buses, 'va': n_buses, 'p_from_pu': n_branches, 'q_from_pu': n_branches,
+                   'iterations': None, 'converged': None}
+        dtypes = dict.fromkeys(RESULT_NAMES, result_dtype) | {'iterations': int64, 'converged': bool}
+        shapes = {name: (self.n_timesteps,) if n is None else (self.n_timesteps, n) for name, n in columns.items()}
+        if output_directory is None:
+            results = {name: empty(shapes[name], dtype=dtypes[name]) for name in columns}
+        else:
+            os.makedirs(output_directory, exist_ok=True)
+            files = {name: create_npy_file(os.path.join(output_directory, f'{name}.npy'), shapes[name], dtypes[name])
+                     for name in columns}
+
+        start_time = perf_counter()
+        factorizations = 0
+        try:
+            for start in range(0, self.n_timesteps, chunk_size):
+                stop = min(start + chunk_size, self.n_timesteps)
+                p_scheduled_pu, q_scheduled_pu = self.injections(start, stop)
+                chunk = {name: empty((stop - start, *shapes[name][1:]),
+                                     dtype=float64 if name in RESULT_NAMES else dtypes[name])
+                         for name in columns}
+                for step in range(stop - start):
+                    vm, va, chunk['iterations'][step], step_factorizations, chunk['converged'][step] = self.solve(
+                        p_scheduled_pu[step], q_scheduled_pu[step])
+                    factorizations += step_factorizations
+                    chunk['vm'][step], chunk['va'][step] = vm, va
+
+                # Branch flows of the whole chunk at once, S_from = V_from conj(Y_from_to V)
+                v = chunk['vm'] * exp(1j * chunk['va'])
+                s_from = v[:, self.branch_from] * conj((self.y_bus_from_to * v.T).T)
+                chunk['p_from_pu'], chunk['q_from_pu'] = s_from.real, s_from.imag
+                for name, values in chunk.items():
+                    if output_directory is None:
+                        results[name][start:stop] = values
+                    else:
+                        files[name].write(ascontiguousarray(values, dtype=dtypes[name]).tobytes())
+                if progress is not None:
+                    progress(stop, self.n_timesteps)
+        finally:
+            if output_directory is not None:
+                for f in files.values():
+                    f.close()
+        seconds = perf_counter() - start_time
+
+        if output_directory is not None:
+            results = {name: load(os.path.join(output_directory, f'{name}.npy'), mmap_mode='r') for name in columns}
+        return TimeSeriesResult(n_timesteps=self.n_timesteps,
+                                seconds=seconds,
+                                factorizations=factorizations,
+                                **results)
+
+
+def create_npy_file(filename, shape, dtype):
+    # Open .npy file with the header of the full array, the rows are appended in order after it
+    f = open(filename, 'wb')
+    write_array_header_1_0(f, {'descr': dtype_to_descr(dtype_of(dtype)), 'fortran_order': False, 'shape': shape})
+    return f
+
+
+def run_time_series(net,
+                    load_flow_case,
+                    profiles,
+                    output_directory=None,
+                    chunk_size: int = 96,
+                    result_dtype=float64,
+                    max_iteration: int = 30,
+                    tolerance: float = 1e-8,
+                    progress=None) -> TimeSeriesResult:
+    """
+    Wrapper of TimeSeriesLoadFlow for a Net with y_bus created. The case sets bus types, open branches and the values
+    of the elements without a profile, see TimeSeriesLoadFlow.run for the output files.
+    """
+    engine = TimeSeriesLoadFlow(net, load_flow_case, profiles, max_iteration, tolerance)
+    return engine.run(output_directory, chunk_size, result_dtype, progress)
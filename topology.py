@@ -0,0 +1,72 @@
+from dataclasses import dataclass, field
+from numpy import ndarray, ones, zeros, bincount, int64
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+
+@dataclass(kw_only=True)
+class NetworkTopology:
+    arrays: object = field(repr=False)  # NetworkArrays the islands were found for
+    closed_state: bytes = field(repr=False)  # branch_closed the islands were found for
+    n_islands: int
+    bus_island: ndarray  # Island label of every bus
+
+    def island_buses(self, island) -> ndarray:
+        return (self.bus_island == island).nonzero()[0]
+
+
+def find_islands(arrays) -> NetworkTopology:
+    # Connected components of the buses over the closed lines and transformers
+    closed = arrays.branch_closed
+    n = arrays.n_buses
+    graph = coo_matrix((ones(int(closed.sum()), dtype=bool), (arrays.branch_from[closed], arrays.branch_to[closed])),
+                       shape=(n, n))
+    n_islands, bus_island = connected_components(graph, directed=False)
+    return NetworkTopology(arrays=arrays,
+                           closed_state=closed.tobytes(),
+                           n_islands=n_islands,
+                           bus_island=bus_island.astype(int64))
+
+
+def get_topology(net) -> NetworkTopology:
+    # Islands are kept until the compiled arrays are rebuilt or a branch is switched
+    arrays = net.arrays
+    topology = net.topology
+    if topology is None or topology.arrays is not arrays or topology.closed_state != arrays.branch_closed.tobytes():
+        topology = find_islands(arrays)
+        net.topology = topology
+    return topology
+
+
+def get_energized_buses(net, topology: NetworkTopology = None, slack_buses=None) -> ndarray:
+    # Buses in an island with a slack bus, of net.slack_buses by default
+    if topology is None:
+        topology = get_topology(net)
+    slack_islands = zeros(topology.n_islands, dtype=bool)
+    slack_islands[topology.bus_island[sorted(net.slack_buses if slack_buses is None else slack_buses)]] = True
+    return slack_islands[topology.bus_island]
+
+
+def check_multiple_slacks(net, slack_buses=None) -> None:
+    topology = get_topology(net)
+    slack_list = sorted(net.slack_buses if slack_buses is None else slack_buses)
+    slack_islands = topology.bus_island[slack_list]
+    counts = bincount(slack_islands, minlength=topology.n_islands)
+    for island in counts.nonzero()[0]:
+        if counts[island] > 1:
+            u, v = [slack for slack, slack_island in zip(slack_list, slack_islands) if slack_island == island][:2]
+            raise ValueError(f"Slack buses {u} and {v} are electrically connected.")
+
+
+def energize_buses(net) -> ndarray:
+    """
+    Sets Bus.energized from the islands of the current switching state and removes the buses of islands without a
+    slack bus from the PQ and PV buses, so load flow only solves energized islands. Returns the energized mask.
+    """
+    energized = get_energized_buses(net)
+    for bus in net.buses.values():
+        bus.energized = bool(energized[net.bus_map[bus.bus_idx]])
+    de_energized = set((~energized).nonzero()[0].tolist())
+    net.pq_buses = net.pq_buses - de_energized
+    net.pv_buses = net.pv_buses - de_energized
+    return energized
@@ -0,0 +1,133 @@
+from dataclasses import dataclass, field
+from time import perf_counter
+from numpy import ndarray, asarray, ones, zeros, exp, mean, percentile, isfinite
+from scipy.sparse import diags
+from .linear_solver import SparseLUSolver
+from .measurement_model import MeasurementModel
+
+
+@dataclass(kw_only=True)
+class TrackingEstimate:
+    snapshot: int
+    converged: bool
+    iterations: int
+    factorizations: int  # Numeric factorizations of the gain matrix for this snapshot
+    latency: float  # Seconds from receiving the measurement values to the estimate
+    vm: ndarray = field(default=None, repr=False)
+    va: ndarray = field(default=None, repr=False)
+
+
+@dataclass(kw_only=True)
+class LatencyStatistics:
+    snapshots: int
+    mean: float
+    median: float
+    p95: float
+    max: float
+    mean_iterations: float
+    factorizations: int
+
+
+class TrackingEstimator:
+    """
+    WLS estimator for a stream of measurement value snapshots of one measurement configuration.
+
+    Values are arrays in the order of the compiled measurement model (model.measurement_keys). The model is compiled
+    once and every snapshot starts from the previous estimate. The gain matrix is factorized once and kept across
+    iterations and snapshots while the steps contract by at least the contraction factor, otherwise it is factorized
+    again at the current state. The right-hand side always uses the current Jacobian and residuals, so the estimate
+    is the WLS estimate of the snapshot whatever gain the steps were taken with.
+    """
+    def __init__(self,
+                 net,
+                 measurement_model: MeasurementModel = None,
+                 vm=None,
+                 va=None,
+                 max_iteration: int = 50,
+                 tolerance: float = 1e-8,
+                 contraction: float = 0.25):
+        self.model = net.measurement_model if measurement_model is None else measurement_model
+        self.angle_indices = [i for i in range(len(net.buses)) if i not in net.slack_buses]
+        if vm is None and va is None and net.vm_estimated is not None:
+            vm, va = net.vm_estimated, net.va_estimated
+        self.vm = ones(len(net.buses)) if vm is None else asarray(vm, dtype=float).copy()
+        self.va = zeros(len(net.buses)) if va is None else asarray(va, dtype=float).copy()
+        self.weight_matrix = diags(self.model.weights, format='csr')
+        self.max_iteration = max_iteration
+        self.tolerance = tolerance
+        self.contraction = contraction
+        self.solver = SparseLUSolver()
+
+        # Per snapshot statistics, the estimates themselves are not kept
+        self.latencies = []
+        self.iterations = []
+        self.factorizations = []
+
+    def estimate(self, values) -> TrackingEstimate:
+        start = perf_counter()
+        z = asarray(values, dtype=float).ravel()
+        if len(z) != self.model.n_measurements:
+            raise ValueError(f'Expected {self.model.n_measurements} measurement values, got {len(z)}.')
+
+        vm, va = self.vm.copy(), self.va.copy()
+        n_angles = len(self.angle_indices)
+        factorizations = 0
+        refactorize = self.solver.lu is None
+        previous_step = None
+        converged = False
+        iteration = 0
+        while iteration < self.max_iteration and not converged:
+            iteration += 1
+            v = vm * exp(1j * va)
+            H = self.model.jacobian(v, self.angle_indices)
+            r = z - self.model.hx(v)
+            if refactorize:
+                self.solver.factorize(H.T * (self.weight_matrix * H))
+                factorizations += 1
+            dx = self.solver.solve_factorized(H.T * (self.weight_matrix * r))
+            step = abs(dx).max()
+            if not isfinite(step):
+                break
+            # A slowly contracting step means the kept gain no longer matches the state
+            refactorize = previous_step is not None and step > self.contraction * previous_step
+            previous_step = step
+            va[self.angle_indices] += dx[:n_angles]
+            vm += dx[n_angles:]
+            converged = step < self.tolerance
+
+        if converged:
+            self.vm, self.va = vm, va
+        else:
+            # The next snapshot starts over with a fresh gain from the last converged state
+            self.solver.reset()
+        estimate = TrackingEstimate(snapshot=len(self.latencies),
+                                    converged=converged,
+                                    iterations=iteration,
+                                    factorizations=factorizations,
+                                    latency=perf_counter() - start,
+                                    vm=vm,
+                                    va=va)
+        self.latencies.append(estimate.latency)
+        self.iterations.append(iteration)
+        self.factorizations.append(factorizations)
+        return estimate
+
+    def track(self, snapshots):
+        # Estimates every snapshot of an iterable or generator of measurement value arrays as it arrives
+        for values in snapshots:
+            yield self.estimate(values)
+
+    async def track_async(self, snapshots):
+        # Same as track for an async iterator, each estimate runs between two awaits on the source
+        async for values in snapshots:
+            yield self.estimate(values)
+
+    def statistics(self) -> LatencyStatistics:
+        latencies = self.latencies or [float('nan')]
+        return LatencyStatistics(snapshots=len(self.latencies),
+                                 mean=float(mean(latencies)),
+                                 median=float(percentile(latencies, 50)),
+                                 p95=float(percentile(latencies, 95)),
+                                 max=float(max(latencies)),
+                                 mean_iterations=float(mean(self.iterations or [0])),
+                                 factorizations=sum(self.factorizations))